@@ -3,33 +3,34 @@
 """
 Rename a file in S3 using the boto3 library
 
-Rather than download + upload we perform the following steps:
+1. Get AWS credentials for the parent directory, held as an ExpiringValue (see multipart_upload.py)
+   so that they are refreshed shortly before they expire
 
-1. Get AWS credentials for the parent directory
+2. If the source file is a multipart file, copy it to the destination server-side part by part (UploadPartCopy),
+   refreshing the credentials as they near expiry, then delete the source file
 
-2. Get the file size of the file to be uploaded
-
-3. Generate a presigned URL for the file to be downloaded
-
-4. Create a temp shell script with the following template:
+3. Otherwise, generate a presigned URL for the file to be downloaded, and create the destination file with an upload url.
+   A single part file must be uploaded with a single PUT, so we cannot split it into parts.
+   Create a temp shell script with the following template:
 
 '
 #!/usr/bin/env bash
 
 set -euo pipefail
 
-wget \
- --quiet \
- --output-document /dev/stdout \
- "{__PRESIGNED_URL__}" | \
-aws s3 cp --expected-size "${__FILE_SIZE_IN_BYTES__}" - "${__DESTINATION_PATH__}"
+curl \
+  --fail-with-body --silent --show-error --location \
+  --request GET \
+  --url "__DOWNLOAD_PRESIGNED_URL__" | \
+curl --fail-with-body --silent --show-error --location \
+  --request PUT \
+  --header 'Content-Type: application/octet-stream' \
+  --data-binary "@-" \
+  --url "__UPLOAD_PRESIGNED_URL__"
 '
 
-We then run the shell script through subprocess.run with the following environment variables set
-
-1. AWS_ACCESS_KEY_ID - the access key id for this destination path
-2. AWS_SECRET_ACCESS_KEY - the secret access key for this destination path
-3. AWS_SESSION_TOKEN - the session token for this destination path
+   Both urls are created immediately before the shell script is run, and s3 only checks a presigned url
+   when the request starts. We then delete the source file with the (refreshed) credentials.
 
 We take in the following inputs:
 
@@ -45,8 +46,8 @@ We take in the following inputs:
 }
 """
 # Standard library imports
-import os
 from pathlib import Path
+from urllib.parse import urlparse
 from textwrap import dedent
 from tempfile import NamedTemporaryFile
 from subprocess import run
@@ -61,11 +62,15 @@ from wrapica.project_data import (
     get_project_data_obj_by_id,
     get_project_data_obj_from_project_id_and_path,
     create_file_with_upload_url,
-    delete_project_data, get_aws_credentials_access_for_project_folder
+    delete_project_data
 )
 from wrapica.storage_configuration import convert_project_data_obj_to_s3_uri
 from wrapica.utils.globals import FILE_DATA_TYPE
 
+# Local imports
+from multipart_upload import get_destination_s3_client_value, multipart_copy
+from task_env import set_icav2_env_vars
+
 # Globals
 POST_DELETION_WAIT_TIME = 5  # seconds, time to wait after deleting a file before trying to upload again
 
@@ -83,37 +88,15 @@ def get_shell_script_template_for_single_part_file() -> str:
 
         # Download the file and upload it
         # This actually downloads the entire file into memory before uploading it
-        # Then delete the source file after successful upload
-        (
-            curl \
-              --fail-with-body --silent --show-error --location \
-              --request GET \
-              --url "__DOWNLOAD_PRESIGNED_URL__" | \
-            curl --fail-with-body --silent --show-error --location \
-              --request PUT \
-              --header 'Content-Type: application/octet-stream' \
-              --data-binary "@-" \
-              --url "__UPLOAD_PRESIGNED_URL__"
-        ) && \
-        aws s3 rm "__SOURCE_S3_PATH__"
-        """
-    )
-
-
-def get_shell_script_template_for_multipart_file() -> str:
-    """
-
-    :return:
-    """
-    return dedent(
-        """
-        #!/usr/bin/env bash
-
-        set -euo pipefail
-
-        aws s3 mv \
-          --copy-props none \
-          "__SOURCE_S3_PATH__" "__DESTINATION_S3_PATH__"
+        curl \
+          --fail-with-body --silent --show-error --location \
+          --request GET \
+          --url "__DOWNLOAD_PRESIGNED_URL__" | \
+        curl --fail-with-body --silent --show-error --location \
+          --request PUT \
+          --header 'Content-Type: application/octet-stream' \
+          --data-binary "@-" \
+          --url "__UPLOAD_PRESIGNED_URL__"
         """
     )
 
@@ -121,7 +104,6 @@ def get_shell_script_template_for_multipart_file() -> str:
 def generate_single_part_shell_script(
         source_file_download_url: str,
         destination_file_upload_url: str,
-        source_file_s3_path: str,
 ):
     # Create a temp file
     temp_file_path = NamedTemporaryFile(
@@ -136,31 +118,6 @@ def generate_single_part_shell_script(
                 "__DOWNLOAD_PRESIGNED_URL__", source_file_download_url
             ).replace(
                 "__UPLOAD_PRESIGNED_URL__", destination_file_upload_url
-            ).replace(
-                "__SOURCE_S3_PATH__", source_file_s3_path
-            ) + "\n"
-        )
-
-    return temp_file_path
-
-
-def generate_multi_part_shell_script(
-        source_file_s3_path: str,
-        destination_file_s3_path: str,
-):
-    # Create a temp file
-    temp_file_path = NamedTemporaryFile(
-        delete=False,
-        suffix=".sh"
-    ).name
-
-    # Write the shell script to the temp file
-    with open(temp_file_path, "w") as temp_file_h:
-        temp_file_h.write(
-            get_shell_script_template_for_multipart_file().replace(
-                "__SOURCE_S3_PATH__", source_file_s3_path
-            ).replace(
-                "__DESTINATION_S3_PATH__", destination_file_s3_path
             ) + "\n"
         )
 
@@ -168,34 +125,18 @@ def generate_multi_part_shell_script(
 
 
 def run_shell_script(
-        destination_folder_object: ProjectData,
         shell_script_path: str,
 ):
     """
-    Run the shell script with the following environment variables set
+    Run the shell script, the presigned urls it uses carry their own credentials
     :param shell_script_path:
-    :param destination_folder_object: We need the destination folder object to get the AWS credentials for the destination path
     :return:
     """
-    storage_creds = get_aws_credentials_access_for_project_folder(
-        project_id=destination_folder_object.project_id,
-        folder_id=destination_folder_object.data.id
-    )
-    env = os.environ.copy()
-    env.update(
-        {
-            'AWS_REGION': storage_creds.region,
-            'AWS_ACCESS_KEY_ID': storage_creds.access_key,
-            'AWS_SECRET_ACCESS_KEY': storage_creds.secret_key,
-            'AWS_SESSION_TOKEN': storage_creds.session_token,
-        }
-    )
     proc = run(
         [
             "bash", shell_script_path
         ],
         capture_output=True,
-        env=env
     )
 
     if not proc.returncode == 0:
@@ -208,6 +149,20 @@ def run_shell_script(
     return
 
 
+def delete_source_file(s3_client_value, source_object: ProjectData):
+    """
+    Delete the source file, with the (refreshed) destination folder credentials
+    :param s3_client_value:
+    :param source_object:
+    :return:
+    """
+    source_s3_uri_obj = urlparse(convert_project_data_obj_to_s3_uri(source_object))
+    s3_client_value.get().delete_object(
+        Bucket=source_s3_uri_obj.netloc,
+        Key=source_s3_uri_obj.path.lstrip('/'),
+    )
+
+
 def get_args():
     """
     Use argparse, to get the arguments from the command line.
@@ -256,6 +211,7 @@ def main():
     :return:
     """
     args = get_args()
+    set_icav2_env_vars()
 
     # Get the source file object
     source_object = get_project_data_obj_by_id(
@@ -269,19 +225,23 @@ def main():
         data_type="FOLDER"
     )
 
+    # The destination folder credentials, refreshed as they near expiry
+    s3_client_value, _, _ = get_destination_s3_client_value(destination_folder_object)
+
     # Determine if the source object is a single part of multi part file based on the etag
     if source_object.data.details.object_e_tag and "-" in source_object.data.details.object_e_tag:
-        # Multi part file, we can use aws s3 mv
-        shell_script_path = generate_multi_part_shell_script(
-            source_file_s3_path=convert_project_data_obj_to_s3_uri(
-                source_object
-            ),
-            destination_file_s3_path=args.output_data_uri
-        )
-        run_shell_script(
-            destination_folder_object=destination_folder_object,
-            shell_script_path=shell_script_path,
+        # Multi part file, we can copy it server-side part by part, then delete the source
+        source_s3_uri_obj = urlparse(convert_project_data_obj_to_s3_uri(source_object))
+        destination_s3_uri_obj = urlparse(args.output_data_uri)
+        multipart_copy(
+            s3_client_value=s3_client_value,
+            source_bucket=source_s3_uri_obj.netloc,
+            source_key=source_s3_uri_obj.path.lstrip('/'),
+            bucket=destination_s3_uri_obj.netloc,
+            key=destination_s3_uri_obj.path.lstrip('/'),
+            file_size_in_bytes=source_object.data.details.file_size_in_bytes,
         )
+        delete_source_file(s3_client_value, source_object)
         return
     else:
         # Single part file, we need to use the download + upload method
@@ -329,17 +289,16 @@ def main():
         shell_script_path = generate_single_part_shell_script(
             source_file_download_url=source_file_download_url,
             destination_file_upload_url=destination_file_upload_url,
-            source_file_s3_path=convert_project_data_obj_to_s3_uri(
-                source_object
-            )
         )
 
         # Run the shell script
         run_shell_script(
-            destination_folder_object=destination_folder_object,
             shell_script_path=shell_script_path,
         )
 
+        # Then delete the source file after successful upload
+        delete_source_file(s3_client_value, source_object)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+
+"""
+Multipart upload of a source presigned url to the destination folder storage, part by part
+
+A multi-hour transfer outlives both the project folder credentials and the source presigned url,
+and a single streamed `aws s3 cp -` fails (and must start again from scratch) once either of them expires.
+
+Instead, each part is a ranged GET on the source presigned url followed by an UploadPart with the destination credentials.
+Both the credentials (and so the s3 client) and the presigned url are held as ExpiringValues,
+which are refreshed shortly before they expire, and again if a part is rejected as expired or forbidden.
+A failed part is retried with the refreshed values, the parts already uploaded are kept.
+
+The same engine resumes uploads started by the upload from filemanager lambda, given its resume token
+
+{
+    "bucket": "destination-bucket",
+    "key": "path/to/destination/file.txt",
+    "uploadId": "abcdefg...",
+    "partSize": 16777216,
+    "fileSizeInBytes": 1234567890
+}
+
+We list the parts s3 has already recorded for the upload, upload the remaining parts and complete the upload.
+
+Objects the destination credentials can already read (i.e renaming a file within a project folder)
+are instead copied server-side part by part (UploadPartCopy), refreshing the credentials in the same way.
+
+Shared by the upload from filemanager and rename file tasks, each image vendors this module when it is built.
+"""
+
+# Standard imports
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+from urllib.parse import parse_qs, urlparse
+import logging
+
+import boto3
+import requests
+from botocore.exceptions import ClientError
+
+from libica.openapi.v3 import ProjectData
+from wrapica.project_data import get_aws_credentials_access_for_project_folder
+
+# Vendored from the icav2_data_copy_tools layer
+from s3_parts import (
+    MAX_PART_COPY_WORKERS, MIN_COPY_PART_SIZE_IN_BYTES,
+    get_number_of_parts, get_part_byte_range, get_part_size, get_uploaded_parts
+)
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+MAX_PART_UPLOAD_WORKERS = 8
+MAX_PART_ATTEMPTS = 5
+# Refresh credentials and urls this long before they expire, so no part starts on an about-to-expire value
+EXPIRY_MARGIN = timedelta(minutes=10)
+# Used when we cannot tell when a value expires
+DEFAULT_LIFETIME = timedelta(minutes=50)
+EXPIRED_ERROR_CODES = frozenset({"ExpiredToken", "ExpiredTokenException", "AccessDenied", "InvalidAccessKeyId", "RequestExpired"})
+EXPIRED_STATUS_CODES = frozenset({400, 403})
+
+# Shared by the part upload threads
+DOWNLOAD_SESSION = requests.Session()
+DOWNLOAD_SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=MAX_PART_UPLOAD_WORKERS))
+
+T = TypeVar("T")
+
+
+class ExpiringValue(Generic[T]):
+    """
+    A value (i.e credentials or a presigned url) that is refreshed shortly before it expires.
+    refresh_fn returns the new value and its expiry (or None if unknown).
+    """
+    def __init__(self, refresh_fn: Callable[[], Tuple[T, Optional[datetime]]], margin: timedelta = EXPIRY_MARGIN):
+        self.refresh_fn = refresh_fn
+        self.margin = margin
+        self._lock = Lock()
+        self._value: Optional[T] = None
+        self._expires_at: Optional[datetime] = None
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._value is not None and
+            self._expires_at is not None and
+            datetime.now(timezone.utc) + self.margin < self._expires_at
+        )
+
+    def get(self) -> T:
+        with self._lock:
+            if not self._is_fresh():
+                self._refresh()
+            return self._value
+
+    def invalidate(self, stale_value: T):
+        """
+        Force a refresh on the next get, unless another thread has already refreshed the stale value
+        :param stale_value:
+        :return:
+        """
+        with self._lock:
+            if self._value is stale_value:
+                self._expires_at = None
+
+    def _refresh(self):
+        value, expires_at = self.refresh_fn()
+        self._value = value
+        self._expires_at = expires_at if expires_at is not None else datetime.now(timezone.utc) + DEFAULT_LIFETIME
+        logger.info(f"Refreshed {type(value).__name__}, expires at {self._expires_at}")
+
+
+def get_presigned_url_expiry(url: str) -> Optional[datetime]:
+    """
+    Get the expiry of an s3 presigned url from its X-Amz-Date and X-Amz-Expires query parameters
+    :param url:
+    :return:
+    """
+    query = parse_qs(urlparse(url).query)
+    try:
+        signed_at = datetime.strptime(query['X-Amz-Date'][0], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        return signed_at + timedelta(seconds=int(query['X-Amz-Expires'][0]))
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def get_destination_s3_client_value(destination_folder_object: ProjectData) -> Tuple[ExpiringValue, str, str]:
+    """
+    Get an s3 client with the destination folder credentials, refreshed from ICAv2 shortly before they expire,
+    along with the destination bucket and object prefix
+    :param destination_folder_object:
+    :return:
+    """
+    storage_location = {}
+
+    def _refresh():
+        storage_creds = get_aws_credentials_access_for_project_folder(
+            project_id=destination_folder_object.project_id,
+            folder_id=destination_folder_object.data.id
+        )
+        storage_location['bucket'] = storage_creds.bucket
+        storage_location['object_prefix'] = storage_creds.object_prefix
+        return (
+            boto3.client(
+                's3',
+                region_name=storage_creds.region,
+                aws_access_key_id=storage_creds.access_key,
+                aws_secret_access_key=storage_creds.secret_key,
+                aws_session_token=storage_creds.session_token,
+            ),
+            storage_creds.expiration_time
+        )
+
+    s3_client_value = ExpiringValue(_refresh)
+    # Populates the storage location
+    s3_client_value.get()
+
+    return s3_client_value, storage_location['bucket'], storage_location['object_prefix']
+
+
+def is_expiry_error(error: Exception) -> bool:
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in EXPIRED_ERROR_CODES
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in EXPIRED_STATUS_CODES
+    return False
+
+
+def upload_part(s3_client, download_url: str, resume_token: Dict, part_number: int) -> Dict:
+    byte_range_start, byte_range_end = get_part_byte_range(resume_token, part_number)
+
+    download_response = DOWNLOAD_SESSION.get(
+        download_url,
+        headers={"Range": f"bytes={byte_range_start}-{byte_range_end}"},
+    )
+    download_response.raise_for_status()
+
+    upload_response = s3_client.upload_part(
+        Bucket=resume_token['bucket'],
+        Key=resume_token['key'],
+        UploadId=resume_token['uploadId'],
+        PartNumber=part_number,
+        Body=download_response.content,
+    )
+    return {
+        "PartNumber": part_number,
+        "ETag": upload_response['ETag'],
+    }
+
+
+def upload_part_with_refresh(
+        s3_client_value: ExpiringValue[Any],
+        download_url_value: ExpiringValue[str],
+        resume_token: Dict,
+        part_number: int,
+) -> Dict:
+    """
+    Upload a part with the current s3 client and presigned url, refreshing whichever has expired and retrying
+    :return:
+    """
+    for attempt_iter_ in range(1, MAX_PART_ATTEMPTS + 1):
+        s3_client = s3_client_value.get()
+        download_url = download_url_value.get()
+        try:
+            return upload_part(s3_client, download_url, resume_token, part_number)
+        except (ClientError, requests.RequestException) as e:
+            if attempt_iter_ == MAX_PART_ATTEMPTS:
+                raise
+            if is_expiry_error(e):
+                # We cannot tell which of the two has expired, refresh both
+                logger.info(f"Part {part_number} was rejected ({e}), refreshing credentials and presigned url")
+                s3_client_value.invalidate(s3_client)
+                download_url_value.invalidate(download_url)
+            else:
+                logger.warning(f"Part {part_number} failed on attempt {attempt_iter_}, retrying, {e}")
+
+    # Unreachable, the final attempt either returns or raises
+    raise RuntimeError(f"Could not upload part {part_number}")
+
+
+def resume_upload(
+        s3_client_value: ExpiringValue[Any],
+        download_url_value: ExpiringValue[str],
+        resume_token: Dict,
+):
+    """
+    Upload the remaining parts of the multipart upload and complete it
+    :param s3_client_value: s3 client with the destination folder credentials
+    :param download_url_value: The source presigned url
+    :param resume_token:
+    :return:
+    """
+    uploaded_part_list = get_uploaded_parts(s3_client_value.get(), resume_token)
+    uploaded_part_numbers = set(map(lambda part_iter_: part_iter_['PartNumber'], uploaded_part_list))
+
+    remaining_part_numbers = list(filter(
+        lambda part_number_iter_: part_number_iter_ not in uploaded_part_numbers,
+        range(1, get_number_of_parts(resume_token) + 1)
+    ))
+    logger.info(
+        f"Uploading s3://{resume_token['bucket']}/{resume_token['key']}, "
+        f"{len(remaining_part_numbers)} of {get_number_of_parts(resume_token)} parts remaining"
+    )
+
+    with ThreadPoolExecutor(max_workers=MAX_PART_UPLOAD_WORKERS) as executor:
+        uploaded_part_list.extend(executor.map(
+            lambda part_number_iter_: upload_part_with_refresh(
+                s3_client_value, download_url_value, resume_token, part_number_iter_
+            ),
+            remaining_part_numbers
+        ))
+
+    s3_client_value.get().complete_multipart_upload(
+        Bucket=resume_token['bucket'],
+        Key=resume_token['key'],
+        UploadId=resume_token['uploadId'],
+        MultipartUpload={"Parts": sorted(uploaded_part_list, key=lambda part_iter_: part_iter_['PartNumber'])},
+    )
+
+
+def multipart_upload(
+        s3_client_value: ExpiringValue[Any],
+        download_url_value: ExpiringValue[str],
+        bucket: str,
+        key: str,
+        file_size_in_bytes: int,
+):
+    """
+    Upload the source presigned url to the destination bucket and key as a new multipart upload
+    :param s3_client_value:
+    :param download_url_value:
+    :param bucket:
+    :param key:
+    :param file_size_in_bytes:
+    :return:
+    """
+    resume_upload(
+        s3_client_value=s3_client_value,
+        download_url_value=download_url_value,
+        resume_token={
+            "bucket": bucket,
+            "key": key,
+            "uploadId": s3_client_value.get().create_multipart_upload(Bucket=bucket, Key=key)['UploadId'],
+            "partSize": get_part_size(file_size_in_bytes),
+            "fileSizeInBytes": file_size_in_bytes,
+        },
+    )
+
+
+def copy_part(s3_client, copy_source: Dict, resume_token: Dict, part_number: int) -> Dict:
+    byte_range_start, byte_range_end = get_part_byte_range(resume_token, part_number)
+
+    upload_part_copy_response = s3_client.upload_part_copy(
+        Bucket=resume_token['bucket'],
+        Key=resume_token['key'],
+        UploadId=resume_token['uploadId'],
+        PartNumber=part_number,
+        CopySource=copy_source,
+        CopySourceRange=f"bytes={byte_range_start}-{byte_range_end}",
+    )
+    return {
+        "PartNumber": part_number,
+        "ETag": upload_part_copy_response['CopyPartResult']['ETag'],
+    }
+
+
+def copy_part_with_refresh(
+        s3_client_value: ExpiringValue[Any],
+        copy_source: Dict,
+        resume_token: Dict,
+        part_number: int,
+) -> Dict:
+    """
+    Copy a part with the current s3 client, refreshing the credentials if they have expired and retrying
+    :return:
+    """
+    for attempt_iter_ in range(1, MAX_PART_ATTEMPTS + 1):
+        s3_client = s3_client_value.get()
+        try:
+            return copy_part(s3_client, copy_source, resume_token, part_number)
+        except ClientError as e:
+            if attempt_iter_ == MAX_PART_ATTEMPTS:
+                raise
+            if is_expiry_error(e):
+                logger.info(f"Part {part_number} was rejected ({e}), refreshing credentials")
+                s3_client_value.invalidate(s3_client)
+            else:
+                logger.warning(f"Part {part_number} failed on attempt {attempt_iter_}, retrying, {e}")
+
+    # Unreachable, the final attempt either returns or raises
+    raise RuntimeError(f"Could not copy part {part_number}")
+
+
+def multipart_copy(
+        s3_client_value: ExpiringValue[Any],
+        source_bucket: str,
+        source_key: str,
+        bucket: str,
+        key: str,
+        file_size_in_bytes: int,
+):
+    """
+    Copy the source object to the destination bucket and key server-side, part by part.
+    The s3 client must be able to read the source and write the destination.
+    A failed copy is aborted so that no orphaned parts are left behind
+    :param s3_client_value:
+    :param source_bucket:
+    :param source_key:
+    :param bucket:
+    :param key:
+    :param file_size_in_bytes:
+    :return:
+    """
+    resume_token = {
+        "bucket": bucket,
+        "key": key,
+        "uploadId": s3_client_value.get().create_multipart_upload(Bucket=bucket, Key=key)['UploadId'],
+        "partSize": get_part_size(file_size_in_bytes, min_part_size_in_bytes=MIN_COPY_PART_SIZE_IN_BYTES),
+        "fileSizeInBytes": file_size_in_bytes,
+    }
+    copy_source = {"Bucket": source_bucket, "Key": source_key}
+    number_of_parts = get_number_of_parts(resume_token)
+    logger.info(f"Copying s3://{source_bucket}/{source_key} to s3://{bucket}/{key} in {number_of_parts} parts")
+
+    try:
+        with ThreadPoolExecutor(max_workers=min(MAX_PART_COPY_WORKERS, number_of_parts)) as executor:
+            part_list = list(executor.map(
+                lambda part_number_iter_: copy_part_with_refresh(
+                    s3_client_value, copy_source, resume_token, part_number_iter_
+                ),
+                range(1, number_of_parts + 1)
+            ))
+
+        s3_client_value.get().complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=resume_token['uploadId'],
+            MultipartUpload={"Parts": part_list},
+        )
+    except Exception:
+        s3_client_value.get().abort_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=resume_token['uploadId'],
+        )
+        raise
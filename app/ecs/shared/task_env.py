@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+"""
+Resolve the secrets and parameters an ECS task needs in-process,
+rather than shelling out to the aws cli and jq in the entrypoint
+
+Shared by every ECS task, each image vendors this module into its scripts directory when it is built.
+Values already set in the environment (i.e when running a script locally) are kept.
+"""
+
+# Standard library imports
+from os import environ
+import json
+
+import boto3
+
+# Globals
+ICAV2_ACCESS_TOKEN_ENV_VAR = "ICAV2_ACCESS_TOKEN"
+ICAV2_ACCESS_TOKEN_SECRET_ID_ENV_VAR = "ICAV2_ACCESS_TOKEN_SECRET_ID"
+ORCABUS_TOKEN_ENV_VAR = "ORCABUS_TOKEN"
+ORCABUS_TOKEN_SECRET_ID_ENV_VAR = "ORCABUS_TOKEN_SECRET_ID"
+HOSTNAME_ENV_VAR = "HOSTNAME"
+HOSTNAME_SSM_PARAMETER_NAME_ENV_VAR = "HOSTNAME_SSM_PARAMETER_NAME"
+
+
+def set_icav2_env_vars():
+    """
+    Resolve the ICAv2 access token from secrets manager
+    :return:
+    """
+    if environ.get(ICAV2_ACCESS_TOKEN_ENV_VAR) is not None:
+        return
+
+    environ[ICAV2_ACCESS_TOKEN_ENV_VAR] = boto3.client('secretsmanager').get_secret_value(
+        SecretId=environ[ICAV2_ACCESS_TOKEN_SECRET_ID_ENV_VAR]
+    )['SecretString']
+
+
+def set_orcabus_env_vars():
+    """
+    Resolve the orcabus token from secrets manager and the orcabus hostname from ssm
+    :return:
+    """
+    if environ.get(ORCABUS_TOKEN_ENV_VAR) is None:
+        environ[ORCABUS_TOKEN_ENV_VAR] = json.loads(
+            boto3.client('secretsmanager').get_secret_value(
+                SecretId=environ[ORCABUS_TOKEN_SECRET_ID_ENV_VAR]
+            )['SecretString']
+        )['id_token']
+
+    # HOSTNAME is always set inside a container, so we always resolve it from the ssm parameter
+    environ[HOSTNAME_ENV_VAR] = boto3.client('ssm').get_parameter(
+        Name=environ[HOSTNAME_SSM_PARAMETER_NAME_ENV_VAR]
+    )['Parameter']['Value']
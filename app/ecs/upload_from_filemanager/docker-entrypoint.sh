@@ -16,6 +16,11 @@ echo_stderr(){
 # IS_MULTIPART_FILE
 # DEST_PROJECT_ID
 # DEST_DATA_ID
+# And optionally
+# S3_OBJECT_ID
+# COPY_MODE
+# RESUME_TOKEN
+# SERVER_SIDE_COPY_ROLE_ARN
 
 # Static environment variable checks
 if [[ -z "${ICAV2_ACCESS_TOKEN_SECRET_ID:-}" ]]; then
@@ -59,34 +64,8 @@ if [[ -z "${DEST_DATA_ID:-}" ]]; then
   exit 1
 fi
 
-# Set ICAV2_ACCESS_TOKEN environment variable
-ICAV2_ACCESS_TOKEN="$( \
-  aws secretsmanager get-secret-value \
-    --secret-id "${ICAV2_ACCESS_TOKEN_SECRET_ID}" \
-    --output json \
-    --query SecretString | \
-  jq --raw-output
-)"
-export ICAV2_ACCESS_TOKEN
-
-# Set ORCABUS_TOKEN environment variable
-ORCABUS_TOKEN="$( \
-  aws secretsmanager get-secret-value \
-	--secret-id "${ORCABUS_TOKEN_SECRET_ID}" \
-	--output json \
-	--query SecretString | \
-  jq --raw-output 'fromjson | .id_token' \
-)"
-export ORCABUS_TOKEN
-
-# Set the HOSTNAME environment variable
-HOSTNAME="$( \
-  aws ssm get-parameter \
-	--name "${HOSTNAME_SSM_PARAMETER_NAME}" \
-	--output json | \
-  jq --raw-output '.Parameter.Value' \
-)"
-export HOSTNAME
+# The ICAV2_ACCESS_TOKEN, ORCABUS_TOKEN and HOSTNAME are resolved by the Python script itself,
+# in a single process rather than three aws cli calls
 
 # Set the arguments array for the upload_from_filemanager.py script
 UPLOAD_FROM_FILEMANAGER_ARGS_ARRAY=( \
@@ -100,6 +79,20 @@ if [[ "${IS_MULTIPART_FILE}" == "true" ]]; then
   UPLOAD_FROM_FILEMANAGER_ARGS_ARRAY+=( "--is-multipart-file" )
 fi
 
+if [[ -n "${S3_OBJECT_ID:-}" ]]; then
+  UPLOAD_FROM_FILEMANAGER_ARGS_ARRAY+=( "--s3-object-id" "${S3_OBJECT_ID}" )
+fi
+
+# Optional, set when the lambda handed off a part-finished multipart upload
+if [[ -n "${RESUME_TOKEN:-}" ]]; then
+  UPLOAD_FROM_FILEMANAGER_ARGS_ARRAY+=( "--resume-token" "${RESUME_TOKEN}" )
+fi
+
+# Optional, one of auto (default), server-side or stream
+if [[ -n "${COPY_MODE:-}" ]]; then
+  UPLOAD_FROM_FILEMANAGER_ARGS_ARRAY+=( "--copy-mode" "${COPY_MODE}" )
+fi
+
 # Run the Python script
 uv run python3 scripts/upload_from_filemanager.py \
   "${UPLOAD_FROM_FILEMANAGER_ARGS_ARRAY[@]}"
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+Server-side copy of an external s3 object into the (BYOB) destination bucket
+
+Streaming an external object through the container (presigned GET, then PUT or aws s3 cp -) moves every byte
+through Fargate. If a set of credentials can both read the source object and write the destination prefix,
+s3 can copy the object itself, with CopyObject for smaller objects, or UploadPartCopy (with parts copied in parallel)
+for larger objects.
+
+We try the following credentials in order
+
+1. A cross-account role (SERVER_SIDE_COPY_ROLE_ARN), if one is configured, that can read the source bucket
+   and write to the destination bucket
+2. The project folder credentials from ICAv2, in case the source bucket grants the ICAv2 storage role read access
+
+Each set of credentials is first checked with a HeadObject on the source.
+Anything that fails before bytes are copied raises ServerSideCopyNotPossible, in which case the caller should fall back
+to streaming.
+"""
+
+# Standard imports
+from os import environ
+from typing import Dict, List, Optional
+import logging
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# Vendored from the icav2_data_copy_tools layer
+from s3_parts import MAX_PART_COPY_WORKERS, copy_s3_object
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+SERVER_SIDE_COPY_ROLE_ARN_ENV_VAR = "SERVER_SIDE_COPY_ROLE_ARN"
+
+
+class ServerSideCopyNotPossible(Exception):
+    """
+    None of the available credentials can copy the object server-side
+    """
+    pass
+
+
+def get_s3_client(credentials: Dict[str, str], region: Optional[str] = None):
+    return boto3.client(
+        's3',
+        region_name=region,
+        aws_access_key_id=credentials['AccessKeyId'],
+        aws_secret_access_key=credentials['SecretAccessKey'],
+        aws_session_token=credentials['SessionToken'],
+        # One connection per part copy worker
+        config=Config(max_pool_connections=MAX_PART_COPY_WORKERS),
+    )
+
+
+def get_candidate_credentials_list(destination_credentials: Dict[str, str]) -> List[Dict[str, str]]:
+    """
+    Get the credentials we may copy with, the cross-account role (if configured) first
+    :param destination_credentials:
+    :return:
+    """
+    candidate_credentials_list = []
+
+    if environ.get(SERVER_SIDE_COPY_ROLE_ARN_ENV_VAR):
+        try:
+            candidate_credentials_list.append(
+                boto3.client('sts').assume_role(
+                    RoleArn=environ[SERVER_SIDE_COPY_ROLE_ARN_ENV_VAR],
+                    RoleSessionName="icav2-data-copy-server-side-copy",
+                )['Credentials']
+            )
+        except ClientError as e:
+            logger.warning(f"Could not assume the server-side copy role, {e}")
+
+    candidate_credentials_list.append(destination_credentials)
+
+    return candidate_credentials_list
+
+
+def can_read_source(s3_client, source_bucket: str, source_key: str) -> bool:
+    try:
+        s3_client.head_object(Bucket=source_bucket, Key=source_key)
+    except ClientError as e:
+        logger.info(f"Cannot read s3://{source_bucket}/{source_key} with these credentials, {e}")
+        return False
+    return True
+
+
+def server_side_copy(
+        source_bucket: str, source_key: str,
+        destination_bucket: str, destination_key: str,
+        file_size_in_bytes: int,
+        destination_credentials: Dict[str, str],
+        destination_region: Optional[str] = None,
+):
+    """
+    Copy the source object to the destination without streaming it through this container
+    :param source_bucket:
+    :param source_key:
+    :param destination_bucket:
+    :param destination_key:
+    :param file_size_in_bytes:
+    :param destination_credentials: The project folder credentials (AccessKeyId, SecretAccessKey, SessionToken)
+    :param destination_region:
+    :raises ServerSideCopyNotPossible: if no credentials can read the source, or the copy is denied before it starts
+    :return:
+    """
+    for credentials_iter_ in get_candidate_credentials_list(destination_credentials):
+        s3_client = get_s3_client(credentials_iter_, region=destination_region)
+
+        if not can_read_source(s3_client, source_bucket, source_key):
+            continue
+
+        try:
+            copy_s3_object(
+                s3_client,
+                source_bucket, source_key,
+                destination_bucket, destination_key,
+                file_size_in_bytes,
+            )
+        except ClientError as e:
+            # Can read the source, but cannot write to the destination (or copy across these buckets)
+            if e.response.get('Error', {}).get('Code') in ['AccessDenied', 'AllAccessDisabled', 'InvalidRequest']:
+                logger.info(f"Server-side copy denied with these credentials, {e}")
+                continue
+            raise
+
+        logger.info(
+            f"Copied s3://{source_bucket}/{source_key} to s3://{destination_bucket}/{destination_key} server-side"
+        )
+        return
+
+    raise ServerSideCopyNotPossible(
+        f"No credentials available to copy s3://{source_bucket}/{source_key} server-side"
+    )
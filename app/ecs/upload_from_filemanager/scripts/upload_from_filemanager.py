@@ -11,7 +11,17 @@ Rather than download + upload we perform the following steps:
 
 3. Generate a presigned URL for the file to be downloaded
 
-4. Create a temp shell script with the following template:
+If a resume token is given (the upload from filemanager lambda ran out of time part way through a multipart upload),
+we instead upload the remaining parts of that upload (see multipart_upload.py) and skip the steps below.
+
+Multipart source files are uploaded part by part (see multipart_upload.py), refreshing the destination credentials
+and the source presigned url as they near expiry, rather than through a single streamed aws s3 cp.
+Single part source files are uploaded as below.
+
+4. If the copy mode allows it, try a server-side copy (CopyObject / UploadPartCopy) of the source object
+   into the destination bucket (see server_side_copy.py), this skips steps 5 and 6 entirely
+
+5. Create a temp shell script with the following template:
 
 '
 #!/usr/bin/env bash
@@ -29,7 +39,7 @@ curl --fail-with-body --silent --show-error --location \
   --url "__UPLOAD_PRESIGNED_URL__"
 '
 
-We then run the shell script through subprocess.run with the following environment variables set
+6. We then run the shell script through subprocess.run with the following environment variables set
 
 1. AWS_ACCESS_KEY_ID - the access key id for this destination path
 2. AWS_SECRET_ACCESS_KEY - the secret access key for this destination path
@@ -57,8 +67,12 @@ from textwrap import dedent
 from tempfile import NamedTemporaryFile
 from subprocess import run
 from time import sleep
+from typing import Optional
 import argparse
-from urllib.parse import urlunparse, urlparse
+import json
+import logging
+from urllib.parse import urlparse
+
 import requests
 
 # Wrapica imports
@@ -71,20 +85,38 @@ from wrapica.project_data import (
 )
 from wrapica.utils.globals import FILE_DATA_TYPE
 
+# Local imports
+from server_side_copy import server_side_copy, ServerSideCopyNotPossible
+from multipart_upload import (
+    ExpiringValue, get_destination_s3_client_value, get_presigned_url_expiry, multipart_upload, resume_upload
+)
+from task_env import ORCABUS_TOKEN_ENV_VAR, HOSTNAME_ENV_VAR, set_icav2_env_vars, set_orcabus_env_vars
+
+# Set logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 # Globals
 POST_DELETION_WAIT_TIME = 5  # seconds, time to wait after deleting a file before trying to upload again
-ORCABUS_TOKEN_ENV_VAR = "ORCABUS_TOKEN"
-HOSTNAME_ENV_VAR = "HOSTNAME"
+# auto: try a server-side copy, fall back to streaming through this container
+# server-side: only try a server-side copy
+# stream: always stream through this container
+COPY_MODE_AUTO = "auto"
+COPY_MODE_SERVER_SIDE = "server-side"
+COPY_MODE_STREAM = "stream"
+
+# Both filemanager requests go to the same host, share the connection
+FILEMANAGER_SESSION = requests.Session()
 
 
-def get_presigned_url_from_filemanager_uri(filemanager_uri: str) -> str:
+def get_s3_object_id_from_filemanager_uri(filemanager_uri: str) -> str:
     """
-    Get the presigned url for the filemanager uri
+    Get the s3 object id of the current object at the filemanager uri
     :param filemanager_uri:
     :return:
     """
     filemanager_uri_obj = urlparse(filemanager_uri)
-    get_obj_req = requests.get(
+    get_obj_req = FILEMANAGER_SESSION.get(
         url=f"https://file.{environ[HOSTNAME_ENV_VAR]}/api/v1/s3",
         headers={
             "Accept": "application/json",
@@ -97,9 +129,20 @@ def get_presigned_url_from_filemanager_uri(filemanager_uri: str) -> str:
         },
     )
     get_obj_req.raise_for_status()
-    object_id = get_obj_req.json()['results'][0]['s3ObjectId']
+    return get_obj_req.json()['results'][0]['s3ObjectId']
+
+
+def get_presigned_url_from_filemanager_uri(filemanager_uri: str, object_id: Optional[str] = None) -> str:
+    """
+    Get the presigned url for the filemanager uri
+    :param filemanager_uri:
+    :param object_id: The s3 object id of the filemanager uri, if already known we skip the lookup
+    :return:
+    """
+    if object_id is None:
+        object_id = get_s3_object_id_from_filemanager_uri(filemanager_uri)
 
-    presign_req = requests.get(
+    presign_req = FILEMANAGER_SESSION.get(
         url=f"https://file.{environ[HOSTNAME_ENV_VAR]}/api/v1/s3/presign/{object_id}",
         headers={
             "Accept": "application/json",
@@ -113,6 +156,23 @@ def get_presigned_url_from_filemanager_uri(filemanager_uri: str) -> str:
     return presign_req.json()
 
 
+def get_download_url_value(source_uri: str, object_id: Optional[str] = None) -> ExpiringValue[str]:
+    """
+    Get the source presigned url, refreshed from the filemanager shortly before it expires
+    :param source_uri:
+    :param object_id:
+    :return:
+    """
+    if object_id is None:
+        object_id = get_s3_object_id_from_filemanager_uri(source_uri)
+
+    def _refresh():
+        presigned_url = get_presigned_url_from_filemanager_uri(source_uri, object_id=object_id)
+        return presigned_url, get_presigned_url_expiry(presigned_url)
+
+    return ExpiringValue(_refresh)
+
+
 def get_shell_script_template_for_single_part_file() -> str:
     """
 
@@ -139,32 +199,6 @@ def get_shell_script_template_for_single_part_file() -> str:
     )
 
 
-def get_shell_script_template_for_multipart_file() -> str:
-    """
-
-    :return:
-    """
-    return dedent(
-        """
-        #!/usr/bin/env bash
-
-        set -euo pipefail
-
-        # Download the file and upload it simulatenously
-        # Rather than using the icav2 upload url, we use the AWS CLI to upload to S3 directly,
-        # Since the AWS CLI can handle multipart uploads for large files, whereas curl cannot
-        curl \
-          --fail-with-body --silent --show-error --location \
-          --request GET \
-          --url "__DOWNLOAD_PRESIGNED_URL__" | \
-        aws s3 cp \
-          --expected-size "__FILE_SIZE_IN_BYTES__" \
-          - \
-          "__DESTINATION_S3_PATH__"
-        """
-    )
-
-
 def generate_single_part_shell_script(
         source_file_download_url: str,
         destination_file_upload_url: str,
@@ -188,33 +222,6 @@ def generate_single_part_shell_script(
     return temp_file_path
 
 
-def generate_multi_part_shell_script(
-        source_presigned_url: str,
-        destination_file_s3_path: str,
-        file_size_in_bytes: int
-):
-    # Create a temp file
-    temp_file_path = NamedTemporaryFile(
-        delete=False,
-        suffix=".sh"
-    ).name
-
-    # Write the shell script to the temp file
-    with open(temp_file_path, "w") as temp_file_h:
-        temp_file_h.write(
-            get_shell_script_template_for_multipart_file().replace(
-                "__DOWNLOAD_PRESIGNED_URL__", source_presigned_url
-            ).replace(
-                "__DESTINATION_S3_PATH__", destination_file_s3_path
-            ).replace(
-                "__FILE_SIZE_IN_BYTES__", str(file_size_in_bytes)
-            ) + "\n"
-        )
-
-    return temp_file_path
-
-
-
 def run_shell_script(
         destination_folder_object: ProjectData,
         shell_script_path: str,
@@ -277,6 +284,12 @@ def get_args():
         required=True,
         help="The uri of the source file"
     )
+    args.add_argument(
+        "--s3-object-id",
+        type=str,
+        required=False,
+        help="The filemanager s3 object id of the source file, saves looking it up from the source uri"
+    )
     args.add_argument(
         "--file-size-in-bytes",
         type=int,
@@ -288,6 +301,19 @@ def get_args():
         action='store_true',
         help="Whether the source file is a multipart file."
     )
+    args.add_argument(
+        "--resume-token",
+        type=json.loads,
+        required=False,
+        help="A resume token (json) from the upload from filemanager lambda, the remaining parts of the upload are uploaded."
+    )
+    args.add_argument(
+        "--copy-mode",
+        type=str,
+        choices=[COPY_MODE_AUTO, COPY_MODE_SERVER_SIDE, COPY_MODE_STREAM],
+        default=COPY_MODE_AUTO,
+        help="Whether to copy the file server-side, stream it through this container, or try server-side first (default)."
+    )
 
     # Dest args
     args.add_argument(
@@ -314,11 +340,12 @@ def main():
     :return:
     """
     args = get_args()
+    set_icav2_env_vars()
+    set_orcabus_env_vars()
 
-    # Get the source uri object from the filemanager uri
-    source_presigned_url = get_presigned_url_from_filemanager_uri(args.source_uri)
     source_filesize_in_bytes = args.file_size_in_bytes
     is_multipart_file = args.is_multipart_file
+    destination_file_name = Path(args.source_uri).name
 
     # Get the destination folder object
     destination_folder_object = get_project_data_obj_by_id(
@@ -326,34 +353,22 @@ def main():
         data_id=args.dest_data_id
     )
 
-    # Determine if the source object is a single part of multi part file based on the etag
-    if is_multipart_file:
-        # Multi part file, we can use aws s3 cp with --expected-size
-        storage_creds = get_aws_credentials_access_for_project_folder(
-            project_id=destination_folder_object.project_id,
-            folder_id=destination_folder_object.data.id
-        )
-        shell_script_path = generate_multi_part_shell_script(
-            source_presigned_url=source_presigned_url,
-            destination_file_s3_path=str(urlunparse((
-                's3',
-                storage_creds.bucket,
-                str(Path(storage_creds.object_prefix) / Path(args.source_uri).name),
-                None, None, None
-            ))),
-            file_size_in_bytes=source_filesize_in_bytes
-        )
-        run_shell_script(
-            destination_folder_object=destination_folder_object,
-            shell_script_path=shell_script_path,
+    # The lambda ran out of time part way through the upload, upload the remaining parts
+    if args.resume_token is not None:
+        s3_client_value, _, _ = get_destination_s3_client_value(destination_folder_object)
+        resume_upload(
+            s3_client_value=s3_client_value,
+            download_url_value=get_download_url_value(args.source_uri, object_id=args.s3_object_id),
+            resume_token=args.resume_token,
         )
         return
-    else:
+
+    if not is_multipart_file:
         # Check if the destination file exists
         try:
             existing_project_data_obj = get_project_data_obj_from_project_id_and_path(
                 project_id=destination_folder_object.project_id,
-                data_path=Path(destination_folder_object.data.details.path) / Path(args.source_uri).name,
+                data_path=Path(destination_folder_object.data.details.path) / destination_file_name,
                 data_type=FILE_DATA_TYPE
             )
             # If we have a partial file, we can delete it and re-upload
@@ -378,25 +393,69 @@ def main():
         except FileNotFoundError:
             pass
 
-        # Create the file object
-        destination_file_upload_url = create_file_with_upload_url(
+    # Try to copy the file server-side first, nothing is streamed through this container
+    if not args.copy_mode == COPY_MODE_STREAM:
+        storage_creds = get_aws_credentials_access_for_project_folder(
             project_id=destination_folder_object.project_id,
-            folder_id=destination_folder_object.data.id,
-            file_name=Path(args.source_uri).name
+            folder_id=destination_folder_object.data.id
         )
+        source_uri_obj = urlparse(args.source_uri)
+        try:
+            server_side_copy(
+                source_bucket=source_uri_obj.netloc,
+                source_key=source_uri_obj.path.lstrip('/'),
+                destination_bucket=storage_creds.bucket,
+                destination_key=str(Path(storage_creds.object_prefix) / destination_file_name),
+                file_size_in_bytes=source_filesize_in_bytes,
+                destination_credentials={
+                    'AccessKeyId': storage_creds.access_key,
+                    'SecretAccessKey': storage_creds.secret_key,
+                    'SessionToken': storage_creds.session_token,
+                },
+                destination_region=storage_creds.region,
+            )
+            return
+        except ServerSideCopyNotPossible as e:
+            if args.copy_mode == COPY_MODE_SERVER_SIDE:
+                raise
+            logger.info(f"{e}, falling back to streaming the file through this container")
 
-        # Get the shell script
-        shell_script_path = generate_single_part_shell_script(
-            source_file_download_url=source_presigned_url,
-            destination_file_upload_url=destination_file_upload_url,
+    # Determine if the source object is a single part of multi part file based on the etag
+    if is_multipart_file:
+        # Multi part file, upload part by part, refreshing the credentials and presigned url as needed
+        s3_client_value, destination_bucket, destination_object_prefix = get_destination_s3_client_value(
+            destination_folder_object
         )
-
-        # Run the shell script
-        run_shell_script(
-            shell_script_path=shell_script_path,
-            destination_folder_object=destination_folder_object
+        multipart_upload(
+            s3_client_value=s3_client_value,
+            download_url_value=get_download_url_value(args.source_uri, object_id=args.s3_object_id),
+            bucket=destination_bucket,
+            key=str(Path(destination_object_prefix) / destination_file_name),
+            file_size_in_bytes=source_filesize_in_bytes,
         )
+        return
 
+    # Get the source uri object from the filemanager uri
+    source_presigned_url = get_presigned_url_from_filemanager_uri(args.source_uri, object_id=args.s3_object_id)
+
+    # Create the file object
+    destination_file_upload_url = create_file_with_upload_url(
+        project_id=destination_folder_object.project_id,
+        folder_id=destination_folder_object.data.id,
+        file_name=destination_file_name
+    )
+
+    # Get the shell script
+    shell_script_path = generate_single_part_shell_script(
+        source_file_download_url=source_presigned_url,
+        destination_file_upload_url=destination_file_upload_url,
+    )
+
+    # Run the shell script
+    run_shell_script(
+        shell_script_path=shell_script_path,
+        destination_folder_object=destination_folder_object
+    )
 
 if __name__ == "__main__":
     main()
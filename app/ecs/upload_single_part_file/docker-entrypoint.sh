@@ -39,15 +39,8 @@ if [[ -z "${DEST_DATA_ID:-}" ]]; then
   exit 1
 fi
 
-# Set ICAV2_ACCESS_TOKEN environment variable
-ICAV2_ACCESS_TOKEN="$( \
-  aws secretsmanager get-secret-value \
-    --secret-id "${ICAV2_ACCESS_TOKEN_SECRET_ID}" \
-    --output json \
-    --query SecretString | \
-  jq --raw-output
-)"
-export ICAV2_ACCESS_TOKEN
+# The ICAV2_ACCESS_TOKEN is resolved from the secret by the Python script itself,
+# saving the startup time of the aws cli
 
 # Run the Python script
 uv run python3 scripts/upload_single_part_file.py \
@@ -67,6 +67,9 @@ from wrapica.project_data import (
 )
 from wrapica.utils.globals import FILE_DATA_TYPE
 
+# Local imports
+from task_env import set_icav2_env_vars
+
 # Globals
 POST_DELETION_WAIT_TIME = 5  # seconds, time to wait after deleting a file before trying to upload again
 
@@ -195,6 +198,7 @@ def main():
     :return:
     """
     args = get_args()
+    set_icav2_env_vars()
 
     # Get the source file object
     source_object = get_project_data_obj_by_id(
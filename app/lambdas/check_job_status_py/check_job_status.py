@@ -25,14 +25,51 @@ The event input is
     "wait_time_seconds": int  # Number of seconds to wait before checking the job status - we add 10 seconds each time we go through this loop
 }
 
+The internal heartbeat instead checks all active jobs in a single invocation, with the event input
+{
+    "jobList": [
+        {
+            "jobId": "abcd-1234-efgh-5678",
+            "createdAt": 1234567890,  # Epoch seconds
+            "nextCheckAt": 1234567890,
+            "nextHeartbeatAt": 1234567890,
+            "fileCount": 2,
+            "totalSizeInBytes": 1234567890
+        },
+        ...
+    ]
+}
+
+The status of each job is only checked once its next check is due.
+The check interval adapts to the job, young or small jobs (likely to finish soon) are checked every minute,
+older and larger jobs are checked less often, up to every 30 minutes.
+Heartbeats are due every 90 seconds regardless, so the wait for the job never misses its 300 second heartbeat deadline.
+The next check and heartbeat times are saved to the job table.
+
+The job statuses are fetched concurrently and returned as a map of job id to summarised status
+{
+    "jobStatusMap": {
+        "abcd-1234-efgh-5678": "RUNNING",  # Send a heartbeat
+        "efgh-1234-abcd-5678": "NOT_DUE",  # Nothing to do this time
+        ...
+    }
+}
+
+Jobs whose status could not be fetched are left out of the map, the heartbeat treats them as still running.
 """
 
 # Standard imports
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from os import environ
+from typing import Dict, List, Optional
+
+import boto3
 
 # Layer imports
-from icav2_tools import set_icav2_env_vars
+from icav2_data_copy_tools import set_icav2_env_vars, icav2_call_slot
 
 # Wrapica imports
 from wrapica.job import get_job
@@ -51,6 +88,19 @@ MAX_JOB_ATTEMPT_COUNTER = 10
 DEFAULT_WAIT_TIME_SECONDS = 10
 DEFAULT_WAIT_TIME_SECONDS_EXT = 10
 
+# Job statuses fetched at once, the shared icav2 rate limiter bounds the in-flight calls further
+MAX_JOB_STATUS_WORKERS = 16
+
+# Adaptive polling
+# The internal heartbeat rule runs every minute, the wait for the job times out without a heartbeat after 300 seconds
+HEARTBEAT_INTERVAL = timedelta(seconds=90)
+MIN_CHECK_INTERVAL = timedelta(minutes=1)
+MAX_CHECK_INTERVAL = timedelta(minutes=30)
+# Check a job roughly ten times over its expected duration (or its age, once it has run longer than expected)
+CHECK_INTERVAL_FRACTION = 0.1
+ASSUMED_COPY_BYTES_PER_SECOND = 100 * 1024 ** 2
+ASSUMED_COPY_SECONDS_PER_FILE = 1
+
 
 def summarise_job_status(job_status: str) -> str:
     if job_status in ['INITIALIZED', 'WAITING_FOR_RESOURCES', 'RUNNING']:
@@ -60,6 +110,153 @@ def summarise_job_status(job_status: str) -> str:
     return 'SUCCEEDED'
 
 
+def get_summarised_job_status(job_id: str) -> Optional[str]:
+    """
+    Get the summarised status of a job, None if the status could not be fetched
+    :param job_id:
+    :return:
+    """
+    try:
+        with icav2_call_slot():
+            return summarise_job_status(get_job(job_id).status)
+    except Exception as e:
+        logger.warning(f"Could not get the status of job {job_id}, {e}")
+        return None
+
+
+def get_check_interval(job: Dict, now: datetime) -> timedelta:
+    """
+    Get the time until the next status check of a running job.
+    We expect the copy to take roughly its size over the assumed throughput, plus a little per file,
+    and check a fraction of the way through that (or through the job's age once it has run longer than expected)
+    :param job:
+    :param now:
+    :return:
+    """
+    expected_duration = timedelta(seconds=(
+        (job.get('totalSizeInBytes') or 0) / ASSUMED_COPY_BYTES_PER_SECOND +
+        (job.get('fileCount') or 0) * ASSUMED_COPY_SECONDS_PER_FILE
+    ))
+    age = (
+        now - datetime.fromtimestamp(job['createdAt'], tz=timezone.utc)
+        if job.get('createdAt') is not None
+        else timedelta(0)
+    )
+
+    return min(MAX_CHECK_INTERVAL, max(MIN_CHECK_INTERVAL, max(expected_duration, age) * CHECK_INTERVAL_FRACTION))
+
+
+def is_due(due_at: Optional[int], now: datetime) -> bool:
+    return due_at is None or datetime.fromtimestamp(due_at, tz=timezone.utc) <= now
+
+
+def save_job_schedule(
+        dynamodb_client,
+        job_id: str,
+        next_check_at: Optional[datetime],
+        next_heartbeat_at: Optional[datetime]
+):
+    """
+    Save the next check and heartbeat times of a job, unless the job row has since been removed (i.e the job finished)
+    :param dynamodb_client:
+    :param job_id:
+    :param next_check_at:
+    :param next_heartbeat_at:
+    :return:
+    """
+    schedule = dict(filter(
+        lambda schedule_iter_: schedule_iter_[1] is not None,
+        {
+            "next_check_at": next_check_at,
+            "next_heartbeat_at": next_heartbeat_at,
+        }.items()
+    ))
+    if len(schedule) == 0:
+        return
+
+    try:
+        dynamodb_client.update_item(
+            TableName=environ['TABLE_NAME'],
+            Key={
+                "id": {"S": job_id},
+                "id_type": {"S": "JOB_ID"},
+            },
+            UpdateExpression="SET " + ", ".join(map(
+                lambda attribute_name_iter_: f"{attribute_name_iter_} = :{attribute_name_iter_}",
+                schedule.keys()
+            )),
+            ConditionExpression="attribute_exists(id)",
+            ExpressionAttributeValues={
+                f":{attribute_name_iter_}": {"N": str(int(due_at_iter_.timestamp()))}
+                for attribute_name_iter_, due_at_iter_ in schedule.items()
+            },
+        )
+    except dynamodb_client.exceptions.ConditionalCheckFailedException:
+        logger.info(f"Job {job_id} is no longer in the table, not saving its schedule")
+
+
+def get_scheduled_job_status(dynamodb_client, job: Dict, now: datetime) -> Optional[str]:
+    """
+    Check the status of a job if its check is due, and schedule its next check and heartbeat
+    :param dynamodb_client:
+    :param job:
+    :param now:
+    :return: The summarised job status, NOT_DUE if neither the check nor the heartbeat is due,
+      or None if the status could not be fetched
+    """
+    is_check_due = is_due(job.get('nextCheckAt'), now)
+    is_heartbeat_due = is_due(job.get('nextHeartbeatAt'), now)
+
+    if not is_check_due and not is_heartbeat_due:
+        return 'NOT_DUE'
+
+    if is_check_due:
+        job_status = get_summarised_job_status(job['jobId'])
+        # Still send the heartbeat, and check again next time
+        if job_status is None:
+            return None
+        # The job row is removed once the step function has been told
+        if job_status != 'RUNNING':
+            return job_status
+
+    save_job_schedule(
+        dynamodb_client,
+        job['jobId'],
+        next_check_at=now + get_check_interval(job, now) if is_check_due else None,
+        next_heartbeat_at=now + HEARTBEAT_INTERVAL if is_heartbeat_due else None,
+    )
+
+    return 'RUNNING' if is_heartbeat_due else 'NOT_DUE'
+
+
+def get_job_status_map(job_list: List[Dict]) -> Dict[str, str]:
+    """
+    Get the summarised status of each job, concurrently
+    :param job_list:
+    :return:
+    """
+    if len(job_list) == 0:
+        return {}
+
+    now = datetime.now(timezone.utc)
+    # Clients are thread-safe once created, but creating them is not
+    dynamodb_client = boto3.client('dynamodb')
+
+    with ThreadPoolExecutor(max_workers=min(MAX_JOB_STATUS_WORKERS, len(job_list))) as executor:
+        job_status_list = list(executor.map(
+            lambda job_iter_: get_scheduled_job_status(dynamodb_client, job_iter_, now),
+            job_list
+        ))
+
+    return dict(filter(
+        lambda job_status_iter_: job_status_iter_[1] is not None,
+        zip(
+            map(lambda job_iter_: job_iter_['jobId'], job_list),
+            job_status_list
+        )
+    ))
+
+
 def handler(event, context):
     """
     Get the job status of a job id
@@ -69,6 +266,12 @@ def handler(event, context):
     """
     set_icav2_env_vars()
 
+    # Check all active jobs at once
+    if event.get("jobList") is not None:
+        return {
+            "jobStatusMap": get_job_status_map(event.get("jobList"))
+        }
+
     # Get params
     job_id: str = event.get("jobId")
 
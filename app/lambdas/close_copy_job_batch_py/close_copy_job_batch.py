@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+"""
+Close a copy job batch to new members, and collect the source data of every member
+
+Source data requested by more than one member is only copied once.
+The batch copy job is scheduled at the highest priority of the members.
+
+The event input is
+{
+    "destinationData": {
+        "projectId": "abcdefghijklmnop",
+        "dataId": "fol.1234567890"
+    },
+    "batchId": "abcd-1234-efgh-5678"
+}
+
+Returns the source data manifest of the batch copy job, with the total size of its files
+{
+    "sourceDataManifest": {
+        "bucket": "...",
+        "key": "...",
+        "count": 12
+    },
+    "totalSizeInBytes": 123456789,
+    "priority": "NORMAL"
+}
+"""
+
+# Standard imports
+import logging
+
+# Layer imports
+from icav2_data_copy_tools import get_copy_job_batcher, close_copy_job_batch
+
+# Set logging
+logging.basicConfig()
+logger = logging.getLogger()
+logger.setLevel(level=logging.INFO)
+
+
+def handler(event, context):
+    """
+    Close the copy job batch
+    :param event:
+    :param context:
+    :return:
+    """
+    # Get params
+    destination_data = event.get("destinationData")
+    batch_id: str = event.get("batchId")
+
+    return close_copy_job_batch(
+        get_copy_job_batcher(),
+        destination_data=destination_data,
+        batch_id=batch_id,
+    )
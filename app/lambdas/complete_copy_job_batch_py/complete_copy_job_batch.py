@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+"""
+Send the result of a copy job batch's copy job to every member waiting on it
+
+The event input is
+{
+    "batchId": "abcd-1234-efgh-5678",
+    "jobId": "abcd-1234-efgh-5678",  # Or null if every file was copied directly
+    "status": "SUCCEEDED"  # Or FAILED
+}
+"""
+
+# Standard imports
+import logging
+
+# Layer imports
+from icav2_data_copy_tools import get_copy_job_batcher, complete_copy_job_batch
+
+# Set logging
+logging.basicConfig()
+logger = logging.getLogger()
+logger.setLevel(level=logging.INFO)
+
+
+def handler(event, context):
+    """
+    Complete the copy job batch
+    :param event:
+    :param context:
+    :return:
+    """
+    # Get params
+    batch_id: str = event.get("batchId")
+    job_id: str = event.get("jobId")
+    status: str = event.get("status")
+
+    completed_count = complete_copy_job_batch(
+        get_copy_job_batcher(),
+        batch_id=batch_id,
+        job_id=job_id,
+        status=status,
+    )
+    logger.info(f"Sent copy job batch {batch_id} status {status} to {completed_count} waiting members")
+
+    return {
+        "completedCount": completed_count,
+    }
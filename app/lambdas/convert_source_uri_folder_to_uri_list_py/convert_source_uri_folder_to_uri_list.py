@@ -9,34 +9,36 @@ Inputs:
 
 Outputs:
   * sourceUriList: A list of URIs, each representing a file or folder in the folder
+
+The folder is listed as a stream of lightweight records, page by page,
+so we never hold the full list of project data models in memory.
 """
 
 # Standard imports
-from typing import List
+from typing import Iterator
 
 # Layer imports
-from icav2_tools import set_icav2_env_vars
+from icav2_data_copy_tools import (
+    set_icav2_env_vars,
+    iter_project_data_records,
+)
 
 # Wrapica imports
 from wrapica.project_data import (
     coerce_data_id_or_uri_to_project_data_obj,
-    ProjectData, list_project_data_non_recursively,
+    ProjectData,
 )
 
 
-def get_files_and_folders_in_project_folder_non_recursively(project_data_folder: ProjectData) -> List[ProjectData]:
+def get_files_and_folders_in_project_folder_non_recursively(project_data_folder: ProjectData) -> Iterator[str]:
     """
-    Given a project data folder, return a list of all files in the folder
+    Given a project data folder, yield the uri of each file and folder directly under the folder
     """
-
-    # Get the file list
-    data_list = list_project_data_non_recursively(
+    for project_data_record_iter_ in iter_project_data_records(
         project_id=project_data_folder.project_id,
         parent_folder_id=project_data_folder.data.id,
-    )
-
-    # Return the list of files (and this one)
-    return data_list
+    ):
+        yield project_data_record_iter_.uri
 
 
 def handler(event, context):
@@ -50,15 +52,8 @@ def handler(event, context):
     source_project_data_obj = coerce_data_id_or_uri_to_project_data_obj(source_uri)
 
     # Get the list of files and folders in the source project data object
-    sub_folder_list = list_project_data_non_recursively(
-        project_id=source_project_data_obj.project_id,
-        parent_folder_id=source_project_data_obj.data.id,
-    )
-
     return {
-        "sourceUriList": list(map(
-            lambda
-                project_data_iter_: f"icav2://{project_data_iter_.project_id}{project_data_iter_.data.details.path}",
-            sub_folder_list
+        "sourceUriList": list(get_files_and_folders_in_project_folder_non_recursively(
+            source_project_data_obj
         ))
     }
@@ -3,15 +3,43 @@
 """
 Given a list of icav2 project data objects (project id / data id),
 find those that are uploaded as a single-part file (eTag does not contain a dash).
+
+The data list may be given inline (dataList) or as a manifest pointer (dataManifest),
+both outputs are written to s3 as JSONL manifests and only the manifest pointers are returned.
+
+If the lambda has been configured with a work queue and we are given the destinationData,
+single-part files under 8 MB are sent to the work queue as soon as they are classified,
+so the upload workers can start transferring data while we are still classifying the rest of the list.
+These files are not written to the single-part manifest.
+At the end of each invocation, we record the number of files queued by this invocation against its own request id
+(derived from the index the invocation started at) and return the list of work queue segments (requestId / queuedCount).
+The step function then sends a barrier message to the work queue for each segment and waits for the workers to finish.
+
+If we run low on time, we write the lists gathered so far as part manifests and return a continuationCursor instead,
+the step function then calls us again with the cursor until the data list has been classified.
 """
 
 # Standard imports
-from typing import List, Dict
+from itertools import chain, islice
+from typing import Dict, List, Optional, Union
+from uuid import uuid4
 import re
 import logging
 
 # Layer imports
-from icav2_tools import set_icav2_env_vars
+from icav2_data_copy_tools import (
+    set_icav2_env_vars,
+    ManifestPointer,
+    TimeBudget,
+    WorkQueueWriter,
+    DynamoDbWorkQueueTracker,
+    get_continuation_cursor,
+    save_partial_results,
+    iter_partial_results,
+    iter_manifest_or_list,
+    write_manifest,
+    get_work_queue,
+)
 
 # Wrapica imports
 from wrapica.project_data import (
@@ -26,9 +54,46 @@ logger.setLevel(level=logging.INFO)
 
 # Globals
 MULTI_PART_ETAG_REGEX = re.compile(r"\w+-\d+")
+SMALL_FILE_SIZE_LIMIT = 8 * 1024 * 1024  # 8 MiB, matches the lambda / ECS choice in the step function
+
+
+def close_work_queue_segment(
+        work_queue_writer: Optional[WorkQueueWriter],
+        work_queue_segments: List[Dict[str, Union[str, int]]],
+        start_index: int,
+        end_index: Optional[int] = None
+) -> List[Dict[str, Union[str, int]]]:
+    """
+    Flush any remaining queued items and let the workers know how many items to expect for this invocation
+    :param work_queue_writer:
+    :param work_queue_segments: The segments of previous invocations
+    :param start_index: The index of the first data item classified by this invocation
+    :param end_index: The index of the first data item left for the next invocation, None if there is none
+    :return:
+    """
+    if work_queue_writer is None:
+        return work_queue_segments
+
+    work_queue_writer.flush()
+    if work_queue_writer.count == 0:
+        return work_queue_segments
+
+    DynamoDbWorkQueueTracker(work_queue_writer.request_id).set_expected_count(
+        work_queue_writer.count,
+        start_index=start_index,
+        end_index=end_index
+    )
+    logger.info(f"Queued {work_queue_writer.count} small files to the work queue")
+
+    return work_queue_segments + [
+        {
+            "requestId": work_queue_writer.request_id,
+            "queuedCount": work_queue_writer.count,
+        }
+    ]
 
 
-def handler(event, context) -> Dict[str, List[Dict[str, str]]]:
+def handler(event, context) -> Dict[str, Union[ManifestPointer, Optional[Dict], List]]:
     """
     Generate the copy objects
     :param event:
@@ -38,12 +103,64 @@ def handler(event, context) -> Dict[str, List[Dict[str, str]]]:
     set_icav2_env_vars()
 
     # Get inputs
-    data_list: List[Dict[str, str]] = event["dataList"]
+    data_manifest_or_list = event.get("dataManifest", event.get("dataList"))
+    manifest_prefix: Optional[str] = event.get("manifestPrefix")
+    destination_data: Optional[Dict[str, str]] = event.get("destinationData")
+    continuation_cursor = get_continuation_cursor(event)
+    time_budget = TimeBudget(context)
 
     single_part_files_list = []
     multi_part_files_list = []
 
-    for source_data_dict in data_list:
+    # Only pipeline small files if we have somewhere to send them
+    work_queue = get_work_queue() if destination_data is not None else None
+    work_queue_writer: Optional[WorkQueueWriter] = None
+    if work_queue is not None:
+        # The request id is derived from the segment we start at, so a retried attempt shares the tracker
+        # of the failed attempt, items queued by both attempts are only counted once (by their item index)
+        work_queue_writer = WorkQueueWriter(
+            work_queue,
+            request_id=(
+                f"{manifest_prefix}/work-queue/{continuation_cursor['nextIndex']}"
+                if manifest_prefix is not None
+                else str(uuid4())
+            )
+        )
+
+    # Skip over the data classified by previous invocations
+    data_iter = enumerate(
+        islice(iter_manifest_or_list(data_manifest_or_list), continuation_cursor["nextIndex"], None),
+        start=continuation_cursor["nextIndex"]
+    )
+
+    for data_index, source_data_dict in data_iter:
+        # Hand over to the next invocation before we run out of time
+        if data_index > continuation_cursor["nextIndex"] and time_budget.is_exhausted():
+            logger.info(f"Running low on time, continuing from data item {data_index} in the next invocation")
+            return {
+                "continuationCursor": {
+                    **save_partial_results(
+                        continuation_cursor,
+                        next_index=data_index,
+                        partial_results={
+                            "multiPartDataList": multi_part_files_list,
+                            "singlePartDataList": single_part_files_list,
+                        },
+                        manifest_prefix=manifest_prefix
+                    ),
+                    "workQueueSegments": close_work_queue_segment(
+                        work_queue_writer,
+                        continuation_cursor.get("workQueueSegments", []),
+                        start_index=continuation_cursor["nextIndex"],
+                        end_index=data_index
+                    ),
+                },
+                # Set once all data has been classified
+                "workQueueSegments": None,
+                "multiPartDataManifest": None,
+                "singlePartDataManifest": None,
+            }
+
         project_data_obj = get_project_data_obj_by_id(
             project_id=source_data_dict.get("projectId"),
             data_id=source_data_dict.get("dataId"),
@@ -51,13 +168,36 @@ def handler(event, context) -> Dict[str, List[Dict[str, str]]]:
 
         if MULTI_PART_ETAG_REGEX.fullmatch(project_data_obj.data.details.object_e_tag) is not None:
             multi_part_files_list.append(source_data_dict)
+        elif (
+                work_queue_writer is not None and
+                project_data_obj.data.details.file_size_in_bytes < SMALL_FILE_SIZE_LIMIT
+        ):
+            # Start the transfer straight away
+            work_queue_writer.put({
+                "itemIndex": data_index,
+                "sourceData": source_data_dict,
+                "destinationData": destination_data,
+            })
         else:
             single_part_files_list.append(source_data_dict)
 
-
     return {
-        "multiPartDataList": multi_part_files_list,
-        "singlePartDataList": single_part_files_list,
+        "continuationCursor": None,
+        "workQueueSegments": close_work_queue_segment(
+            work_queue_writer,
+            continuation_cursor.get("workQueueSegments", []),
+            start_index=continuation_cursor["nextIndex"]
+        ),
+        "multiPartDataManifest": write_manifest(
+            chain(iter_partial_results(continuation_cursor, "multiPartDataList"), multi_part_files_list),
+            manifest_name="multiPartDataList",
+            manifest_prefix=manifest_prefix
+        ),
+        "singlePartDataManifest": write_manifest(
+            chain(iter_partial_results(continuation_cursor, "singlePartDataList"), single_part_files_list),
+            manifest_name="singlePartDataList",
+            manifest_prefix=manifest_prefix
+        ),
     }
 
 
@@ -21,17 +21,30 @@ item in the recursiveCopyJobsList.
 
 Due to AWS S3 Object tagging bugs, it's important each folder is part of its own job so we can handle single-part files correctly.
 
+Since the lists above scale with the size of the request, each list is written to s3 as a JSONL manifest
+(under the manifestPrefix, usually the step function execution name) and only the manifest pointer is returned.
+
+If we run low on time, we write the lists gathered so far as part manifests and return a continuationCursor instead,
+the step function then calls us again with the cursor until all source uris have been processed.
+
 """
 
 # Standard imports
-from typing import List, Dict, Union
+from typing import List, Dict, Optional, Union
 from pathlib import Path
+from itertools import chain
 import logging
 
-from fastapi.encoders import jsonable_encoder
-
 # Layer imports
-from icav2_tools import set_icav2_env_vars
+from icav2_data_copy_tools import (
+    set_icav2_env_vars,
+    to_json_serialisable,
+    TimeBudget,
+    get_continuation_cursor,
+    save_partial_results,
+    iter_partial_results,
+    write_manifest,
+)
 
 # Wrapica imports
 from wrapica.project_data import (
@@ -45,7 +58,7 @@ logger = logging.getLogger()
 logger.setLevel(level=logging.INFO)
 
 
-def handler(event, context) -> Dict[str, List[Dict[str, Union[str, List[str]]]]]:
+def handler(event, context) -> Dict[str, Optional[Dict]]:
     """
     Generate the copy objects
     :param event:
@@ -58,13 +71,16 @@ def handler(event, context) -> Dict[str, List[Dict[str, Union[str, List[str]]]]]
     # Get inputs
     source_uri_list: List[str] = event["sourceUriList"]
     destination_uri: str = event["destinationUri"]
+    manifest_prefix: Optional[str] = event.get("manifestPrefix")
+    continuation_cursor = get_continuation_cursor(event)
+    time_budget = TimeBudget(context)
 
     # Check destination uri endswith "/"
     if not destination_uri.endswith("/"):
         raise ValueError("Destination uri must end with a '/'")
 
     # Coerce the source and destination uris to project data objects
-    source_list: List[Dict[str, str]] = []
+    source_list: List[Dict[str, Union[str, int]]] = []
     recursive_copy_jobs_list: List[Dict[str, Union[str, List[str]]]] = []
     parent_destination_project_data_obj = coerce_data_id_or_uri_to_project_data_obj(
         destination_uri,
@@ -72,7 +88,32 @@ def handler(event, context) -> Dict[str, List[Dict[str, Union[str, List[str]]]]]
     )
     external_source_data_uri_list = []
 
-    for source_uri_iter_ in source_uri_list:
+    for source_uri_index, source_uri_iter_ in enumerate(source_uri_list):
+        # Skip over the source uris handled by previous invocations
+        if source_uri_index < continuation_cursor["nextIndex"]:
+            continue
+
+        # Hand over to the next invocation before we run out of time
+        if source_uri_index > continuation_cursor["nextIndex"] and time_budget.is_exhausted():
+            logger.info(f"Running low on time, continuing from source uri {source_uri_index} in the next invocation")
+            return {
+                "continuationCursor": save_partial_results(
+                    continuation_cursor,
+                    next_index=source_uri_index,
+                    partial_results={
+                        "sourceDataList": source_list,
+                        "recursiveCopyJobsUriList": recursive_copy_jobs_list,
+                        "externalSourceDataUriList": external_source_data_uri_list,
+                    },
+                    manifest_prefix=manifest_prefix
+                ),
+                # Set once all source uris have been processed
+                "sourceDataManifest": None,
+                "destinationData": None,
+                "recursiveCopyJobsUriManifest": None,
+                "externalSourceDataUriManifest": None,
+            }
+
         try:
             source_project_data_obj = coerce_data_id_or_uri_to_project_data_obj(source_uri_iter_)
         except (NotADirectoryError, FileNotFoundError, StopIteration) as e:
@@ -84,8 +125,10 @@ def handler(event, context) -> Dict[str, List[Dict[str, Union[str, List[str]]]]]
             # Easy, simple case
             source_list.append(
                 {
-                    "projectId": source_project_data_obj.project_id,
+                    "projectId": str(source_project_data_obj.project_id),
                     "dataId": source_project_data_obj.data.id,
+                    # Used to weigh the copy job when scheduling it against other requests
+                    "fileSizeInBytes": source_project_data_obj.data.details.file_size_in_bytes or 0,
                 }
             )
             continue
@@ -97,14 +140,30 @@ def handler(event, context) -> Dict[str, List[Dict[str, Union[str, List[str]]]]]
             }
         )
 
-    return jsonable_encoder({
-        "sourceDataList": source_list,
+    return to_json_serialisable({
+        "continuationCursor": None,
+        "sourceDataManifest": write_manifest(
+            chain(iter_partial_results(continuation_cursor, "sourceDataList"), source_list),
+            manifest_name="sourceDataList",
+            manifest_prefix=manifest_prefix
+        ),
         "destinationData": {
             "projectId": parent_destination_project_data_obj.project_id,
             "dataId": parent_destination_project_data_obj.data.id,
         },
-        "recursiveCopyJobsUriList": recursive_copy_jobs_list,
-        "externalSourceDataUriList": external_source_data_uri_list
+        "recursiveCopyJobsUriManifest": write_manifest(
+            chain(iter_partial_results(continuation_cursor, "recursiveCopyJobsUriList"), recursive_copy_jobs_list),
+            manifest_name="recursiveCopyJobsUriList",
+            manifest_prefix=manifest_prefix
+        ),
+        "externalSourceDataUriManifest": write_manifest(
+            chain(
+                iter_partial_results(continuation_cursor, "externalSourceDataUriList"),
+                external_source_data_uri_list
+            ),
+            manifest_name="externalSourceDataUriList",
+            manifest_prefix=manifest_prefix
+        ),
     })
 
 
@@ -1,29 +1,53 @@
 #!/usr/bin/env python3
 
 """
-Given an externalSourceUri, get the filesize and determine if the file is a single part file or a multi part file
-"""
+Given the externalSourceUriManifest (or an inline externalSourceUriList), get the file size, eTag,
+multipart flag and filemanager s3ObjectId of every external source uri.
+
+Rather than one filemanager lookup per uri, the uris are grouped by bucket
+and the filemanager is queried for the exact keys of each group in bulk.
 
-# Standard imports
-import typing
+The metadata is written to s3 as a JSONL manifest (under the manifestPrefix) and only the manifest pointer is returned,
+each line looks like the following
 
-# API imports
-from orcabus_api_tools.filemanager import get_file_object_from_s3_uri
+{
+    "externalSourceUri": "s3://bucket/path/to/file.txt",
+    "s3ObjectId": "0190...",
+    "sourceFileSizeInBytes": 1234,
+    "eTag": "\"abcdef-2\"",
+    "isMultipartFile": true
+}
+
+The s3ObjectId is passed on to the upload steps, so they only need to request the presigned url.
+
+A single externalSourceUri is still accepted, in which case the metadata of that uri is returned directly.
+"""
+
+# Layer imports
+from icav2_data_copy_tools import (
+    get_external_source_file_metadata_list,
+    iter_manifest_or_list,
+    write_manifest,
+)
 
-if typing.TYPE_CHECKING:
-    from orcabus_api_tools.filemanager.models import FileObject
 
 def handler(event, context):
     """
-    Get the inputs, get the filesize and determine if the file is a single part file or a multi part file
+    Get the inputs, get the metadata of each external source uri in bulk
     """
+    # Single external source uri
+    if 'externalSourceUri' in event:
+        return get_external_source_file_metadata_list([event['externalSourceUri']])[0]
 
-    # Get the external source uri
-    external_source_uri = event['externalSourceUri']
-
-    file_obj: 'FileObject' = get_file_object_from_s3_uri(external_source_uri)
+    # The external source uri list may be given inline or as a manifest pointer
+    external_source_uri_manifest_or_list = event.get(
+        'externalSourceUriManifest', event.get('externalSourceUriList')
+    )
 
     return {
-        'sourceFileSizeInBytes': file_obj['size'],
-        'isMultipartFile': (True if "-" in file_obj['eTag'] else False)
+        'externalSourceFileMetadataManifest': write_manifest(
+            get_external_source_file_metadata_list(iter_manifest_or_list(external_source_uri_manifest_or_list)),
+            manifest_name="externalSourceFileMetadataList",
+            manifest_prefix=event.get("manifestPrefix")
+        )
     }
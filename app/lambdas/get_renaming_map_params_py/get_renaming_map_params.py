@@ -16,6 +16,10 @@ Get the following outputs:
 
 Find the relative path from the sourceUriList and the dataId and then append that relative path to the destinationUri
 This gives us the full destination path for the copied file, we can also replace the basename with the outputFileName to get the final destination path
+
+Matching the dataId against each source uri requires an api call per source uri.
+If we run low on time, we return a continuationCursor (the index of the next source uri to check) instead,
+the step function then calls us again with the cursor.
 """
 
 # Standard imports
@@ -23,10 +27,14 @@ from typing import List
 from pathlib import Path
 from urllib.parse import urlparse, urlunparse
 
-from fastapi.encoders import jsonable_encoder
-
 # Layer imports
-from icav2_tools import set_icav2_env_vars
+from icav2_data_copy_tools import (
+    set_icav2_env_vars,
+    to_json_serialisable,
+    TimeBudget,
+    get_continuation_cursor,
+    iter_manifest_or_list,
+)
 
 # Wrapica imports
 from wrapica.data import get_data_obj_from_data_id
@@ -50,11 +58,16 @@ def handler(event, context):
 
     # Get the inputs
     source_uri_list: List[str] = event['sourceUriList']
-    external_source_uri_list: List[str] = event['externalSourceUriList']
+    # The external source uri list may be given inline or as a manifest pointer
+    external_source_uri_list: List[str] = list(iter_manifest_or_list(
+        event.get('externalSourceUriManifest', event.get('externalSourceUriList'))
+    ))
     destination_uri: str = event['destinationUri']
     data_id: str = event.get('dataId')
     input_file_uri: str = event.get('inputFileUri')
     output_file_name: str = event['outputFileName']
+    continuation_cursor = get_continuation_cursor(event)
+    time_budget = TimeBudget(context)
 
     # Check output file name to ensure it does not have any path components
     if not str(Path(output_file_name)) == output_file_name:
@@ -64,9 +77,6 @@ def handler(event, context):
     if data_id is None and input_file_uri is None:
         raise ValueError("At least one of dataId or inputFileUri must be provided.")
 
-    if external_source_uri_list is None:
-        external_source_uri_list = []
-
     # Get the destination uri object
     destination_pd_obj = coerce_data_id_or_uri_to_project_data_obj(
         destination_uri
@@ -89,7 +99,7 @@ def handler(event, context):
                 data_path=Path(destination_pd_obj.data.details.path) / Path(input_file_uri).name,
                 data_type="FILE"
             )
-            return jsonable_encoder({
+            return to_json_serialisable({
                 "projectId": coerce_data_id_or_uri_to_project_data_obj(destination_uri).project_id,
                 "inputDataId": input_data_obj.data.id,
                 "outputDataUri": output_data_uri,
@@ -111,7 +121,7 @@ def handler(event, context):
                 data_path=Path(destination_pd_obj.data.details.path) / Path(input_file_uri).name,
                 data_type="FILE"
             )
-            return jsonable_encoder({
+            return to_json_serialisable({
                 "projectId": coerce_data_id_or_uri_to_project_data_obj(destination_uri).project_id,
                 "inputDataId": input_data_obj.data.id,
                 "outputDataUri": output_data_uri,
@@ -129,7 +139,24 @@ def handler(event, context):
     )
 
     # Given the source object, iterate over each of the source uris and find the relative path
-    for source_uri_iter_ in source_uri_list:
+    for source_uri_index, source_uri_iter_ in enumerate(source_uri_list):
+        # Skip over the source uris checked by previous invocations
+        if source_uri_index < continuation_cursor["nextIndex"]:
+            continue
+
+        # Hand over to the next invocation before we run out of time
+        if source_uri_index > continuation_cursor["nextIndex"] and time_budget.is_exhausted():
+            return {
+                "continuationCursor": {
+                    "nextIndex": source_uri_index,
+                },
+                # Set once the source uri has been found
+                "projectId": None,
+                "inputDataId": None,
+                "outputDataUri": None,
+                "fileSizeInBytes": None,
+            }
+
         source_uri_iter_obj = coerce_data_id_or_uri_to_project_data_obj(
             source_uri_iter_
         )
@@ -144,7 +171,7 @@ def handler(event, context):
                     data_path=Path(destination_pd_obj.data.details.path) / source_obj.details.name,
                     data_type="FILE"
                 )
-                return jsonable_encoder({
+                return to_json_serialisable({
                     "projectId": destination_pd_obj.project_id,
                     "inputDataId": input_data_obj.data.id,
                     "outputDataUri": convert_project_data_obj_to_uri(destination_pd_obj, uri_type='icav2') + output_file_name,
@@ -167,7 +194,7 @@ def handler(event, context):
                 # Then we need to make a renaming
                 output_data_uri = str(Path(destination_uri) / relative_path / output_file_name)
 
-                return jsonable_encoder({
+                return to_json_serialisable({
                     "projectId": source_obj.details.owning_project_id,
                     "inputDataId": copied_source_obj.data.id,
                     "outputDataUri": output_data_uri,
@@ -10,7 +10,7 @@ from wrapica.project_data import (
 )
 
 # Layer imports
-from icav2_tools import set_icav2_env_vars
+from icav2_data_copy_tools import set_icav2_env_vars
 
 def handler(event, context):
     """
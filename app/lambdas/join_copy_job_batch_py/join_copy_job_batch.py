@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+"""
+Join the open copy job batch of the destination folder
+
+The step function invokes this lambda with a task token and waits on it.
+The first request to join a batch is its leader and is sent its batch id straight away
+
+{
+    "batchId": "abcd-1234-efgh-5678",
+    "isBatchLeader": true
+}
+
+The leader then closes the batch and copies the source data of every member in one copy job.
+Any other member is sent the result of that copy job once it has finished (or a CopyJobFailed error)
+
+{
+    "jobId": "abcd-1234-efgh-5678",
+    "status": "SUCCEEDED"
+}
+
+The event input is
+{
+    "destinationData": {
+        "projectId": "abcdefghijklmnop",
+        "dataId": "fol.1234567890"
+    },
+    "sourceDataManifest": {...},  # Or an inline sourceDataList
+    "priority": "NORMAL",  # Optional, one of HIGH, NORMAL or LOW
+    "taskToken": "..."
+}
+"""
+
+# Standard imports
+import logging
+
+# Layer imports
+from icav2_data_copy_tools import get_copy_job_batcher, join_copy_job_batch
+
+# Set logging
+logging.basicConfig()
+logger = logging.getLogger()
+logger.setLevel(level=logging.INFO)
+
+
+def handler(event, context):
+    """
+    Join the copy job batch of the destination folder
+    :param event:
+    :param context:
+    :return:
+    """
+    # Get params
+    destination_data = event.get("destinationData")
+    source_data_manifest_or_list = event.get("sourceDataManifest", event.get("sourceDataList"))
+    priority: str = event.get("priority") or "NORMAL"
+    task_token: str = event.get("taskToken")
+
+    joined_copy_job_batch = join_copy_job_batch(
+        get_copy_job_batcher(),
+        destination_data=destination_data,
+        source_data=source_data_manifest_or_list,
+        task_token=task_token,
+        priority=priority,
+    )
+    logger.info(
+        f"Joined copy job batch {joined_copy_job_batch['batchId']} "
+        f"{'as its leader' if joined_copy_job_batch['isBatchLeader'] else 'as a member'}"
+    )
+
+    return joined_copy_job_batch
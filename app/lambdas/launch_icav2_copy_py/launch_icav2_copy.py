@@ -1,6 +1,15 @@
 #!/usr/bin/env python3
 
 """
+Lambda to copy the source data into the destination folder.
+
+Where the source and destination projects are both on s3 storage the destination credentials can read,
+the files are first copied directly (s3 to s3), without waiting on an ICAv2 copy job.
+Any files that could not be copied directly are copied by an ICAv2 copy job, whose id is returned.
+If every file was copied directly, the jobId is null.
+The number and total size of the files in the copy job are also returned,
+the internal heartbeat uses them to decide how often to check the job status.
+
 Lambda to determine if a given ICAv2 Copy Job has finished.
 Returns the status of the job which is one of the following
 * INITIALIZED
@@ -33,15 +42,16 @@ import logging
 import re
 
 # Layer imports
-from icav2_tools import set_icav2_env_vars
+from icav2_data_copy_tools import set_icav2_env_vars
+from icav2_data_copy_tools import iter_manifest_or_list, iter_project_data_records, delete_project_data_records
+from icav2_data_copy_tools import iter_project_data_records_by_id, ProjectDataRecord
+from icav2_data_copy_tools import DeletionSummary, TimeBudget, direct_copy_project_data
 
 # Wrapica imports
 from wrapica.libica_models import ProjectData
 from wrapica.project_data import (
     convert_uri_to_project_data_obj,
     project_data_copy_batch_handler,
-    delete_project_data,
-    list_project_data_non_recursively,
     get_project_data_obj_by_id
 )
 
@@ -60,11 +70,11 @@ DEFAULT_WAIT_TIME_SECONDS = 10
 DEFAULT_WAIT_TIME_SECONDS_EXT = 10
 
 
-def submit_copy_job(dest_project_data_obj: ProjectData, source_project_data_objs: List[ProjectData]) -> str:
+def submit_copy_job(dest_project_data_obj: ProjectData, source_project_data_objs: List[ProjectDataRecord]) -> str:
     # Rerun copy batch process
     source_data_ids = list(
         map(
-            lambda source_project_data_obj_iter_: source_project_data_obj_iter_.data.id,
+            lambda source_project_data_obj_iter_: source_project_data_obj_iter_.data_id,
             source_project_data_objs
         )
     )
@@ -78,36 +88,32 @@ def submit_copy_job(dest_project_data_obj: ProjectData, source_project_data_objs
 
 def delete_existing_partial_data(
         dest_project_data_obj: ProjectData,
-        source_project_data_obj_list: List[ProjectData] = None
-):
+        source_project_data_obj_list: List[ProjectDataRecord] = None
+) -> DeletionSummary:
     # Source data names
-    source_data_names = list(map(
-        lambda source_project_data_obj_iter_: source_project_data_obj_iter_.data.details.name,
+    source_data_names = set(map(
+        lambda source_project_data_obj_iter_: source_project_data_obj_iter_.name,
         source_project_data_obj_list
     ))
 
-    # Check list of files in the dest project data object and make sure no file has a partial status
-    existing_partial_files = list(filter(
-        lambda file_iter_: (
-            # File has a partial status AND
-            file_iter_.data.details.status == 'PARTIAL' and
-            # File name is in the list of files we
-            # want to copy over
-            file_iter_.data.details.name in source_data_names
-        ),
-        list_project_data_non_recursively(
-            dest_project_data_obj.project_id,
-            dest_project_data_obj.data.id
+    # Stream the files in the dest project data object that have a partial status (filtered server-side)
+    # and delete those that are in the list of files we want to copy over.
+    # Deletions run concurrently, and we wait until they are visible before the job is resubmitted
+    deletion_summary = delete_project_data_records(
+        filter(
+            lambda existing_file_iter_: existing_file_iter_.name in source_data_names,
+            iter_project_data_records(
+                project_id=dest_project_data_obj.project_id,
+                parent_folder_id=dest_project_data_obj.data.id,
+                data_type="FILE",
+                status="PARTIAL",
+            )
         )
-    ))
+    )
+    for deleted_path_iter_ in deletion_summary["deletedPathList"]:
+        logger.info(f"Deleted file {deleted_path_iter_}, with 'partial' status before rerunning job")
 
-    for existing_file in existing_partial_files:
-        logger.info(f"Deleting file {existing_file.data.details.path}, with 'partial' status before rerunning job")
-        # Delete files with a 'partial' status
-        delete_project_data(
-            existing_file.project_id,
-            existing_file.data.id
-        )
+    return deletion_summary
 
 
 def get_source_uris_as_project_data_objs(source_uris: List[str]) -> List[ProjectData]:
@@ -132,7 +138,8 @@ def handler(event, context):
     set_icav2_env_vars()
 
     # Get events
-    source_data_list: List[Dict[str, str]] = event.get("sourceDataList")
+    # The source data list may be given inline or as a manifest pointer
+    source_data_manifest_or_list = event.get("sourceDataManifest", event.get("sourceDataList"))
     destination_data: Dict[str, str] = event.get("destinationData")
 
     # Get destination uri as project data object
@@ -142,15 +149,10 @@ def handler(event, context):
         data_id=destination_data.get("dataId")
     )
 
-    # Get Source Uris as project data objects
-    # Filter out files smaller than the min file size limit
-    # These are transferred over manually
-    source_project_data_list = list(map(
-        lambda source_data_id_iter_: get_project_data_obj_by_id(
-            project_id=source_data_id_iter_.get("projectId"),
-            data_id=source_data_id_iter_.get("dataId")
-        ),
-        source_data_list
+    # Stream the source data ids from the manifest and resolve them in bulk,
+    # one listing per project per chunk of data ids, rather than one lookup per file
+    source_project_data_list = list(iter_project_data_records_by_id(
+        iter_manifest_or_list(source_data_manifest_or_list)
     ))
 
     # First time through
@@ -160,12 +162,35 @@ def handler(event, context):
         source_project_data_list
     )
 
+    # Copy what we can directly, s3 to s3
+    direct_copied_project_data_list, source_project_data_list = direct_copy_project_data(
+        dest_project_data_obj=dest_project_data_obj,
+        source_project_data_list=source_project_data_list,
+        time_budget=TimeBudget(context),
+    )
+    logger.info(
+        f"Copied {len(direct_copied_project_data_list)} files directly, "
+        f"{len(source_project_data_list)} files remaining for the copy job"
+    )
+
     # Check we have a job to run
+    if len(source_project_data_list) == 0:
+        return {
+            "jobId": None,
+            "directCopyCount": len(direct_copied_project_data_list),
+        }
+
     return {
         "jobId": submit_copy_job(
             dest_project_data_obj=dest_project_data_obj,
             source_project_data_objs=source_project_data_list,
         ),
+        "directCopyCount": len(direct_copied_project_data_list),
+        "copyJobFileCount": len(source_project_data_list),
+        "copyJobSizeInBytes": sum(map(
+            lambda source_project_data_iter_: source_project_data_iter_.file_size_in_bytes or 0,
+            source_project_data_list
+        )),
     }
 
 
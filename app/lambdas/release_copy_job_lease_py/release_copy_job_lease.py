@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+"""
+Release the copy job lease of a finished (or failed) copy job, and admit the next waiting copy jobs for the project
+
+The event input is
+{
+    "projectId": "abcdefghijklmnop",
+    "leaseId": "abcd-1234-efgh-5678"
+}
+"""
+
+# Standard imports
+import logging
+
+# Layer imports
+from icav2_data_copy_tools import get_admission_controller, release_copy_job_lease
+
+# Set logging
+logging.basicConfig()
+logger = logging.getLogger()
+logger.setLevel(level=logging.INFO)
+
+
+def handler(event, context):
+    """
+    Release the copy job lease
+    :param event:
+    :param context:
+    :return:
+    """
+    # Get params
+    project_id: str = event.get("projectId")
+    lease_id: str = event.get("leaseId")
+
+    admitted_count = release_copy_job_lease(
+        get_admission_controller(),
+        project_id=project_id,
+        lease_id=lease_id,
+    )
+    logger.info(f"Released copy job lease {lease_id} for project {project_id}, admitted {admitted_count} waiting copy jobs")
+
+    return {
+        "admittedCount": admitted_count,
+    }
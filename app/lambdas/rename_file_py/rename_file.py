@@ -11,25 +11,24 @@ from pathlib import Path
 from textwrap import dedent
 from tempfile import NamedTemporaryFile
 from subprocess import run
-from time import sleep
 from os import environ
 from urllib.parse import urlparse
 
 # Layer imports
-from icav2_tools import set_icav2_env_vars
+from icav2_data_copy_tools import (
+    set_icav2_env_vars,
+    get_download_url,
+    delete_project_data_records,
+)
 
 # Wrapica imports
 from wrapica.project_data import (
-    create_download_url,
     get_project_data_obj_by_id,
     get_project_data_obj_from_project_id_and_path,
-    create_file_with_upload_url, delete_project_data,
+    create_file_with_upload_url,
     convert_uri_to_project_data_obj
 )
 
-# Globals
-POST_DELETION_WAIT_TIME = 5  # seconds
-
 
 def get_shell_script_template() -> str:
     return dedent(
@@ -160,12 +159,8 @@ def handler(event, context):
         raise ValueError("Expected source and destination objects to be different")
 
     # Delete the newly created destination object (since we're going to overwrite it anyway)
-    delete_project_data(
-        project_id=destination_object.project_id,
-        data_id=destination_object.data.id
-    )
-    # Give servers ample time to catch up
-    sleep(POST_DELETION_WAIT_TIME)
+    # and wait until the deletion is visible
+    delete_project_data_records([destination_object])
 
     # Get the folder object
     destination_folder_object = get_project_data_obj_from_project_id_and_path(
@@ -174,10 +169,10 @@ def handler(event, context):
         data_type="FOLDER"
     )
 
-    # Create the source file download url
-    source_file_download_url = create_download_url(
+    # Create the source file download url (reusing a cached url from a previous attempt if it is still fresh)
+    source_file_download_url = get_download_url(
         project_id=source_object.project_id,
-        file_id=source_object.data.id,
+        data_id=source_object.data.id,
     )
 
     # Create the file object
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+"""
+Request a copy job lease for the destination project, before the copy job is submitted
+
+The step function invokes this lambda with a task token and waits on it.
+The request is queued with the other requests for the same project, by weighted fair share of its priority and size,
+the task token is sent the lease id once the request reaches the front of the queue and a lease is free,
+which may be straight away, or once other copy jobs release their leases.
+
+The event input is
+{
+    "projectId": "abcdefghijklmnop",
+    "priority": "NORMAL",  # Optional, one of HIGH, NORMAL or LOW
+    "totalSizeInBytes": 123456789,  # Optional
+    "taskToken": "..."
+}
+
+The step function is sent
+{
+    "leaseId": "abcd-1234-efgh-5678"
+}
+"""
+
+# Standard imports
+import logging
+
+# Layer imports
+from icav2_data_copy_tools import get_admission_controller, request_copy_job_lease
+
+# Set logging
+logging.basicConfig()
+logger = logging.getLogger()
+logger.setLevel(level=logging.INFO)
+
+
+def handler(event, context):
+    """
+    Queue the request for a copy job lease and admit any waiters we can
+    :param event:
+    :param context:
+    :return:
+    """
+    # Get params
+    project_id: str = event.get("projectId")
+    priority: str = event.get("priority") or "NORMAL"
+    total_size_in_bytes: int = int(event.get("totalSizeInBytes") or 0)
+    task_token: str = event.get("taskToken")
+
+    lease_id = request_copy_job_lease(
+        get_admission_controller(),
+        project_id=project_id,
+        task_token=task_token,
+        priority=priority,
+        total_size_in_bytes=total_size_in_bytes,
+    )
+    logger.info(f"Queued copy job lease {lease_id} for project {project_id} with priority {priority}")
+
+    return {
+        "leaseId": lease_id,
+    }
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+"""
+Send a heartbeat to the task token of every running handle copy jobs execution
+
+Each handle copy jobs execution registers its external task token in the job table when it starts
+(id_type EXTERNAL_TASK_TOKEN) and deregisters it when it ends.
+We query the registered task tokens and send the heartbeats concurrently.
+Task tokens of executions that are no longer running (i.e aborted or timed out) are failed and deregistered,
+as are task tokens that are rejected as timed out or invalid.
+
+We also admit any copy jobs waiting on a copy job lease whose project has a free lease,
+so leases freed by expiry (rather than released) are picked up,
+then send a heartbeat to each copy job still waiting on a lease.
+
+Returns the number of task tokens still active, and the number of copy jobs waiting on or holding a lease,
+the step function disables the external heartbeat rule once all are zero
+
+{
+    "activeTaskTokenCount": 2,
+    "expiredTaskTokenCount": 0,
+    "waitingCopyJobCount": 1,
+    "heldCopyJobLeaseCount": 10
+}
+"""
+
+# Standard imports
+import logging
+
+# Layer imports
+from icav2_data_copy_tools import (
+    get_task_token_registry,
+    send_task_heartbeats,
+    get_admission_controller,
+    drain_all_waiters,
+    heartbeat_all_waiters
+)
+
+# Set logging
+logging.basicConfig()
+logger = logging.getLogger()
+logger.setLevel(level=logging.INFO)
+
+
+def handler(event, context):
+    """
+    Send heartbeats to all registered external task tokens
+    :param event:
+    :param context:
+    :return:
+    """
+    heartbeat_summary = send_task_heartbeats(get_task_token_registry())
+
+    logger.info(
+        f"Sent heartbeats to {heartbeat_summary['activeTaskTokenCount']} task tokens, "
+        f"deregistered {heartbeat_summary['expiredTaskTokenCount']} expired task tokens"
+    )
+
+    admission_controller = get_admission_controller()
+    admitted_count = drain_all_waiters(admission_controller)
+    if admitted_count > 0:
+        logger.info(f"Admitted {admitted_count} waiting copy jobs")
+
+    admission_summary = heartbeat_all_waiters(admission_controller)
+
+    return {
+        **heartbeat_summary,
+        **admission_summary,
+    }
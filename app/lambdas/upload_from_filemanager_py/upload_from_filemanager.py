@@ -4,6 +4,13 @@
 Upload a file from the OrcaBus filemanager to an ICAv2 project via a download+upload
 
 External data is managed by the filemanager
+
+Small files are uploaded with a single PUT to an ICAv2 upload url.
+
+Multipart source files (isMultipartFile) are instead streamed into an s3 multipart upload on the destination
+folder storage, part by part, while the lambda has time remaining.
+If the lambda runs out of time, it returns a resumeToken for the ECS task to finish the upload, otherwise
+the resumeToken is null.
 """
 
 # Standard imports
@@ -11,10 +18,18 @@ from pathlib import Path
 from subprocess import run
 from tempfile import NamedTemporaryFile
 from textwrap import dedent
-from time import sleep
+from typing import Optional
+
+import boto3
 
 # Layer imports
-from icav2_tools import set_icav2_env_vars
+from icav2_data_copy_tools import (
+    set_icav2_env_vars,
+    delete_project_data_records,
+    start_resumable_upload,
+    TimeBudget,
+    ResumeToken,
+)
 from orcabus_api_tools.filemanager import (
     get_s3_object_id_from_s3_uri,
     get_presigned_url
@@ -23,14 +38,12 @@ from orcabus_api_tools.filemanager import (
 from wrapica.project_data import (
     get_project_data_obj_by_id,
     get_project_data_obj_from_project_id_and_path,
-    delete_project_data,
-    create_file_with_upload_url
+    create_file_with_upload_url,
+    get_aws_credentials_access_for_project_folder
 )
+from wrapica.libica_models import ProjectData
 from wrapica.utils.globals import FILE_DATA_TYPE
 
-# Globals
-POST_DELETION_WAIT_TIME = 5  # seconds
-
 
 def get_shell_script_template() -> str:
     return dedent(
@@ -98,6 +111,45 @@ def run_shell_script(
     return
 
 
+def upload_multipart_file(
+        source_file_download_url: str,
+        destination_folder_object: ProjectData,
+        file_name: str,
+        file_size_in_bytes: int,
+        context,
+) -> Optional[ResumeToken]:
+    """
+    Stream the source file into a multipart upload on the destination folder storage, as the ECS task would,
+    returning a resume token if we run out of time
+    :param source_file_download_url:
+    :param destination_folder_object:
+    :param file_name:
+    :param file_size_in_bytes:
+    :param context:
+    :return:
+    """
+    storage_creds = get_aws_credentials_access_for_project_folder(
+        project_id=destination_folder_object.project_id,
+        folder_id=destination_folder_object.data.id
+    )
+    s3_client = boto3.client(
+        's3',
+        region_name=storage_creds.region,
+        aws_access_key_id=storage_creds.access_key,
+        aws_secret_access_key=storage_creds.secret_key,
+        aws_session_token=storage_creds.session_token,
+    )
+
+    return start_resumable_upload(
+        s3_client=s3_client,
+        download_url=source_file_download_url,
+        bucket=storage_creds.bucket,
+        key=str(Path(storage_creds.object_prefix) / file_name),
+        file_size_in_bytes=file_size_in_bytes,
+        time_budget=TimeBudget(context),
+    )
+
+
 def handler(event, context):
     """
     Given the inputs of
@@ -118,8 +170,12 @@ def handler(event, context):
     dest_data_id = event['destDataId']
 
     # Use the filemanager to get the presigned url of the source uri file
+    # The s3 object id is usually given to us by the metadata lookup, saving a filemanager query
+    source_s3_object_id = event.get('s3ObjectId')
+    if source_s3_object_id is None:
+        source_s3_object_id = get_s3_object_id_from_s3_uri(source_uri)
     source_file_download_url = get_presigned_url(
-        s3_object_id=get_s3_object_id_from_s3_uri(source_uri)
+        s3_object_id=source_s3_object_id
     )
 
     # Get the destination folder object
@@ -128,6 +184,18 @@ def handler(event, context):
         data_id=dest_data_id,
     )
 
+    # Multipart files, upload what we can in the time we have
+    if event.get('isMultipartFile', False):
+        return {
+            "resumeToken": upload_multipart_file(
+                source_file_download_url=source_file_download_url,
+                destination_folder_object=destination_folder_object,
+                file_name=Path(source_uri).name,
+                file_size_in_bytes=source_file_size_in_bytes,
+                context=context,
+            )
+        }
+
     # Check if the destination file exists
     try:
         existing_project_data_obj = get_project_data_obj_from_project_id_and_path(
@@ -137,13 +205,8 @@ def handler(event, context):
         )
         # If we have a partial file, we can delete it and re-upload
         if existing_project_data_obj.data.details.status == 'PARTIAL':
-            # Delete the file
-            delete_project_data(
-                project_id=destination_folder_object.project_id,
-                data_id=existing_project_data_obj.data.id
-            )
-            # Wait for the db to catch up
-            sleep(POST_DELETION_WAIT_TIME)
+            # Delete the file, and wait until the deletion is visible
+            delete_project_data_records([existing_project_data_obj])
         elif existing_project_data_obj.data.details.file_size_in_bytes == source_file_size_in_bytes:
             # If the file sizes match, we can skip the upload
             # Check the file sizes match
@@ -43,30 +43,52 @@ We take in the following inputs:
       "dataId": "fil.abcdefghijklmnop",
     }
 }
+
+This lambda is also subscribed to the small file work queue (see find_single_part_files),
+in which case we are given an SQS event, each record body holds either a work item
+(requestId, itemIndex, sourceData and destinationData) or the barrier message from the step function (requestId, taskToken).
+Setup for the batch is done in bulk, the download urls of the batch are requested in a single call per source project,
+and the destination files (with their upload urls) are created concurrently.
+Results are recorded against the request and the step function is released once every queued item is accounted for.
+Failed items are returned as batch item failures so only they are retried,
+once an item has run out of retries it is recorded as failed rather than sent to the dead letter queue.
 """
 
 # Standard library imports
+import json
+import logging
+from collections import defaultdict
 from pathlib import Path
 from textwrap import dedent
 from tempfile import NamedTemporaryFile
 from subprocess import run
-from time import sleep
+from typing import Dict, List, Optional, Tuple
 
 # Layer imports
-from icav2_tools import set_icav2_env_vars
+from icav2_data_copy_tools import (
+    set_icav2_env_vars,
+    get_download_urls,
+    create_files_with_upload_urls,
+    delete_project_data_records,
+    DynamoDbWorkQueueTracker,
+)
 
 # Wrapica imports
+from wrapica.libica_models import ProjectData
 from wrapica.project_data import (
-    create_download_url,
     get_project_data_obj_by_id,
     get_project_data_obj_from_project_id_and_path,
-    create_file_with_upload_url, delete_project_data
 )
 from wrapica.utils.globals import FILE_DATA_TYPE
 
+# Set logging
+logging.basicConfig()
+logger = logging.getLogger()
+logger.setLevel(level=logging.INFO)
 
 # Globals
-POST_DELETION_WAIT_TIME = 5  # seconds
+# Must be less than the maxReceiveCount of the work queue redrive policy
+MAX_WORK_ITEM_ATTEMPTS = 3
 
 
 def get_shell_script_template() -> str:
@@ -135,30 +157,27 @@ def run_shell_script(
     return
 
 
-def handler(event, context):
+def get_upload_plan(
+        source_data: Dict[str, str],
+        destination_data: Dict[str, str],
+) -> Optional[Tuple[ProjectData, ProjectData]]:
     """
-    Given the inputs of
-    :param event:
-    :param context:
+    Get the source file and destination folder objects of an upload,
+    clearing out any partial upload of the file in the destination folder.
+    Returns None if the file has already been uploaded
+    :param source_data:
+    :param destination_data:
     :return:
     """
-    set_icav2_env_vars()
-
     # Get the source file object
     source_object = get_project_data_obj_by_id(
-        project_id=event["sourceData"]["projectId"],
-        data_id=event["sourceData"]["dataId"]
+        project_id=source_data["projectId"],
+        data_id=source_data["dataId"]
     )
     # Get the destination folder object
     destination_folder_object = get_project_data_obj_by_id(
-        project_id=event["destinationData"]["projectId"],
-        data_id=event["destinationData"]["dataId"]
-    )
-
-    # Create the source file download url
-    source_file_download_url = create_download_url(
-        project_id=source_object.project_id,
-        file_id=source_object.data.id,
+        project_id=destination_data["projectId"],
+        data_id=destination_data["dataId"]
     )
 
     # Check if the destination file exists
@@ -170,17 +189,12 @@ def handler(event, context):
         )
         # If we have a partial file, we can delete it and re-upload
         if existing_project_data_obj.data.details.status == 'PARTIAL':
-            # Delete the file
-            delete_project_data(
-                project_id=destination_folder_object.project_id,
-                data_id=existing_project_data_obj.data.id
-            )
-            # Wait for the db to catch up
-            sleep(POST_DELETION_WAIT_TIME)
+            # Delete the file, and wait until the deletion is visible
+            delete_project_data_records([existing_project_data_obj])
         elif existing_project_data_obj.data.details.file_size_in_bytes == source_object.data.details.file_size_in_bytes:
             # If the file sizes match, we can skip the upload
             # Check the file sizes match
-            return
+            return None
         else:
             raise RuntimeError(
                 f"File {existing_project_data_obj.data.details.path} already exists in destination folder "
@@ -190,20 +204,173 @@ def handler(event, context):
     except FileNotFoundError:
         pass
 
-    # Create the file object
-    destination_file_upload_url = create_file_with_upload_url(
-        project_id=destination_folder_object.project_id,
-        folder_id=destination_folder_object.data.id,
-        file_name=source_object.data.details.name
-    )
+    return source_object, destination_folder_object
 
-    # Get the shell script
-    shell_script_path = generate_shell_script(
-        source_file_download_url,
-        destination_file_upload_url
-    )
 
-    # Run the shell script
-    run_shell_script(
-        shell_script_path=shell_script_path,
+def upload_single_part_files(
+        work_item_list: List[Dict[str, Dict[str, str]]],
+) -> List[Optional[Exception]]:
+    """
+    Upload a batch of single part files (each work item has a sourceData and destinationData)
+    The download urls are requested in a single call per source project,
+    and the destination files are created concurrently per destination folder.
+    Returns the error (or None) of each work item, a failure of one item does not fail the others
+    :param work_item_list:
+    :return:
+    """
+    error_list: List[Optional[Exception]] = [None] * len(work_item_list)
+    upload_plan_by_index: Dict[int, Tuple[ProjectData, ProjectData]] = {}
+
+    # Plan each upload
+    for index, work_item_iter_ in enumerate(work_item_list):
+        try:
+            upload_plan = get_upload_plan(
+                source_data=work_item_iter_["sourceData"],
+                destination_data=work_item_iter_["destinationData"],
+            )
+        except Exception as e:
+            error_list[index] = e
+            continue
+
+        if upload_plan is not None:
+            upload_plan_by_index[index] = upload_plan
+
+    # Create the source file download urls, one call per source project
+    index_list_by_source_project_id: Dict[str, List[int]] = defaultdict(list)
+    for index, (source_object, _) in upload_plan_by_index.items():
+        index_list_by_source_project_id[str(source_object.project_id)].append(index)
+
+    download_url_by_index: Dict[int, str] = {}
+    for source_project_id, index_list in index_list_by_source_project_id.items():
+        try:
+            download_urls_by_data_id = get_download_urls(
+                project_id=source_project_id,
+                data_id_list=list(map(
+                    lambda index_iter_: upload_plan_by_index[index_iter_][0].data.id,
+                    index_list
+                ))
+            )
+        except Exception as e:
+            for index_iter_ in index_list:
+                error_list[index_iter_] = e
+            continue
+
+        for index_iter_ in index_list:
+            download_url_by_index[index_iter_] = download_urls_by_data_id[upload_plan_by_index[index_iter_][0].data.id]
+
+    # Create the destination files, concurrently for each destination folder
+    index_list_by_destination_folder: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for index, (_, destination_folder_object) in upload_plan_by_index.items():
+        if index not in download_url_by_index:
+            continue
+        index_list_by_destination_folder[
+            (str(destination_folder_object.project_id), destination_folder_object.data.id)
+        ].append(index)
+
+    upload_url_by_index: Dict[int, str] = {}
+    for (destination_project_id, destination_folder_id), index_list in index_list_by_destination_folder.items():
+        upload_urls_by_file_name, errors_by_file_name = create_files_with_upload_urls(
+            project_id=destination_project_id,
+            folder_id=destination_folder_id,
+            file_name_list=list(map(
+                lambda index_iter_: upload_plan_by_index[index_iter_][0].data.details.name,
+                index_list
+            ))
+        )
+        for index_iter_ in index_list:
+            file_name = upload_plan_by_index[index_iter_][0].data.details.name
+            if file_name in errors_by_file_name:
+                error_list[index_iter_] = errors_by_file_name[file_name]
+                continue
+            upload_url_by_index[index_iter_] = upload_urls_by_file_name[file_name]
+
+    # Transfer each file
+    for index, destination_file_upload_url in upload_url_by_index.items():
+        try:
+            # Get the shell script
+            shell_script_path = generate_shell_script(
+                download_url_by_index[index],
+                destination_file_upload_url
+            )
+
+            # Run the shell script
+            run_shell_script(
+                shell_script_path=shell_script_path,
+            )
+        except Exception as e:
+            error_list[index] = e
+
+    return error_list
+
+
+def handle_work_queue_records(records: List[Dict]) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Process a batch of work queue records, return the records that should be retried
+    :param records:
+    :return:
+    """
+    batch_item_failures = []
+    work_item_record_list = []
+
+    for record_iter_ in records:
+        body = json.loads(record_iter_["body"])
+
+        # Barrier message from the step function
+        if "taskToken" in body:
+            tracker = DynamoDbWorkQueueTracker(body["requestId"])
+            try:
+                tracker.complete_if_done(tracker.set_task_token(body["taskToken"]))
+            except Exception as e:
+                logger.warning(f"Failed to process barrier message for {body['requestId']}, will retry: {e}")
+                batch_item_failures.append({"itemIdentifier": record_iter_["messageId"]})
+            continue
+
+        work_item_record_list.append((record_iter_, body))
+
+    # Upload the work items of the batch together
+    error_list = upload_single_part_files(
+        list(map(lambda work_item_record_iter_: work_item_record_iter_[1], work_item_record_list))
     )
+
+    for (record_iter_, body), error_iter_ in zip(work_item_record_list, error_list):
+        tracker = DynamoDbWorkQueueTracker(body["requestId"])
+
+        if error_iter_ is not None:
+            if int(record_iter_["attributes"]["ApproximateReceiveCount"]) < MAX_WORK_ITEM_ATTEMPTS:
+                logger.warning(f"Failed to upload {body['sourceData']}, will retry: {error_iter_}")
+                batch_item_failures.append({"itemIdentifier": record_iter_["messageId"]})
+                continue
+            logger.error(
+                f"Failed to upload {body['sourceData']} after {MAX_WORK_ITEM_ATTEMPTS} attempts: {error_iter_}"
+            )
+            tracker.complete_if_done(tracker.record_result(body["itemIndex"], succeeded=False))
+            continue
+
+        tracker.complete_if_done(tracker.record_result(body["itemIndex"], succeeded=True))
+
+    return {
+        "batchItemFailures": batch_item_failures
+    }
+
+
+def handler(event, context):
+    """
+    Given the inputs of
+    :param event:
+    :param context:
+    :return:
+    """
+    set_icav2_env_vars()
+
+    # Triggered by the work queue
+    if "Records" in event:
+        return handle_work_queue_records(event["Records"])
+
+    error = upload_single_part_files([
+        {
+            "sourceData": event["sourceData"],
+            "destinationData": event["destinationData"],
+        }
+    ])[0]
+    if error is not None:
+        raise error
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+
+"""
+Validate a whole transfer in bulk.
+
+Given the following inputs:
+- destinationUri
+- sourceDataList (a list of {projectId, dataId} objects), or sourceDataManifest (a manifest pointer to the same)
+- externalSourceUriList (a list of s3 uris), or externalSourceUriManifest (a manifest pointer to the same)
+
+List the destination folder once,
+collect the source file sizes in bulk (ICAv2 project data listing filtered by data id,
+filemanager queries for the exact keys of each bucket),
+and compare each source file against the file at its full destination path (the destination folder path + its name).
+Each source file is compared on its own, so two source files of the same name are both checked.
+
+Returns a report of the number of matched files, any size mismatches, any missing files,
+any source data ids that could not be found, and the number and total size of the source files.
+Raise an error if any file is missing or has a mismatched file size, or a source file could not be found.
+
+Before the cached result of an earlier identical request is returned, we are called again with its source manifests,
+its expectedSourceFileCount and expectedSourceTotalSizeInBytes, and its renamingMapList
+(its files have since been renamed in the destination).
+The source files are listed again and compared file by file against the destination as above,
+and the source must still hold the same number of files with the same total size.
+"""
+
+# Standard imports
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import logging
+
+# Layer imports
+from icav2_data_copy_tools import (
+    set_icav2_env_vars,
+    get_icav2_api_client,
+    iter_manifest_or_list,
+    get_file_objects_from_s3_uris,
+)
+
+# Wrapica imports
+from libica.openapi.v3 import ApiException
+from libica.openapi.v3.api.project_data_api import ProjectDataApi
+from wrapica.project_data import (
+    coerce_data_id_or_uri_to_project_data_obj,
+    list_project_data_non_recursively
+)
+from wrapica.utils.globals import FILE_DATA_TYPE, LIBICAV2_DEFAULT_PAGE_SIZE
+
+# Set logging
+logging.basicConfig()
+logger = logging.getLogger()
+logger.setLevel(level=logging.INFO)
+
+# Globals
+# Keep the query string to a sensible length when filtering by data id
+DATA_ID_CHUNK_SIZE = 100
+# Only report the first few problems in the error message, the full list is in the logs
+MAX_PROBLEMS_IN_ERROR_MESSAGE = 20
+
+
+def get_renamed_file_names(renaming_map_list: List[Dict[str, str]]) -> Dict[str, str]:
+    """
+    Get the output file name of each renamed source file,
+    keyed by its data id, or the name of its source uri
+    :param renaming_map_list:
+    :return:
+    """
+    return dict(map(
+        lambda renaming_map_iter_: (
+            (
+                renaming_map_iter_['dataId']
+                if renaming_map_iter_.get('dataId') is not None
+                else Path(urlparse(renaming_map_iter_['sourceUri']).path).name
+            ),
+            renaming_map_iter_['outputFileName']
+        ),
+        renaming_map_list
+    ))
+
+
+def get_source_file_sizes_from_data_list(
+        source_data_list: List[Dict[str, str]],
+        renamed_file_names: Optional[Dict[str, str]] = None
+) -> Tuple[List[Tuple[str, int]], List[str]]:
+    """
+    Get the (destination) file name and size of each icav2 source file,
+    along with the source data ids that could not be found.
+    Rather than one lookup per file, we list each source project filtered by data id,
+    one page of ids at a time.
+    :param source_data_list:
+    :param renamed_file_names:
+    :return:
+    """
+    if renamed_file_names is None:
+        renamed_file_names = {}
+
+    data_ids_by_project: Dict[str, List[str]] = defaultdict(list)
+    for source_data_iter_ in source_data_list:
+        data_ids_by_project[source_data_iter_['projectId']].append(source_data_iter_['dataId'])
+
+    source_file_sizes: List[Tuple[str, int]] = []
+    missing_source_list: List[str] = []
+    api_instance = ProjectDataApi(get_icav2_api_client())
+    for project_id, data_id_list in data_ids_by_project.items():
+        for chunk_index in range(0, len(data_id_list), DATA_ID_CHUNK_SIZE):
+            data_id_chunk = data_id_list[chunk_index:chunk_index + DATA_ID_CHUNK_SIZE]
+            try:
+                api_response = api_instance.get_project_data_list(
+                    project_id=project_id,
+                    id=data_id_chunk,
+                    page_size=str(LIBICAV2_DEFAULT_PAGE_SIZE),
+                )
+            except ApiException:
+                logger.error(f"Could not list source data in project {project_id}")
+                raise
+
+            project_data_by_id = dict(map(
+                lambda project_data_iter_: (project_data_iter_.data.id, project_data_iter_),
+                api_response.items
+            ))
+            for data_id_iter_ in data_id_chunk:
+                project_data_obj = project_data_by_id.get(data_id_iter_)
+                if project_data_obj is None:
+                    missing_source_list.append(f"{project_id}/{data_id_iter_}")
+                    continue
+                source_file_sizes.append((
+                    renamed_file_names.get(
+                        data_id_iter_,
+                        renamed_file_names.get(project_data_obj.data.details.name, project_data_obj.data.details.name)
+                    ),
+                    project_data_obj.data.details.file_size_in_bytes
+                ))
+
+    return source_file_sizes, missing_source_list
+
+
+def get_source_file_sizes_from_external_uri_list(
+        external_source_uri_list: List[str],
+        renamed_file_names: Optional[Dict[str, str]] = None
+) -> List[Tuple[str, int]]:
+    """
+    Get the (destination) file name and size of each external source file.
+    We query the filemanager for the exact keys of each bucket in bulk,
+    any key not returned by the grouped query is looked up individually.
+    :param external_source_uri_list:
+    :param renamed_file_names:
+    :return:
+    """
+    if renamed_file_names is None:
+        renamed_file_names = {}
+
+    file_objects_by_s3_uri = get_file_objects_from_s3_uris(external_source_uri_list)
+
+    return list(map(
+        lambda s3_uri_iter_: (
+            renamed_file_names.get(Path(urlparse(s3_uri_iter_).path).name, Path(urlparse(s3_uri_iter_).path).name),
+            file_objects_by_s3_uri[s3_uri_iter_]['size']
+        ),
+        external_source_uri_list
+    ))
+
+
+def get_destination_file_sizes(destination_uri: str) -> Tuple[str, Dict[str, int]]:
+    """
+    List the destination folder once,
+    return the destination folder path and the file sizes keyed by their full path
+    :param destination_uri:
+    :return:
+    """
+    destination_folder_obj = coerce_data_id_or_uri_to_project_data_obj(destination_uri)
+
+    return (
+        destination_folder_obj.data.details.path,
+        dict(map(
+            lambda project_data_iter_: (
+                project_data_iter_.data.details.path,
+                project_data_iter_.data.details.file_size_in_bytes
+            ),
+            list_project_data_non_recursively(
+                project_id=destination_folder_obj.project_id,
+                parent_folder_id=destination_folder_obj.data.id,
+                data_type=FILE_DATA_TYPE
+            )
+        ))
+    )
+
+
+def validate_source_unchanged(
+        destination_uri: str,
+        source_file_sizes: List[Tuple[str, int]],
+        expected_source_file_count: Optional[int],
+        expected_source_total_size_in_bytes: Optional[int],
+):
+    """
+    Check the source still holds the number of files (and their total size) validated by an earlier identical request
+    :param destination_uri:
+    :param source_file_sizes:
+    :param expected_source_file_count:
+    :param expected_source_total_size_in_bytes:
+    :return:
+    """
+    source_total_size_in_bytes = sum(map(lambda source_file_size_iter_: source_file_size_iter_[1], source_file_sizes))
+
+    if (
+        not len(source_file_sizes) == expected_source_file_count or
+        not source_total_size_in_bytes == expected_source_total_size_in_bytes
+    ):
+        raise ValueError(
+            f"Validation failed for {destination_uri}, the source has changed since it was last validated, "
+            f"expected {expected_source_file_count} files ({expected_source_total_size_in_bytes} bytes) "
+            f"but found {len(source_file_sizes)} files ({source_total_size_in_bytes} bytes)"
+        )
+
+
+def handler(event, context):
+    """
+    Collect the source and destination file sizes in bulk,
+    compare them and return a validation report.
+    Raise an error if the validation fails
+    :param event:
+    :param context:
+    :return:
+    """
+    # Set icav2 env vars
+    set_icav2_env_vars()
+
+    # Get inputs
+    destination_uri: str = event['destinationUri']
+
+    # Revalidating the cached result of an identical request
+    is_revalidation = 'expectedSourceFileCount' in event.keys()
+    renamed_file_names = get_renamed_file_names(event.get('renamingMapList') or [])
+
+    source_data_list: List[Dict[str, str]] = list(iter_manifest_or_list(
+        event.get('sourceDataManifest', event.get('sourceDataList'))
+    ))
+    external_source_uri_list: List[str] = list(iter_manifest_or_list(
+        event.get('externalSourceUriManifest', event.get('externalSourceUriList'))
+    ))
+
+    if len(source_data_list) == 0 and len(external_source_uri_list) == 0 and not is_revalidation:
+        return {
+            "matchedCount": 0,
+            "sizeMismatchList": [],
+            "missingList": [],
+            "missingSourceList": [],
+            "sourceFileCount": 0,
+            "sourceTotalSizeInBytes": 0,
+        }
+
+    # Collect sizes in bulk
+    source_file_sizes, missing_source_list = get_source_file_sizes_from_data_list(source_data_list, renamed_file_names)
+    source_file_sizes.extend(get_source_file_sizes_from_external_uri_list(external_source_uri_list, renamed_file_names))
+    if is_revalidation:
+        validate_source_unchanged(
+            destination_uri,
+            source_file_sizes,
+            event['expectedSourceFileCount'],
+            event.get('expectedSourceTotalSizeInBytes'),
+        )
+    destination_folder_path, destination_file_sizes = get_destination_file_sizes(destination_uri)
+
+    # Compare each source file against the file at its full destination path
+    matched_count = 0
+    size_mismatch_list = []
+    missing_list = []
+    for file_name, source_file_size in source_file_sizes:
+        destination_file_size = destination_file_sizes.get(destination_folder_path + file_name)
+        if destination_file_size is None:
+            missing_list.append(destination_uri + file_name)
+        elif not destination_file_size == source_file_size:
+            size_mismatch_list.append({
+                "destinationUri": destination_uri + file_name,
+                "sourceFileSizeInBytes": source_file_size,
+                "destinationFileSizeInBytes": destination_file_size,
+            })
+        else:
+            matched_count += 1
+
+    logger.info(
+        f"Validated {len(source_file_sizes)} files, {matched_count} matched, "
+        f"{len(size_mismatch_list)} size mismatches, {len(missing_list)} missing, "
+        f"{len(missing_source_list)} source files not found"
+    )
+
+    if len(size_mismatch_list) > 0 or len(missing_list) > 0 or len(missing_source_list) > 0:
+        for size_mismatch_iter_ in size_mismatch_list:
+            logger.error(f"Size mismatch: {size_mismatch_iter_}")
+        for missing_iter_ in missing_list:
+            logger.error(f"Missing file: {missing_iter_}")
+        for missing_source_iter_ in missing_source_list:
+            logger.error(f"Source file not found: {missing_source_iter_}")
+        raise ValueError(
+            f"Validation failed for {destination_uri}, "
+            f"{len(size_mismatch_list)} size mismatches, {len(missing_list)} missing files, "
+            f"{len(missing_source_list)} source files not found. "
+            f"Size mismatches: {size_mismatch_list[:MAX_PROBLEMS_IN_ERROR_MESSAGE]}, "
+            f"Missing files: {missing_list[:MAX_PROBLEMS_IN_ERROR_MESSAGE]}, "
+            f"Source files not found: {missing_source_list[:MAX_PROBLEMS_IN_ERROR_MESSAGE]}"
+        )
+
+    return {
+        "matchedCount": matched_count,
+        "sizeMismatchList": size_mismatch_list,
+        "missingList": missing_list,
+        "missingSourceList": missing_source_list,
+        "sourceFileCount": len(source_file_sizes),
+        "sourceTotalSizeInBytes": sum(map(lambda source_file_size_iter_: source_file_size_iter_[1], source_file_sizes)),
+    }
+
+
+# if __name__ == "__main__":
+#     from os import environ
+#     import json
+#
+#     environ['AWS_PROFILE'] = 'umccr-production'
+#     environ['AWS_REGION'] = 'ap-southeast-2'
+#     environ["ICAV2_ACCESS_TOKEN_SECRET_ID"] = "ICAv2JWTKey-umccr-prod-service-production"
+#
+#     print(json.dumps(
+#         handler(
+#             {
+#                 "destinationUri": "icav2://eba5c946-1677-441d-bbce-6a11baadecbb/primary/250710_A01052_0268_BHFK3GDSXF/202507115171ae40/InterOp/",
+#                 "sourceDataList": [
+#                     {
+#                         "projectId": "9ec02c1f-53ba-47a5-854d-e6b53101adb7",
+#                         "dataId": "fil.10f6702a1ae84c808f9c08ddbe7c5b66"
+#                     }
+#                 ],
+#                 "externalSourceUriList": []
+#             },
+#             None
+#         ),
+#         indent=4
+#     ))
+#
+#     # {
+#     #     "matchedCount": 1,
+#     #     "sizeMismatchList": [],
+#     #     "missingList": [],
+#     #     "missingSourceList": [],
+#     #     "sourceFileCount": 1,
+#     #     "sourceTotalSizeInBytes": 1234
+#     # }
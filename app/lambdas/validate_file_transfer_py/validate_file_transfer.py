@@ -26,7 +26,7 @@ from wrapica.project_data import coerce_data_id_or_uri_to_project_data_obj
 
 # Orcabus layer imports
 from orcabus_api_tools.filemanager import get_file_object_from_s3_uri
-from icav2_tools import set_icav2_env_vars
+from icav2_data_copy_tools import set_icav2_env_vars
 from orcabus_api_tools.filemanager.errors import S3FileNotFoundError
 
 
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+"""
+Shared helpers for the icav2 data copy manager lambdas
+
+Submodules are imported on first access rather than when the package is imported,
+so a lambda only pays for importing the submodules (and their dependencies) it actually uses at cold start.
+"""
+
+# Standard imports
+from importlib import import_module
+from itertools import chain
+from typing import Any, List
+
+# Exported names, grouped by the submodule that defines them
+_SUBMODULE_EXPORTS = {
+    # Manifests
+    'manifests': [
+        # Globals
+        'MANIFEST_BUCKET_NAME_ENV_VAR',
+        # Models
+        'ManifestPointer',
+        # Functions
+        'is_manifest_pointer',
+        'write_manifest',
+        'read_manifest',
+        'read_manifest_pages',
+        'iter_manifest_or_list',
+        'get_manifest_or_list_count',
+    ],
+    # Credentials
+    'credentials': [
+        'set_icav2_env_vars',
+        'get_icav2_api_client',
+    ],
+    # Rate limiting
+    'rate_limiting': [
+        'AdaptiveConcurrencyLimiter',
+        'AdaptiveRetry',
+        'get_icav2_rate_limiter',
+        'icav2_call_slot',
+    ],
+    # Presigned urls
+    'presigned_urls': [
+        'get_download_url',
+        'get_download_urls',
+        'create_files_with_upload_urls',
+    ],
+    # Filemanager
+    'filemanager': [
+        'ExternalSourceFileMetadata',
+        'group_s3_keys_by_bucket',
+        'get_file_objects_from_s3_uris',
+        'get_external_source_file_metadata_list',
+    ],
+    # s3 multipart helpers
+    's3_parts': [
+        'ResumeToken',
+        'get_part_size',
+        'get_uploaded_parts',
+        'copy_s3_object',
+    ],
+    # Direct copy
+    'direct_copy': [
+        'direct_copy_project_data',
+    ],
+    # Resumable upload
+    'resumable_upload': [
+        'start_resumable_upload',
+        'upload_remaining_parts',
+    ],
+    # Cleanup
+    'cleanup': [
+        'DeletionSummary',
+        'delete_project_data_records',
+    ],
+    # Serialisation
+    'serialisation': [
+        'to_json_serialisable',
+    ],
+    # Listing
+    'listing': [
+        'ProjectDataRecord',
+        'iter_project_data_records',
+        'iter_project_data_records_by_id',
+    ],
+    # Continuation
+    'continuation': [
+        'ContinuationCursor',
+        'TimeBudget',
+        'get_continuation_cursor',
+        'save_partial_results',
+        'iter_partial_results',
+    ],
+    # Work queue
+    'work_queue': [
+        'WORK_QUEUE_URL_ENV_VAR',
+        'SqsWorkQueue',
+        'WorkQueueWriter',
+        'DynamoDbWorkQueueTracker',
+        'get_work_queue',
+    ],
+    # Task token registry
+    'task_token_registry': [
+        'RegisteredTaskToken',
+        'HeartbeatSummary',
+        'DynamoDbTaskTokenRegistry',
+        'send_task_heartbeats',
+        'get_task_token_registry',
+    ],
+    # Admission control
+    'admission_control': [
+        'CopyJobWaiter',
+        'AdmissionSummary',
+        'DynamoDbAdmissionController',
+        'drain_waiters',
+        'drain_all_waiters',
+        'heartbeat_all_waiters',
+        'request_copy_job_lease',
+        'release_copy_job_lease',
+        'get_admission_controller',
+    ],
+    # Copy job batching
+    'copy_job_batching': [
+        'CopyJobBatchMember',
+        'JoinedCopyJobBatch',
+        'ClosedCopyJobBatch',
+        'DynamoDbCopyJobBatcher',
+        'join_copy_job_batch',
+        'close_copy_job_batch',
+        'complete_copy_job_batch',
+        'abandon_copy_job_batch',
+        'get_copy_job_batcher',
+    ],
+}
+
+_EXPORT_TO_SUBMODULE = {
+    export_iter_: submodule_iter_
+    for submodule_iter_, export_list_iter_ in _SUBMODULE_EXPORTS.items()
+    for export_iter_ in export_list_iter_
+}
+
+__all__ = list(chain.from_iterable(_SUBMODULE_EXPORTS.values()))
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORT_TO_SUBMODULE:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(f".{_EXPORT_TO_SUBMODULE[name]}", __name__), name)
+
+    # Cache on the package so we only go through __getattr__ once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals().keys()).union(__all__))
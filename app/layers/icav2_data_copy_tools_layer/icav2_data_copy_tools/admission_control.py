@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+
+"""
+Admission control for ICAv2 copy jobs
+
+Without a limit, every handle copy jobs execution (and every subfolder copied through the internal event bus)
+submits its copy job as soon as it is ready. ICAv2 then holds most of them in WAITING_FOR_RESOURCES,
+while we keep checking and heartbeating all of them.
+
+Instead, a copy job must hold a lease for its destination project before it is submitted,
+at most MAX_COPY_JOB_LEASES_PER_PROJECT leases are held per project at once.
+
+The leases of a project are held in a single row of the job table
+
+{
+    "id": "<project id>",
+    "id_type": "COPY_JOB_LEASES",
+    "leases": {"<lease id>": <lease expiry epoch seconds>, ...},
+    "version": 12
+}
+
+updated optimistically (conditioned on the version read), so two requests cannot take the last lease.
+Leases expire after COPY_JOB_LEASE_DURATION, so a lease left behind by a stopped execution does not hold its slot forever.
+
+Requests waiting for a lease are queued as rows of the job table
+
+{
+    "id": "<project id>#<fair share tag, epoch milliseconds>#<lease id>",
+    "id_type": "COPY_JOB_WAITER",
+    "task_token": "...",
+    "expire_at": 1234567890
+}
+
+The queue is ordered by a weighted fair share tag rather than by arrival,
+the tag is the time the request was enqueued, plus the (estimated) time its copy job takes divided by the weight of its priority.
+Small or high priority copy jobs therefore overtake bulk ones,
+while a bulk copy job is overtaken for at most MAX_FAIR_SHARE_DELAY.
+
+The step function waits on its task token, a waiter is sent its lease id (as the task output)
+once it reaches the front of the queue and a lease is free.
+The queue is drained whenever a request arrives, a lease is released, and on each external heartbeat.
+A new request is drained along with the queue it has just joined,
+rather than relying on the (eventually consistent) id_type index to list it.
+The external heartbeat also sends a heartbeat to each waiter still queued, and removes the waiters whose execution has ended,
+it keeps running while any waiters or leases remain.
+"""
+
+# Standard imports
+import typing
+from datetime import datetime, timedelta, timezone
+from os import environ
+from typing import Callable, Dict, List, Optional, TypedDict
+from uuid import uuid4
+import logging
+
+import boto3
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBClient
+    from mypy_boto3_stepfunctions import SFNClient
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+TABLE_NAME_ENV_VAR = "TABLE_NAME"
+# Should match TABLE_ID_TYPE_INDEX_NAME in the infrastructure constants
+ID_TYPE_INDEX_NAME = "id_type-index"
+COPY_JOB_LEASES_ID_TYPE = "COPY_JOB_LEASES"
+COPY_JOB_WAITER_ID_TYPE = "COPY_JOB_WAITER"
+MAX_COPY_JOB_LEASES_PER_PROJECT = 10
+# Longer than almost all copy jobs, a lease that outlives its job only lets an extra job through
+COPY_JOB_LEASE_DURATION = timedelta(hours=24)
+COPY_JOB_WAITER_EXPIRY = timedelta(days=7)
+MAX_LEASE_ATTEMPTS = 10
+# Copy request priorities and their fair share weights
+DEFAULT_PRIORITY = "NORMAL"
+PRIORITY_WEIGHTS = {
+    "HIGH": 4.0,
+    "NORMAL": 1.0,
+    "LOW": 0.25,
+}
+# Same throughput assumption as the copy job status checks
+FAIR_SHARE_BYTES_PER_SECOND = 100 * 1024 * 1024
+FAIR_SHARE_COPY_JOB_OVERHEAD = timedelta(minutes=1)
+MAX_FAIR_SHARE_DELAY = timedelta(hours=6)
+# Task tokens of finished executions
+EXPIRED_TASK_TOKEN_ERROR_CODES = frozenset({"TaskTimedOut", "InvalidToken", "TaskDoesNotExist"})
+
+
+class CopyJobWaiter(TypedDict):
+    waiterId: str
+    leaseId: str
+    taskToken: str
+
+
+class AdmissionSummary(TypedDict):
+    waitingCopyJobCount: int
+    heldCopyJobLeaseCount: int
+
+
+def get_dynamodb_client() -> 'DynamoDBClient':
+    return boto3.client('dynamodb')
+
+
+def get_sfn_client() -> 'SFNClient':
+    return boto3.client('stepfunctions')
+
+
+def new_lease_id() -> str:
+    return str(uuid4())
+
+
+def get_priority_weight(priority: Optional[str]) -> float:
+    return PRIORITY_WEIGHTS.get(priority or DEFAULT_PRIORITY, PRIORITY_WEIGHTS[DEFAULT_PRIORITY])
+
+
+def get_highest_priority(priority_list: List[Optional[str]]) -> str:
+    return max(
+        map(lambda priority_iter_: priority_iter_ or DEFAULT_PRIORITY, priority_list),
+        key=get_priority_weight,
+        default=DEFAULT_PRIORITY
+    )
+
+
+def get_fair_share_tag(priority: Optional[str], total_size_in_bytes: int) -> datetime:
+    """
+    The time a request would finish if it had its (weighted) share of the copy job leases to itself,
+    waiters are admitted in order of their tag
+    :param priority:
+    :param total_size_in_bytes:
+    :return:
+    """
+    expected_duration = FAIR_SHARE_COPY_JOB_OVERHEAD + timedelta(
+        seconds=(total_size_in_bytes or 0) / FAIR_SHARE_BYTES_PER_SECOND
+    )
+    return datetime.now(timezone.utc) + min(
+        expected_duration / get_priority_weight(priority),
+        MAX_FAIR_SHARE_DELAY
+    )
+
+
+def get_waiter_id(project_id: str, lease_id: str, priority: Optional[str] = None, total_size_in_bytes: int = 0) -> str:
+    # Zero padded, so waiter ids sort in the order of their fair share tag
+    fair_share_tag = get_fair_share_tag(priority, total_size_in_bytes)
+    return f"{project_id}#{int(fair_share_tag.timestamp() * 1000):015d}#{lease_id}"
+
+
+def get_project_id_from_waiter_id(waiter_id: str) -> str:
+    return waiter_id.rsplit("#", 2)[0]
+
+
+class DynamoDbAdmissionController:
+    """
+    Admission controller in the job table, at most max_leases_per_project copy job leases are held per project
+    """
+    def __init__(self, table_name: Optional[str] = None, max_leases_per_project: int = MAX_COPY_JOB_LEASES_PER_PROJECT):
+        self.max_leases_per_project = max_leases_per_project
+        self.table_name = table_name if table_name is not None else environ[TABLE_NAME_ENV_VAR]
+
+    def _get_leases_row(self, project_id: str) -> Dict:
+        response = get_dynamodb_client().get_item(
+            TableName=self.table_name,
+            Key={
+                "id": {"S": project_id},
+                "id_type": {"S": COPY_JOB_LEASES_ID_TYPE},
+            },
+            ConsistentRead=True,
+        )
+        item = response.get('Item', {})
+        return {
+            "leases": dict(map(
+                lambda lease_iter_: (lease_iter_[0], int(lease_iter_[1]['N'])),
+                item.get('leases', {}).get('M', {}).items()
+            )),
+            "version": int(item['version']['N']) if 'version' in item else None,
+        }
+
+    def try_acquire(self, project_id: str, lease_id: str) -> bool:
+        """
+        Take a lease for the project if one is free
+        :param project_id:
+        :param lease_id:
+        :return: True if the lease was taken
+        """
+        dynamodb_client = get_dynamodb_client()
+
+        for _ in range(MAX_LEASE_ATTEMPTS):
+            leases_row = self._get_leases_row(project_id)
+            now = datetime.now(timezone.utc)
+
+            # Drop expired leases as we go
+            live_leases = dict(filter(
+                lambda lease_iter_: lease_iter_[1] > now.timestamp(),
+                leases_row['leases'].items()
+            ))
+            if len(live_leases) >= self.max_leases_per_project:
+                return False
+            live_leases[lease_id] = int((now + COPY_JOB_LEASE_DURATION).timestamp())
+
+            try:
+                dynamodb_client.update_item(
+                    TableName=self.table_name,
+                    Key={
+                        "id": {"S": project_id},
+                        "id_type": {"S": COPY_JOB_LEASES_ID_TYPE},
+                    },
+                    UpdateExpression="SET leases = :leases, version = :new_version",
+                    ConditionExpression=(
+                        "attribute_not_exists(version)"
+                        if leases_row['version'] is None
+                        else "version = :version"
+                    ),
+                    ExpressionAttributeValues={
+                        ":leases": {"M": dict(map(
+                            lambda lease_iter_: (lease_iter_[0], {"N": str(lease_iter_[1])}),
+                            live_leases.items()
+                        ))},
+                        ":new_version": {"N": str((leases_row['version'] or 0) + 1)},
+                        **(
+                            {":version": {"N": str(leases_row['version'])}}
+                            if leases_row['version'] is not None
+                            else {}
+                        )
+                    },
+                )
+            except dynamodb_client.exceptions.ConditionalCheckFailedException:
+                # Another request changed the leases since we read them, read them again
+                continue
+            return True
+
+        logger.warning(f"Could not take a copy job lease for project {project_id} after {MAX_LEASE_ATTEMPTS} attempts")
+        return False
+
+    def release(self, project_id: str, lease_id: str):
+        dynamodb_client = get_dynamodb_client()
+        try:
+            dynamodb_client.update_item(
+                TableName=self.table_name,
+                Key={
+                    "id": {"S": project_id},
+                    "id_type": {"S": COPY_JOB_LEASES_ID_TYPE},
+                },
+                UpdateExpression="REMOVE leases.#lease_id ADD version :one",
+                ConditionExpression="attribute_exists(leases)",
+                ExpressionAttributeNames={"#lease_id": lease_id},
+                ExpressionAttributeValues={":one": {"N": "1"}},
+            )
+        except dynamodb_client.exceptions.ConditionalCheckFailedException:
+            logger.info(f"No copy job leases held for project {project_id}")
+
+    def enqueue(
+            self,
+            project_id: str,
+            lease_id: str,
+            task_token: str,
+            priority: Optional[str] = None,
+            total_size_in_bytes: int = 0,
+    ) -> CopyJobWaiter:
+        waiter_id = get_waiter_id(project_id, lease_id, priority, total_size_in_bytes)
+        get_dynamodb_client().put_item(
+            TableName=self.table_name,
+            Item={
+                "id": {"S": waiter_id},
+                "id_type": {"S": COPY_JOB_WAITER_ID_TYPE},
+                "task_token": {"S": task_token},
+                "expire_at": {"N": str(int((datetime.now(timezone.utc) + COPY_JOB_WAITER_EXPIRY).timestamp()))},
+            }
+        )
+        return {
+            "waiterId": waiter_id,
+            "leaseId": lease_id,
+            "taskToken": task_token,
+        }
+
+    def list_waiters(self, project_id: str, limit: Optional[int] = None) -> List[CopyJobWaiter]:
+        """
+        List the waiters of a project, in order of their fair share tag
+        :param project_id:
+        :param limit:
+        :return:
+        """
+        waiter_list: List[CopyJobWaiter] = []
+        for page_iter_ in get_dynamodb_client().get_paginator('query').paginate(
+            TableName=self.table_name,
+            IndexName=ID_TYPE_INDEX_NAME,
+            KeyConditionExpression="id_type = :id_type AND begins_with(id, :project_prefix)",
+            ExpressionAttributeValues={
+                ":id_type": {"S": COPY_JOB_WAITER_ID_TYPE},
+                ":project_prefix": {"S": f"{project_id}#"},
+            },
+            ScanIndexForward=True,
+        ):
+            waiter_list.extend(map(
+                lambda item_iter_: {
+                    "waiterId": item_iter_['id']['S'],
+                    "leaseId": item_iter_['id']['S'].rsplit("#", 1)[-1],
+                    "taskToken": item_iter_['task_token']['S'],
+                },
+                page_iter_.get('Items', [])
+            ))
+            if limit is not None and len(waiter_list) >= limit:
+                return waiter_list[:limit]
+
+        return waiter_list
+
+    def claim_waiter(self, waiter_id: str) -> bool:
+        """
+        Remove a waiter from the queue, False if it has already been removed (i.e by another drain)
+        :param waiter_id:
+        :return:
+        """
+        dynamodb_client = get_dynamodb_client()
+        try:
+            dynamodb_client.delete_item(
+                TableName=self.table_name,
+                Key={
+                    "id": {"S": waiter_id},
+                    "id_type": {"S": COPY_JOB_WAITER_ID_TYPE},
+                },
+                ConditionExpression="attribute_exists(id)",
+            )
+        except dynamodb_client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def list_waiting_project_ids(self) -> List[str]:
+        waiting_project_id_set = set()
+        for page_iter_ in get_dynamodb_client().get_paginator('query').paginate(
+            TableName=self.table_name,
+            IndexName=ID_TYPE_INDEX_NAME,
+            KeyConditionExpression="id_type = :id_type",
+            ExpressionAttributeValues={":id_type": {"S": COPY_JOB_WAITER_ID_TYPE}},
+            ProjectionExpression="id",
+        ):
+            waiting_project_id_set.update(map(
+                lambda item_iter_: get_project_id_from_waiter_id(item_iter_['id']['S']),
+                page_iter_.get('Items', [])
+            ))
+
+        return sorted(waiting_project_id_set)
+
+    def count_held_leases(self) -> int:
+        """
+        Count the unexpired leases held across all projects
+        :return:
+        """
+        now = datetime.now(timezone.utc)
+        held_lease_count = 0
+        for page_iter_ in get_dynamodb_client().get_paginator('query').paginate(
+            TableName=self.table_name,
+            IndexName=ID_TYPE_INDEX_NAME,
+            KeyConditionExpression="id_type = :id_type",
+            ExpressionAttributeValues={":id_type": {"S": COPY_JOB_LEASES_ID_TYPE}},
+        ):
+            for item_iter_ in page_iter_.get('Items', []):
+                held_lease_count += len(list(filter(
+                    lambda lease_iter_: int(lease_iter_['N']) > now.timestamp(),
+                    item_iter_.get('leases', {}).get('M', {}).values()
+                )))
+
+        return held_lease_count
+
+
+def send_lease_to_waiter(waiter: CopyJobWaiter) -> bool:
+    """
+    Send the lease id to a waiting step function
+    :param waiter:
+    :return: False if the waiter's task token has expired (its execution has ended)
+    """
+    import json
+    from botocore.exceptions import ClientError
+
+    try:
+        get_sfn_client().send_task_success(
+            taskToken=waiter['taskToken'],
+            output=json.dumps({"leaseId": waiter['leaseId']}),
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in EXPIRED_TASK_TOKEN_ERROR_CODES:
+            logger.info(f"Task token of waiter {waiter['waiterId']} has expired, {e}")
+            return False
+        raise
+
+    return True
+
+
+def send_heartbeat_to_waiter(waiter: CopyJobWaiter) -> bool:
+    """
+    Send a heartbeat to a waiting step function
+    :param waiter:
+    :return: False if the waiter's task token has expired (its execution has ended)
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        get_sfn_client().send_task_heartbeat(taskToken=waiter['taskToken'])
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in EXPIRED_TASK_TOKEN_ERROR_CODES:
+            logger.info(f"Task token of waiter {waiter['waiterId']} has expired, {e}")
+            return False
+        raise
+
+    return True
+
+
+def drain_waiters(
+        admission_controller: DynamoDbAdmissionController,
+        project_id: str,
+        send_lease_fn: Callable[[CopyJobWaiter], bool] = send_lease_to_waiter,
+        new_waiter: Optional[CopyJobWaiter] = None,
+) -> int:
+    """
+    Hand out free leases of a project to its waiters, in order of their fair share tag
+    :param admission_controller:
+    :param project_id:
+    :param send_lease_fn: Sends the lease to the waiter, returns False if the waiter has gone
+    :param new_waiter: A waiter just enqueued, that the id_type index may not list yet
+    :return: The number of waiters admitted
+    """
+    admitted_count = 0
+
+    waiter_list = admission_controller.list_waiters(
+        project_id,
+        limit=admission_controller.max_leases_per_project
+    )
+    if (
+        new_waiter is not None and
+        new_waiter['waiterId'] not in map(lambda waiter_iter_: waiter_iter_['waiterId'], waiter_list)
+    ):
+        waiter_list = sorted(
+            waiter_list + [new_waiter],
+            key=lambda waiter_iter_: waiter_iter_['waiterId']
+        )[:admission_controller.max_leases_per_project]
+
+    for waiter_iter_ in waiter_list:
+        if not admission_controller.try_acquire(project_id, waiter_iter_['leaseId']):
+            break
+
+        # Another drain may have admitted this waiter already
+        if not admission_controller.claim_waiter(waiter_iter_['waiterId']):
+            admission_controller.release(project_id, waiter_iter_['leaseId'])
+            continue
+
+        try:
+            is_sent = send_lease_fn(waiter_iter_)
+        except Exception:
+            admission_controller.release(project_id, waiter_iter_['leaseId'])
+            raise
+        if not is_sent:
+            admission_controller.release(project_id, waiter_iter_['leaseId'])
+            continue
+
+        admitted_count += 1
+
+    return admitted_count
+
+
+def request_copy_job_lease(
+        admission_controller: DynamoDbAdmissionController,
+        project_id: str,
+        task_token: str,
+        priority: Optional[str] = None,
+        total_size_in_bytes: int = 0,
+) -> str:
+    """
+    Queue a request for a copy job lease, then drain the queue,
+    the request is admitted straight away if it is at the front of the queue and a lease is free
+    :param admission_controller:
+    :param project_id:
+    :param task_token:
+    :param priority: One of HIGH, NORMAL or LOW
+    :param total_size_in_bytes: The total size of the files in the copy job
+    :return: The lease id, sent to the task token once admitted
+    """
+    lease_id = new_lease_id()
+    # Always queue first, so a new request only overtakes those already waiting by its fair share tag
+    new_waiter = admission_controller.enqueue(project_id, lease_id, task_token, priority, total_size_in_bytes)
+    drain_waiters(admission_controller, project_id, new_waiter=new_waiter)
+    return lease_id
+
+
+def release_copy_job_lease(
+        admission_controller: DynamoDbAdmissionController,
+        project_id: str,
+        lease_id: str,
+) -> int:
+    """
+    Release a copy job lease and admit the next waiters
+    :param admission_controller:
+    :param project_id:
+    :param lease_id:
+    :return: The number of waiters admitted
+    """
+    admission_controller.release(project_id, lease_id)
+    return drain_waiters(admission_controller, project_id)
+
+
+def drain_all_waiters(admission_controller: DynamoDbAdmissionController) -> int:
+    """
+    Admit waiters on every project with a queue, picks up leases freed by expiry
+    :param admission_controller:
+    :return: The number of waiters admitted
+    """
+    return sum(map(
+        lambda project_id_iter_: drain_waiters(admission_controller, project_id_iter_),
+        admission_controller.list_waiting_project_ids()
+    ))
+
+
+def heartbeat_all_waiters(admission_controller: DynamoDbAdmissionController) -> AdmissionSummary:
+    """
+    Send a heartbeat to every waiter still queued, removing those whose execution has ended,
+    and count the waiters and leases remaining
+    :param admission_controller:
+    :return:
+    """
+    waiting_copy_job_count = 0
+    for project_id_iter_ in admission_controller.list_waiting_project_ids():
+        for waiter_iter_ in admission_controller.list_waiters(project_id_iter_):
+            if send_heartbeat_to_waiter(waiter_iter_):
+                waiting_copy_job_count += 1
+                continue
+            admission_controller.claim_waiter(waiter_iter_['waiterId'])
+
+    return {
+        "waitingCopyJobCount": waiting_copy_job_count,
+        "heldCopyJobLeaseCount": admission_controller.count_held_leases(),
+    }
+
+
+def get_admission_controller() -> DynamoDbAdmissionController:
+    return DynamoDbAdmissionController()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+"""
+Bulk deletion of destination data
+
+A failed copy job can leave hundreds of PARTIAL files in the destination folder, which must be removed before a rerun.
+Deleting these one at a time (and sleeping after each delete so the deletion is visible) dominates the rerun latency.
+
+Instead, delete_project_data_records
+* schedules the deletions concurrently (bounded by max_workers, and by the shared ICAv2 rate limiter), then
+* polls until each deletion is visible (the data can no longer be found), rather than sleeping a fixed time, and
+* returns a summary of what was removed, what failed and what was still visible once we stopped polling.
+
+A deletion that is still visible once we stop polling is treated as a failure,
+since rerunning a copy (or recreating a file) over data that is still there may fail or leave the old data in place.
+"""
+
+# Standard imports
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+from typing import Iterable, List, Optional, TypedDict, Union
+import logging
+
+# Local imports
+from .credentials import get_icav2_api_client
+from .listing import ProjectDataRecord
+from .rate_limiting import icav2_call_slot
+
+if typing.TYPE_CHECKING:
+    from wrapica.libica_models import ProjectData
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+DELETION_MAX_WORKERS = 8
+DELETION_POLL_INITIAL_INTERVAL = 0.5  # seconds, doubled after each poll
+DELETION_POLL_MAX_INTERVAL = 4  # seconds
+DELETION_POLL_TIMEOUT = 60  # seconds
+# The delete endpoint is a non-RESTful (':delete') endpoint, it needs the v3 content type set explicitly
+ICAV2_V3_HEADERS = {
+    "Content-Type": "application/vnd.illumina.v3+json",
+    "Accept": "application/vnd.illumina.v3+json",
+}
+
+
+class DeletionSummary(TypedDict):
+    deletedCount: int
+    deletedPathList: List[str]
+    failedPathList: List[str]
+    unconfirmedPathList: List[str]
+
+
+def _delete_record(record: ProjectDataRecord) -> Optional[Exception]:
+    from libica.openapi.v3 import ApiException
+    from libica.openapi.v3.api.project_data_api import ProjectDataApi
+
+    try:
+        with icav2_call_slot():
+            ProjectDataApi(get_icav2_api_client()).delete_data(
+                project_id=record.project_id,
+                data_id=record.data_id,
+                _headers=ICAV2_V3_HEADERS,
+            )
+    except ApiException as e:
+        # Already gone
+        if e.status == 404:
+            return None
+        logger.warning(f"Could not delete {record.path}: {e}")
+        return e
+
+    return None
+
+
+def _is_deleted(record: ProjectDataRecord) -> bool:
+    from libica.openapi.v3 import ApiException
+    from libica.openapi.v3.api.project_data_api import ProjectDataApi
+
+    try:
+        with icav2_call_slot():
+            ProjectDataApi(get_icav2_api_client()).get_project_data(
+                project_id=record.project_id,
+                data_id=record.data_id,
+            )
+    except ApiException as e:
+        if e.status == 404:
+            return True
+        # Treat as still visible, we poll again
+        logger.warning(f"Could not check whether {record.path} has been deleted: {e}")
+
+    return False
+
+
+def wait_for_deletions(
+        record_list: List[ProjectDataRecord],
+        max_workers: int = DELETION_MAX_WORKERS,
+        timeout: float = DELETION_POLL_TIMEOUT,
+) -> List[ProjectDataRecord]:
+    """
+    Poll until each record can no longer be found, with a growing interval between polls.
+    Returns the records still visible once the timeout has passed
+    :param record_list:
+    :param max_workers:
+    :param timeout: seconds
+    :return:
+    """
+    deadline = monotonic() + timeout
+    poll_interval = DELETION_POLL_INITIAL_INTERVAL
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(record_list) > 0:
+            sleep(min(poll_interval, max(0.0, deadline - monotonic())))
+            record_list = list(map(
+                lambda record_and_is_deleted_iter_: record_and_is_deleted_iter_[0],
+                filter(
+                    lambda record_and_is_deleted_iter_: not record_and_is_deleted_iter_[1],
+                    zip(record_list, executor.map(_is_deleted, record_list))
+                )
+            ))
+            if monotonic() >= deadline:
+                break
+            poll_interval = min(poll_interval * 2, DELETION_POLL_MAX_INTERVAL)
+
+    return record_list
+
+
+def delete_project_data_records(
+        records: Iterable[Union[ProjectDataRecord, 'ProjectData']],
+        max_workers: int = DELETION_MAX_WORKERS,
+        wait_for_visibility: bool = True,
+        raise_on_failure: bool = True,
+) -> DeletionSummary:
+    """
+    Delete many project data objects concurrently, and (optionally) wait until the deletions are visible
+    :param records: ProjectDataRecords (i.e from iter_project_data_records) or wrapica ProjectData objects
+    :param max_workers: The maximum number of deletions in flight at once
+    :param wait_for_visibility: Poll until each deleted object can no longer be found
+    :param raise_on_failure: Raise once all deletions have been attempted if any of them failed,
+      or (with wait_for_visibility) any of them were still visible once we stopped polling
+    :return: deletedPathList only holds the deletions that were confirmed (if we waited for them)
+    """
+    record_list: List[ProjectDataRecord] = list(map(
+        lambda record_iter_: (
+            record_iter_
+            if isinstance(record_iter_, ProjectDataRecord)
+            else ProjectDataRecord.from_project_data(record_iter_)
+        ),
+        records
+    ))
+
+    summary: DeletionSummary = {
+        "deletedCount": 0,
+        "deletedPathList": [],
+        "failedPathList": [],
+        "unconfirmedPathList": [],
+    }
+
+    if len(record_list) == 0:
+        return summary
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(record_list))) as executor:
+        error_list = list(executor.map(_delete_record, record_list))
+
+    deleted_record_list = []
+    for record_iter_, error_iter_ in zip(record_list, error_list):
+        if error_iter_ is not None:
+            summary["failedPathList"].append(record_iter_.path)
+            continue
+        deleted_record_list.append(record_iter_)
+
+    if wait_for_visibility:
+        unconfirmed_record_list = wait_for_deletions(
+            deleted_record_list,
+            max_workers=min(max_workers, max(1, len(deleted_record_list)))
+        )
+        summary["unconfirmedPathList"] = list(map(lambda record_iter_: record_iter_.path, unconfirmed_record_list))
+        deleted_record_list = list(filter(
+            lambda record_iter_: record_iter_ not in unconfirmed_record_list,
+            deleted_record_list
+        ))
+
+    summary["deletedCount"] = len(deleted_record_list)
+    summary["deletedPathList"] = list(map(lambda record_iter_: record_iter_.path, deleted_record_list))
+
+    logger.info(
+        f"Deleted {summary['deletedCount']} of {len(record_list)} objects, "
+        f"{len(summary['failedPathList'])} failed, "
+        f"{len(summary['unconfirmedPathList'])} still visible after polling"
+    )
+
+    if raise_on_failure and (len(summary["failedPathList"]) > 0 or len(summary["unconfirmedPathList"]) > 0):
+        raise RuntimeError(
+            f"Could not delete [{', '.join(summary['failedPathList'])}], "
+            f"deleted but still visible after polling [{', '.join(summary['unconfirmedPathList'])}]"
+        )
+
+    return summary
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+"""
+Continuation helpers
+
+The planning lambdas perform an unbounded number of serial api calls within the 900 second lambda timeout.
+Rather than timing out (and having the step function retry from scratch),
+a handler checks its time budget between items and, once the budget is exhausted,
+returns a continuation cursor in place of its results.
+
+The step function loops, passing the cursor back to the same lambda, until no cursor is returned.
+
+A continuation cursor looks like the following
+
+{
+    "nextIndex": 1234,
+    "partManifests": {
+        "sourceDataList": [
+            {"bucket": "...", "key": "manifests/<execution-name>/sourceDataList.part0000.jsonl", "count": 1234}
+        ]
+    }
+}
+
+Partial results are written to the manifest bucket as part manifests, the final invocation
+reads the parts back and writes them (followed by its own results) to the final manifest.
+Any other keys a handler needs to carry between invocations can be added to the cursor.
+"""
+
+# Standard imports
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypedDict
+
+# Local imports
+from .manifests import ManifestPointer, read_manifest, write_manifest
+
+# Globals
+# Leave enough time to write the partial results and return
+DEFAULT_TIME_RESERVE_MS = 60 * 1000
+
+
+class ContinuationCursor(TypedDict, total=False):
+    nextIndex: int
+    partManifests: Dict[str, List[ManifestPointer]]
+
+
+class TimeBudget:
+    """
+    Track the remaining time of a lambda invocation
+    """
+    def __init__(self, context: Optional[Any], reserve_ms: int = DEFAULT_TIME_RESERVE_MS):
+        self.context = context
+        self.reserve_ms = reserve_ms
+
+    def remaining_ms(self) -> Optional[int]:
+        # No context when running locally, the budget is unlimited
+        if self.context is None:
+            return None
+        return self.context.get_remaining_time_in_millis()
+
+    def is_exhausted(self) -> bool:
+        remaining_ms = self.remaining_ms()
+        return remaining_ms is not None and remaining_ms < self.reserve_ms
+
+
+def get_continuation_cursor(event: Dict[str, Any]) -> ContinuationCursor:
+    """
+    Get the continuation cursor from the event, or a fresh cursor if this is the first invocation
+    :param event:
+    :return:
+    """
+    continuation_cursor = event.get("continuationCursor")
+    if continuation_cursor is None:
+        return {
+            "nextIndex": 0,
+            "partManifests": {},
+        }
+    return continuation_cursor
+
+
+def save_partial_results(
+        continuation_cursor: ContinuationCursor,
+        next_index: int,
+        partial_results: Dict[str, Iterable[Any]],
+        manifest_prefix: Optional[str] = None,
+) -> ContinuationCursor:
+    """
+    Write the results gathered by this invocation as part manifests and advance the cursor
+    :param continuation_cursor:
+    :param next_index: The index of the first item the next invocation should process
+    :param partial_results: The results gathered by this invocation, keyed by manifest name
+    :param manifest_prefix:
+    :return:
+    """
+    part_manifests = continuation_cursor.get("partManifests", {})
+
+    for manifest_name, item_iter in partial_results.items():
+        manifest_part_list = part_manifests.get(manifest_name, [])
+        manifest_part_list.append(
+            write_manifest(
+                item_iter,
+                manifest_name=f"{manifest_name}.part{len(manifest_part_list):04d}",
+                manifest_prefix=manifest_prefix
+            )
+        )
+        part_manifests[manifest_name] = manifest_part_list
+
+    return {
+        **continuation_cursor,
+        "nextIndex": next_index,
+        "partManifests": part_manifests,
+    }
+
+
+def iter_partial_results(
+        continuation_cursor: ContinuationCursor,
+        manifest_name: str
+) -> Iterator[Any]:
+    """
+    Stream the results written by previous invocations for a given manifest name
+    :param continuation_cursor:
+    :param manifest_name:
+    :return:
+    """
+    return chain.from_iterable(
+        map(
+            read_manifest,
+            continuation_cursor.get("partManifests", {}).get(manifest_name, [])
+        )
+    )
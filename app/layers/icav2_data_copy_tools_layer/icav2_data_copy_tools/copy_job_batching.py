@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+
+"""
+Coalesce copy requests for the same destination folder into shared ICAv2 copy jobs
+
+Every handle copy jobs execution (and every subfolder copied through the internal event bus)
+would otherwise submit its own copy job, even when dozens of requests for the same destination folder
+arrive within seconds of each other (i.e per-library copies after a run).
+
+Instead, a copy request joins the open copy batch of its destination folder.
+The first request to join a batch is its leader, it waits a short window for other requests to join,
+closes the batch and submits one copy job for the (deduplicated) source data of every member,
+at the highest priority of its members.
+Once the copy job finishes, the leader sends the result to the task token of every other member.
+
+The open batch of a destination folder is a row of the job table
+
+{
+    "id": "<destination project id>#<destination data id>",
+    "id_type": "COPY_JOB_BATCH",
+    "batch_id": "<uuid>",
+    "member_count": 3,
+    "opened_at": 1234567890,
+    "expire_at": 1234567890
+}
+
+and each member of a batch is a row of the job table
+
+{
+    "id": "<batch id>#<member index>",
+    "id_type": "COPY_JOB_BATCH_MEMBER",
+    "source_data": "<json of the source data manifest or list>",
+    "priority": "NORMAL",
+    "task_token": "...",  # Not set for the leader
+    "expire_at": 1234567890
+}
+
+A member row is written in the same transaction as the increment of the batch member count,
+and closing a batch deletes its open batch row, so no request can join a batch after it is closed.
+A batch that is full, or has been open for longer than COPY_JOB_BATCH_MAX_OPEN_DURATION
+(i.e its leader has stopped), is replaced by a new batch.
+The request that replaces a stale batch fails the members waiting on it (with CopyJobBatchAbandoned),
+so they rejoin a new batch rather than waiting out their timeout on a leader that will never send them a result.
+"""
+
+# Standard imports
+import json
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import chain, count
+from os import environ
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypedDict
+from uuid import uuid4
+import logging
+
+import boto3
+
+# Local imports
+from .admission_control import DEFAULT_PRIORITY, get_highest_priority
+from .manifests import ManifestPointer, iter_manifest_or_list, write_manifest
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBClient
+    from mypy_boto3_stepfunctions import SFNClient
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+TABLE_NAME_ENV_VAR = "TABLE_NAME"
+COPY_JOB_BATCH_ID_TYPE = "COPY_JOB_BATCH"
+COPY_JOB_BATCH_MEMBER_ID_TYPE = "COPY_JOB_BATCH_MEMBER"
+MAX_COPY_JOB_BATCH_MEMBERS = 50
+# The leader closes its batch after a few seconds,
+# a batch left open for much longer than that has lost its leader
+COPY_JOB_BATCH_MAX_OPEN_DURATION = timedelta(minutes=5)
+COPY_JOB_BATCH_EXPIRY = timedelta(days=7)
+MAX_JOIN_ATTEMPTS = 10
+MAX_COMPLETION_WORKERS = 16
+# DynamoDB batch get limit
+MEMBER_PAGE_SIZE = 100
+COPY_JOB_FAILED_ERROR = "CopyJobFailed"
+COPY_JOB_BATCH_ABANDONED_ERROR = "CopyJobBatchAbandoned"
+# Task tokens of finished executions
+EXPIRED_TASK_TOKEN_ERROR_CODES = frozenset({"TaskTimedOut", "InvalidToken", "TaskDoesNotExist"})
+
+
+class CopyJobBatchMember(TypedDict):
+    memberId: str
+    sourceData: Any  # Manifest pointer or inline list
+    priority: str
+    taskToken: Optional[str]
+
+
+class JoinedCopyJobBatch(TypedDict):
+    batchId: str
+    isBatchLeader: bool
+
+
+class ClosedCopyJobBatch(TypedDict):
+    sourceDataManifest: ManifestPointer
+    totalSizeInBytes: int
+    priority: str
+
+
+def get_dynamodb_client() -> 'DynamoDBClient':
+    return boto3.client('dynamodb')
+
+
+def get_sfn_client() -> 'SFNClient':
+    return boto3.client('stepfunctions')
+
+
+def new_batch_id() -> str:
+    return str(uuid4())
+
+
+def get_destination_key(destination_data: Dict[str, str]) -> str:
+    return f"{destination_data['projectId']}#{destination_data['dataId']}"
+
+
+def get_member_id(batch_id: str, member_index: int) -> str:
+    # Zero padded, so member ids sort in the order they joined
+    return f"{batch_id}#{member_index:04d}"
+
+
+class DynamoDbCopyJobBatcher:
+    """
+    Copy job batcher in the job table, at most max_batch_members requests share a copy job
+    """
+    def __init__(self, table_name: Optional[str] = None, max_batch_members: int = MAX_COPY_JOB_BATCH_MEMBERS):
+        self.max_batch_members = max_batch_members
+        self.table_name = table_name if table_name is not None else environ[TABLE_NAME_ENV_VAR]
+
+    def _get_member_put(self, member_id: str, source_data: Any, priority: str, task_token: Optional[str]) -> Dict:
+        return {
+            "Put": {
+                "TableName": self.table_name,
+                "Item": {
+                    "id": {"S": member_id},
+                    "id_type": {"S": COPY_JOB_BATCH_MEMBER_ID_TYPE},
+                    "source_data": {"S": json.dumps(source_data, separators=(',', ':'))},
+                    "priority": {"S": priority},
+                    **(
+                        {"task_token": {"S": task_token}}
+                        if task_token is not None
+                        else {}
+                    ),
+                    "expire_at": {"N": str(int((datetime.now(timezone.utc) + COPY_JOB_BATCH_EXPIRY).timestamp()))},
+                },
+                "ConditionExpression": "attribute_not_exists(id)",
+            }
+        }
+
+    def _try_open(
+            self,
+            destination_data: Dict[str, str],
+            source_data: Any,
+            priority: str,
+            stale_batch_id: Optional[str] = None
+    ) -> Optional[str]:
+        dynamodb_client = get_dynamodb_client()
+        now = datetime.now(timezone.utc)
+        batch_id = new_batch_id()
+
+        if stale_batch_id is not None:
+            # Only replace the stale batch we read, if its leader has since closed it we start again
+            condition_expression = "batch_id = :stale_batch_id"
+            expression_attribute_values = {
+                ":stale_batch_id": {"S": stale_batch_id},
+            }
+        else:
+            # Replace a batch that is full, or whose leader has stopped
+            condition_expression = (
+                "attribute_not_exists(id) OR member_count >= :max_batch_members OR opened_at < :stale_before"
+            )
+            expression_attribute_values = {
+                ":max_batch_members": {"N": str(self.max_batch_members)},
+                ":stale_before": {"N": str(int((now - COPY_JOB_BATCH_MAX_OPEN_DURATION).timestamp()))},
+            }
+
+        try:
+            dynamodb_client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Put": {
+                            "TableName": self.table_name,
+                            "Item": {
+                                "id": {"S": get_destination_key(destination_data)},
+                                "id_type": {"S": COPY_JOB_BATCH_ID_TYPE},
+                                "batch_id": {"S": batch_id},
+                                "member_count": {"N": "1"},
+                                "opened_at": {"N": str(int(now.timestamp()))},
+                                "expire_at": {"N": str(int((now + COPY_JOB_BATCH_EXPIRY).timestamp()))},
+                            },
+                            "ConditionExpression": condition_expression,
+                            "ExpressionAttributeValues": expression_attribute_values,
+                        }
+                    },
+                    self._get_member_put(get_member_id(batch_id, 0), source_data, priority, None),
+                ]
+            )
+        except dynamodb_client.exceptions.TransactionCanceledException:
+            return None
+
+        return batch_id
+
+    def _try_join(
+            self,
+            destination_data: Dict[str, str],
+            source_data: Any,
+            priority: str,
+            task_token: str,
+            batch_row: Dict
+    ) -> bool:
+        dynamodb_client = get_dynamodb_client()
+        batch_id = batch_row['batch_id']['S']
+        member_count = int(batch_row['member_count']['N'])
+
+        try:
+            dynamodb_client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Update": {
+                            "TableName": self.table_name,
+                            "Key": {
+                                "id": {"S": get_destination_key(destination_data)},
+                                "id_type": {"S": COPY_JOB_BATCH_ID_TYPE},
+                            },
+                            "UpdateExpression": "SET member_count = :new_member_count",
+                            # Conditioned on the count read, so each member gets its own index
+                            "ConditionExpression": "batch_id = :batch_id AND member_count = :member_count",
+                            "ExpressionAttributeValues": {
+                                ":batch_id": {"S": batch_id},
+                                ":member_count": {"N": str(member_count)},
+                                ":new_member_count": {"N": str(member_count + 1)},
+                            },
+                        }
+                    },
+                    self._get_member_put(get_member_id(batch_id, member_count), source_data, priority, task_token),
+                ]
+            )
+        except dynamodb_client.exceptions.TransactionCanceledException:
+            return False
+
+        return True
+
+    def join(
+            self,
+            destination_data: Dict[str, str],
+            source_data: Any,
+            task_token: str,
+            priority: str = DEFAULT_PRIORITY,
+    ) -> JoinedCopyJobBatch:
+        """
+        Join the open batch of the destination folder, or open a new batch (as its leader)
+        The task token is only stored for members that are not the leader
+        :param destination_data:
+        :param source_data:
+        :param task_token:
+        :param priority:
+        :return:
+        """
+        for _ in range(MAX_JOIN_ATTEMPTS):
+            batch_row = get_dynamodb_client().get_item(
+                TableName=self.table_name,
+                Key={
+                    "id": {"S": get_destination_key(destination_data)},
+                    "id_type": {"S": COPY_JOB_BATCH_ID_TYPE},
+                },
+                ConsistentRead=True,
+            ).get('Item')
+
+            is_joinable = (
+                batch_row is not None and
+                int(batch_row['member_count']['N']) < self.max_batch_members and
+                int(batch_row['opened_at']['N']) >= (
+                    datetime.now(timezone.utc) - COPY_JOB_BATCH_MAX_OPEN_DURATION
+                ).timestamp()
+            )
+
+            if is_joinable:
+                if self._try_join(destination_data, source_data, priority, task_token, batch_row):
+                    return {
+                        "batchId": batch_row['batch_id']['S'],
+                        "isBatchLeader": False,
+                    }
+                continue
+
+            is_stale = (
+                batch_row is not None and
+                int(batch_row['opened_at']['N']) < (
+                    datetime.now(timezone.utc) - COPY_JOB_BATCH_MAX_OPEN_DURATION
+                ).timestamp()
+            )
+            stale_batch_id = batch_row['batch_id']['S'] if is_stale else None
+
+            batch_id = self._try_open(destination_data, source_data, priority, stale_batch_id)
+            if batch_id is not None:
+                if stale_batch_id is not None:
+                    abandon_copy_job_batch(self, stale_batch_id)
+                return {
+                    "batchId": batch_id,
+                    "isBatchLeader": True,
+                }
+
+        # Too much contention on the open batch, copy this request on its own
+        logger.warning(
+            f"Could not join a copy job batch for {get_destination_key(destination_data)} "
+            f"after {MAX_JOIN_ATTEMPTS} attempts, copying on its own"
+        )
+        batch_id = new_batch_id()
+        get_dynamodb_client().put_item(
+            **self._get_member_put(get_member_id(batch_id, 0), source_data, priority, None)['Put']
+        )
+        return {
+            "batchId": batch_id,
+            "isBatchLeader": True,
+        }
+
+    def close(self, destination_data: Dict[str, str], batch_id: str):
+        dynamodb_client = get_dynamodb_client()
+        try:
+            dynamodb_client.delete_item(
+                TableName=self.table_name,
+                Key={
+                    "id": {"S": get_destination_key(destination_data)},
+                    "id_type": {"S": COPY_JOB_BATCH_ID_TYPE},
+                },
+                ConditionExpression="batch_id = :batch_id",
+                ExpressionAttributeValues={":batch_id": {"S": batch_id}},
+            )
+        except dynamodb_client.exceptions.ConditionalCheckFailedException:
+            # Already replaced by a new batch, no one can join this batch anymore
+            logger.info(f"Copy job batch {batch_id} was already closed")
+
+    def list_members(self, batch_id: str) -> List[CopyJobBatchMember]:
+        """
+        List the members of a batch, in the order they joined
+        :param batch_id:
+        :return:
+        """
+        # Member indices are contiguous, so we read pages of member ids (consistently, from the table itself)
+        # until a page comes back short
+        dynamodb_client = get_dynamodb_client()
+        member_list: List[CopyJobBatchMember] = []
+
+        for page_start_iter_ in count(0, MEMBER_PAGE_SIZE):
+            member_id_list = list(map(
+                lambda member_index_iter_: get_member_id(batch_id, member_index_iter_),
+                range(page_start_iter_, page_start_iter_ + MEMBER_PAGE_SIZE)
+            ))
+            item_list = []
+            request_items = {
+                self.table_name: {
+                    "Keys": list(map(
+                        lambda member_id_iter_: {
+                            "id": {"S": member_id_iter_},
+                            "id_type": {"S": COPY_JOB_BATCH_MEMBER_ID_TYPE},
+                        },
+                        member_id_list
+                    )),
+                    "ConsistentRead": True,
+                }
+            }
+            while len(request_items) > 0:
+                response = dynamodb_client.batch_get_item(RequestItems=request_items)
+                item_list.extend(response.get('Responses', {}).get(self.table_name, []))
+                request_items = response.get('UnprocessedKeys', {})
+
+            member_list.extend(map(
+                lambda item_iter_: {
+                    "memberId": item_iter_['id']['S'],
+                    "sourceData": json.loads(item_iter_['source_data']['S']),
+                    "priority": item_iter_['priority']['S'] if 'priority' in item_iter_ else DEFAULT_PRIORITY,
+                    "taskToken": item_iter_['task_token']['S'] if 'task_token' in item_iter_ else None,
+                },
+                sorted(item_list, key=lambda item_iter_: item_iter_['id']['S'])
+            ))
+
+            if len(item_list) < MEMBER_PAGE_SIZE:
+                break
+
+        return member_list
+
+    def remove_members(self, member_list: List[CopyJobBatchMember]):
+        dynamodb_client = get_dynamodb_client()
+        # DynamoDB batch write limit
+        for page_start_iter_ in range(0, len(member_list), 25):
+            request_items = {
+                self.table_name: list(map(
+                    lambda member_iter_: {
+                        "DeleteRequest": {
+                            "Key": {
+                                "id": {"S": member_iter_['memberId']},
+                                "id_type": {"S": COPY_JOB_BATCH_MEMBER_ID_TYPE},
+                            }
+                        }
+                    },
+                    member_list[page_start_iter_:page_start_iter_ + 25]
+                ))
+            }
+            while len(request_items) > 0:
+                request_items = dynamodb_client.batch_write_item(RequestItems=request_items).get('UnprocessedItems', {})
+
+
+def join_copy_job_batch(
+        batcher: DynamoDbCopyJobBatcher,
+        destination_data: Dict[str, str],
+        source_data: Any,
+        task_token: str,
+        priority: str = DEFAULT_PRIORITY,
+) -> JoinedCopyJobBatch:
+    """
+    Join the open copy job batch of the destination folder.
+    The leader is sent its batch id straight away,
+    other members wait on their task token until the leader's copy job has finished
+    :param batcher:
+    :param destination_data:
+    :param source_data: The source data manifest or list of the request
+    :param task_token:
+    :param priority:
+    :return:
+    """
+    joined_copy_job_batch = batcher.join(destination_data, source_data, task_token, priority)
+
+    if joined_copy_job_batch['isBatchLeader']:
+        get_sfn_client().send_task_success(
+            taskToken=task_token,
+            output=json.dumps(joined_copy_job_batch),
+        )
+
+    return joined_copy_job_batch
+
+
+def iter_unique_source_data(member_list: List[CopyJobBatchMember]) -> Iterator[Dict[str, str]]:
+    """
+    Iterate over the source data of every member, dropping data requested by more than one member
+    :param member_list:
+    :return:
+    """
+    seen_source_data_set = set()
+    for source_data_iter_ in chain.from_iterable(map(
+        lambda member_iter_: iter_manifest_or_list(member_iter_['sourceData']),
+        member_list
+    )):
+        source_data_key = (source_data_iter_.get('projectId'), source_data_iter_.get('dataId'))
+        if source_data_key in seen_source_data_set:
+            continue
+        seen_source_data_set.add(source_data_key)
+        yield source_data_iter_
+
+
+def close_copy_job_batch(
+        batcher: DynamoDbCopyJobBatcher,
+        destination_data: Dict[str, str],
+        batch_id: str,
+) -> ClosedCopyJobBatch:
+    """
+    Close the batch to new members and write the source data of every member to a single manifest
+    :param batcher:
+    :param destination_data:
+    :param batch_id:
+    :return: The manifest, with the total size of its files and the highest priority of the members
+    """
+    batcher.close(destination_data, batch_id)
+
+    member_list = batcher.list_members(batch_id)
+    logger.info(f"Closed copy job batch {batch_id} with {len(member_list)} members")
+
+    # Tally the size of the files as we write them
+    total_size_in_bytes = 0
+
+    def _iter_source_data_with_size():
+        nonlocal total_size_in_bytes
+        for source_data_iter_ in iter_unique_source_data(member_list):
+            total_size_in_bytes += source_data_iter_.get('fileSizeInBytes', 0) or 0
+            yield source_data_iter_
+
+    source_data_manifest = write_manifest(
+        _iter_source_data_with_size(),
+        manifest_name="copyJobBatchSourceDataList",
+        manifest_prefix=batch_id,
+    )
+
+    return {
+        "sourceDataManifest": source_data_manifest,
+        "totalSizeInBytes": total_size_in_bytes,
+        "priority": get_highest_priority(list(map(
+            lambda member_iter_: member_iter_['priority'],
+            member_list
+        ))),
+    }
+
+
+def send_copy_job_result_to_member(member: CopyJobBatchMember, job_id: Optional[str], status: str) -> bool:
+    """
+    Send the result of the batch copy job to a waiting member
+    :param member:
+    :param job_id:
+    :param status:
+    :return: False if the member's task token has expired (its execution has ended)
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        if status == 'SUCCEEDED':
+            get_sfn_client().send_task_success(
+                taskToken=member['taskToken'],
+                output=json.dumps({"jobId": job_id, "status": status}),
+            )
+        else:
+            get_sfn_client().send_task_failure(
+                taskToken=member['taskToken'],
+                error=COPY_JOB_FAILED_ERROR,
+                cause=f"Copy job {job_id} of the copy job batch finished with status {status}",
+            )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in EXPIRED_TASK_TOKEN_ERROR_CODES:
+            logger.info(f"Task token of copy job batch member {member['memberId']} has expired, {e}")
+            return False
+        raise
+
+    return True
+
+
+def send_batch_abandoned_to_member(member: CopyJobBatchMember, batch_id: str) -> bool:
+    """
+    Tell a waiting member that its batch has lost its leader, so it can join a new batch
+    :param member:
+    :param batch_id:
+    :return: False if the member's task token has expired (its execution has ended)
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        get_sfn_client().send_task_failure(
+            taskToken=member['taskToken'],
+            error=COPY_JOB_BATCH_ABANDONED_ERROR,
+            cause=f"Copy job batch {batch_id} was not closed by its leader",
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in EXPIRED_TASK_TOKEN_ERROR_CODES:
+            logger.info(f"Task token of copy job batch member {member['memberId']} has expired, {e}")
+            return False
+        raise
+
+    return True
+
+
+def abandon_copy_job_batch(
+        batcher: DynamoDbCopyJobBatcher,
+        batch_id: str,
+        max_workers: int = MAX_COMPLETION_WORKERS,
+) -> int:
+    """
+    Fail the members waiting on a stale batch, then remove them.
+    The leader's own member row is kept, should a leader that was only slow close the batch after all,
+    it copies its own source data
+    :param batcher:
+    :param batch_id:
+    :param max_workers:
+    :return: The number of members failed
+    """
+    waiting_member_list = list(filter(
+        lambda member_iter_: member_iter_['taskToken'] is not None,
+        batcher.list_members(batch_id)
+    ))
+
+    if len(waiting_member_list) == 0:
+        return 0
+
+    logger.warning(f"Copy job batch {batch_id} was not closed by its leader, failing its {len(waiting_member_list)} waiting members")
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(waiting_member_list))) as executor:
+        is_sent_list = list(executor.map(
+            lambda member_iter_: send_batch_abandoned_to_member(member_iter_, batch_id),
+            waiting_member_list
+        ))
+
+    batcher.remove_members(waiting_member_list)
+
+    return sum(is_sent_list)
+
+
+def complete_copy_job_batch(
+        batcher: DynamoDbCopyJobBatcher,
+        batch_id: str,
+        job_id: Optional[str],
+        status: str,
+        send_result_fn: Callable[[CopyJobBatchMember, Optional[str], str], bool] = send_copy_job_result_to_member,
+        max_workers: int = MAX_COMPLETION_WORKERS,
+) -> int:
+    """
+    Send the result of the batch copy job to every member waiting on it, then remove the members
+    :param batcher:
+    :param batch_id:
+    :param job_id: None if every file was copied directly
+    :param status: SUCCEEDED or FAILED
+    :param send_result_fn:
+    :param max_workers:
+    :return: The number of members sent the result
+    """
+    member_list = batcher.list_members(batch_id)
+    waiting_member_list = list(filter(
+        lambda member_iter_: member_iter_['taskToken'] is not None,
+        member_list
+    ))
+
+    is_sent_list = []
+    if len(waiting_member_list) > 0:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(waiting_member_list))) as executor:
+            is_sent_list = list(executor.map(
+                lambda member_iter_: send_result_fn(member_iter_, job_id, status),
+                waiting_member_list
+            ))
+
+    batcher.remove_members(member_list)
+
+    return sum(is_sent_list)
+
+
+def get_copy_job_batcher() -> DynamoDbCopyJobBatcher:
+    return DynamoDbCopyJobBatcher()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""
+Credential and connection helpers
+
+icav2_tools.set_icav2_env_vars resolves the ICAv2 access token from secrets manager on every call,
+and wrapica builds a fresh api client (and so a fresh connection pool) for every request.
+
+Since lambda containers are reused between invocations, we instead
+* hold the access token in memory until shortly before it expires (from the JWT exp claim),
+  and only go back to secrets manager once it is due for a refresh, and
+* keep a single ICAv2 api client per container, so connections to the ICAv2 host are kept alive
+  between requests and between invocations.
+
+When the token is refreshed, the shared configuration is updated in place,
+so both wrapica and the shared api client pick up the new token.
+The shared configuration also carries our retry policy (see rate_limiting).
+"""
+
+# Standard imports
+import typing
+import json
+from base64 import urlsafe_b64decode
+from binascii import Error as BinasciiError
+from datetime import datetime, timedelta, timezone
+from os import environ
+from threading import Lock
+from typing import Optional
+import logging
+
+# Local imports
+from .rate_limiting import install_icav2_retry_policy
+
+# Importing libica takes seconds, so we only import it once we need it
+if typing.TYPE_CHECKING:
+    from libica.openapi.v3 import ApiClient
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+ICAV2_ACCESS_TOKEN_ENV_VAR = "ICAV2_ACCESS_TOKEN"
+# Refresh the token this long before it expires
+ICAV2_ACCESS_TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Runtime globals, kept between warm invocations
+ICAV2_ACCESS_TOKEN_EXPIRY: Optional[datetime] = None
+ICAV2_API_CLIENT: Optional['ApiClient'] = None
+ICAV2_CREDENTIALS_LOCK = Lock()
+
+
+def get_jwt_expiry(access_token: str) -> Optional[datetime]:
+    """
+    Get the expiry time of a JWT from its exp claim.
+    We only need the expiry, the signature is verified by the ICAv2 api itself.
+    :param access_token:
+    :return:
+    """
+    try:
+        # A JWT is header.payload.signature, each segment is unpadded base64url encoded json
+        payload = access_token.split(".")[1]
+        exp = json.loads(urlsafe_b64decode(payload + "=" * (-len(payload) % 4))).get("exp")
+    except (IndexError, ValueError, BinasciiError, AttributeError):
+        logger.warning("Could not decode the ICAv2 access token, will not cache it")
+        return None
+
+    if exp is None:
+        return None
+
+    return datetime.fromtimestamp(exp, tz=timezone.utc)
+
+
+def is_icav2_access_token_fresh() -> bool:
+    return (
+        environ.get(ICAV2_ACCESS_TOKEN_ENV_VAR) is not None and
+        ICAV2_ACCESS_TOKEN_EXPIRY is not None and
+        datetime.now(timezone.utc) + ICAV2_ACCESS_TOKEN_REFRESH_MARGIN < ICAV2_ACCESS_TOKEN_EXPIRY
+    )
+
+
+def set_icav2_env_vars():
+    """
+    Drop-in replacement for icav2_tools.set_icav2_env_vars that only resolves the token
+    from secrets manager when we do not have a token in memory or the token is about to expire.
+    :return:
+    """
+    global ICAV2_ACCESS_TOKEN_EXPIRY
+
+    with ICAV2_CREDENTIALS_LOCK:
+        if is_icav2_access_token_fresh():
+            return
+
+        # Import here so that the icav2 tools layer is only needed when we refresh the token
+        from icav2_tools import set_icav2_env_vars as _set_icav2_env_vars
+
+        _set_icav2_env_vars()
+        ICAV2_ACCESS_TOKEN_EXPIRY = get_jwt_expiry(environ[ICAV2_ACCESS_TOKEN_ENV_VAR])
+
+        # Wrapica holds on to its configuration once it has been created,
+        # update the token in place so any existing api clients use the new token
+        from wrapica.utils.configuration import get_icav2_configuration
+        icav2_configuration = get_icav2_configuration()
+        icav2_configuration.access_token = environ[ICAV2_ACCESS_TOKEN_ENV_VAR]
+
+        # Every api client wrapica builds from the shared configuration picks up our retry policy
+        install_icav2_retry_policy(icav2_configuration)
+
+        logger.info(f"Refreshed ICAv2 access token, expires at {ICAV2_ACCESS_TOKEN_EXPIRY}")
+
+
+def get_icav2_api_client() -> 'ApiClient':
+    """
+    Get the shared ICAv2 api client for this container.
+    The client's connection pool keeps connections to the ICAv2 host alive between requests.
+    :return:
+    """
+    global ICAV2_API_CLIENT
+
+    set_icav2_env_vars()
+
+    with ICAV2_CREDENTIALS_LOCK:
+        if ICAV2_API_CLIENT is None:
+            from libica.openapi.v3 import ApiClient
+            from wrapica.utils.configuration import get_icav2_configuration
+            # Our retry policy was installed on the configuration by set_icav2_env_vars
+            ICAV2_API_CLIENT = ApiClient(get_icav2_configuration())
+
+    return ICAV2_API_CLIENT
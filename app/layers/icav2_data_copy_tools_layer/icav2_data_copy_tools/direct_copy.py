@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+"""
+Direct s3 to s3 copies between ICAv2 projects
+
+An ICAv2 copy batch job spends much of its time in ICAv2's queue (INITIALIZED / WAITING_FOR_RESOURCES)
+before any data moves, often longer than the copy itself for mid-sized folders.
+
+When the source and destination projects are both backed by s3 storage (i.e BYOB) and the destination
+project folder credentials can read the source objects, we can instead copy each object server-side,
+with CopyObject for smaller objects or UploadPartCopy (parts copied in parallel) for larger objects.
+ICAv2 registers objects written under a project's storage prefix, the same way it does for the ECS multipart upload,
+so the copied files are picked up by ICAv2 without a copy job.
+
+direct_copy_project_data copies what it can within the lambda's time budget and returns the remaining
+source data, which is then copied by an ICAv2 copy batch job as before.
+"""
+
+# Standard imports
+import typing
+from itertools import groupby
+from pathlib import Path
+from typing import List, Optional, Tuple
+import logging
+
+# Local imports
+from .continuation import TimeBudget
+from .listing import ProjectDataRecord
+from .s3_parts import MAX_PART_COPY_WORKERS, copy_s3_object
+
+if typing.TYPE_CHECKING:
+    from wrapica.libica_models import ProjectData
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+# A copy must finish within the lambda, larger files are left to the ICAv2 copy job
+DIRECT_COPY_MAX_FILE_SIZE_IN_BYTES = 100 * 1024 ** 3
+# Do not start another file with less than this much time remaining
+DIRECT_COPY_TIME_RESERVE_MS = 5 * 60 * 1000
+# Error codes that mean these credentials cannot read the source folder (so the rest of the folder is denied too),
+# any other error (i.e a redirect to another region, or an invalid request for this object) only affects that file
+ACCESS_ERROR_CODES = frozenset({"AccessDenied", "AllAccessDisabled", "403"})
+
+
+def is_access_error(error: Exception) -> bool:
+    from botocore.exceptions import ClientError
+
+    return (
+        isinstance(error, ClientError) and
+        error.response.get('Error', {}).get('Code') in ACCESS_ERROR_CODES
+    )
+
+
+def get_s3_client_for_project_folder(project_id: str, folder_id: str) -> Tuple[typing.Any, str, str]:
+    """
+    Get an s3 client with the project folder credentials, along with the folder's bucket and object prefix
+    :param project_id:
+    :param folder_id:
+    :return:
+    """
+    import boto3
+    from botocore.config import Config
+    from wrapica.project_data import get_aws_credentials_access_for_project_folder
+
+    storage_creds = get_aws_credentials_access_for_project_folder(
+        project_id=project_id,
+        folder_id=folder_id
+    )
+
+    return (
+        boto3.client(
+            's3',
+            region_name=storage_creds.region,
+            aws_access_key_id=storage_creds.access_key,
+            aws_secret_access_key=storage_creds.secret_key,
+            aws_session_token=storage_creds.session_token,
+            # One connection per part copy worker
+            config=Config(max_pool_connections=MAX_PART_COPY_WORKERS),
+        ),
+        storage_creds.bucket,
+        storage_creds.object_prefix,
+    )
+
+
+def get_storage_location_for_project_folder(project_id: str, folder_path: Path) -> Optional[Tuple[str, str]]:
+    """
+    Get the bucket and object prefix of a project folder, or None if the folder is not on s3 storage we can address
+    :param project_id:
+    :param folder_path:
+    :return:
+    """
+    from libica.openapi.v3 import ApiException
+    from wrapica.project_data import get_aws_credentials_access_for_project_folder
+
+    try:
+        storage_creds = get_aws_credentials_access_for_project_folder(
+            project_id=project_id,
+            folder_path=folder_path,
+            read_only=True
+        )
+    except (ApiException, ValueError) as e:
+        logger.info(f"Could not get the storage location of {folder_path} in project {project_id}, {e}")
+        return None
+
+    return storage_creds.bucket, storage_creds.object_prefix
+
+
+def direct_copy_project_data(
+        dest_project_data_obj: 'ProjectData',
+        source_project_data_list: List[ProjectDataRecord],
+        time_budget: Optional[TimeBudget] = None,
+) -> Tuple[List[ProjectDataRecord], List[ProjectDataRecord]]:
+    """
+    Copy as many of the source files as we can directly (s3 to s3) into the destination folder.
+    Returns the source files copied, and the source files remaining for an ICAv2 copy job
+    :param dest_project_data_obj: The destination folder
+    :param source_project_data_list: The source files (i.e from iter_project_data_records_by_id)
+    :param time_budget: Stop starting new copies once less than DIRECT_COPY_TIME_RESERVE_MS remains
+    :return:
+    """
+    copied_project_data_list: List[ProjectDataRecord] = []
+    remaining_project_data_list: List[ProjectDataRecord] = []
+
+    if time_budget is not None:
+        time_budget = TimeBudget(time_budget.context, reserve_ms=DIRECT_COPY_TIME_RESERVE_MS)
+
+    try:
+        s3_client, destination_bucket, destination_prefix = get_s3_client_for_project_folder(
+            project_id=dest_project_data_obj.project_id,
+            folder_id=dest_project_data_obj.data.id
+        )
+    except Exception as e:
+        logger.info(f"Destination folder is not on s3 storage we can write to directly, {e}")
+        return copied_project_data_list, list(source_project_data_list)
+
+    # Group by source folder, we only need to resolve the storage location (and check read access) once per folder
+    def _get_source_folder_key(source_project_data_obj: ProjectDataRecord) -> Tuple[str, str]:
+        return (
+            source_project_data_obj.project_id,
+            str(Path(source_project_data_obj.path).parent) + "/",
+        )
+
+    for (source_project_id, source_folder_path), source_folder_data_iter_ in groupby(
+        sorted(source_project_data_list, key=_get_source_folder_key),
+        key=_get_source_folder_key
+    ):
+        source_folder_data_list = list(source_folder_data_iter_)
+        source_storage_location = get_storage_location_for_project_folder(
+            project_id=source_project_id,
+            folder_path=Path(source_folder_path),
+        )
+        # Once a copy is denied, the rest of the folder will be too
+        can_copy_folder = source_storage_location is not None
+
+        for source_project_data_iter_ in source_folder_data_list:
+            file_size_in_bytes = source_project_data_iter_.file_size_in_bytes
+            if (
+                not can_copy_folder or
+                file_size_in_bytes is None or
+                file_size_in_bytes > DIRECT_COPY_MAX_FILE_SIZE_IN_BYTES or
+                (time_budget is not None and time_budget.is_exhausted())
+            ):
+                remaining_project_data_list.append(source_project_data_iter_)
+                continue
+
+            source_bucket, source_prefix = source_storage_location
+            source_key = str(Path(source_prefix) / source_project_data_iter_.name)
+            destination_key = str(Path(destination_prefix) / source_project_data_iter_.name)
+
+            try:
+                copy_s3_object(
+                    s3_client,
+                    source_bucket, source_key,
+                    destination_bucket, destination_key,
+                    file_size_in_bytes,
+                )
+            except Exception as e:
+                if is_access_error(e):
+                    logger.info(f"Cannot copy s3://{source_bucket}/{source_key} directly, {e}")
+                    can_copy_folder = False
+                else:
+                    logger.warning(f"Direct copy of s3://{source_bucket}/{source_key} failed, leaving it to the copy job, {e}")
+                remaining_project_data_list.append(source_project_data_iter_)
+                continue
+
+            logger.info(f"Copied s3://{source_bucket}/{source_key} to s3://{destination_bucket}/{destination_key} directly")
+            copied_project_data_list.append(source_project_data_iter_)
+
+    return copied_project_data_list, remaining_project_data_list
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+"""
+Bulk filemanager lookups
+
+Looking up each external s3 uri in the filemanager individually means one request per file.
+Instead, we group the uris by bucket and query the filemanager for the exact keys of each group,
+FILEMANAGER_KEY_CHUNK_SIZE keys per request (the filemanager matches any of the repeated key parameters).
+Results are matched on the full key, and we fall back to individual lookups for anything the grouped query did not return.
+
+We do not query by a key wildcard on the parent prefix, as that lists everything under the prefix (recursively),
+or the whole bucket for keys at its root.
+
+The orcabus api tools are part of a separate layer, so they are only imported here when a lookup is made.
+"""
+
+# Standard imports
+import typing
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple, TypedDict
+from urllib.parse import urlparse
+import logging
+
+if typing.TYPE_CHECKING:
+    from orcabus_api_tools.filemanager.models import FileObject
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+FILEMANAGER_S3_ENDPOINT = "api/v1/s3"
+# Keep the query string to a sensible length when querying by key
+FILEMANAGER_KEY_CHUNK_SIZE = 50
+
+
+class ExternalSourceFileMetadata(TypedDict):
+    externalSourceUri: str
+    s3ObjectId: str
+    sourceFileSizeInBytes: int
+    eTag: str
+    isMultipartFile: bool
+
+
+def group_s3_keys_by_bucket(s3_uri_list: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Group the (unique) keys of the s3 uris by their bucket so that we can query the filemanager in bulk per bucket
+    :param s3_uri_list:
+    :return:
+    """
+    s3_keys_by_bucket: Dict[str, List[str]] = defaultdict(list)
+    for s3_uri_iter_ in dict.fromkeys(s3_uri_list):
+        s3_uri_obj = urlparse(s3_uri_iter_)
+        s3_keys_by_bucket[s3_uri_obj.netloc].append(s3_uri_obj.path.lstrip("/"))
+
+    return s3_keys_by_bucket
+
+
+def get_file_objects_from_s3_uris(s3_uri_list: Iterable[str]) -> Dict[str, 'FileObject']:
+    """
+    Get the current filemanager object of each s3 uri, keyed by s3 uri
+    :param s3_uri_list:
+    :return:
+    """
+    from orcabus_api_tools.filemanager import get_file_object_from_s3_uri
+    from orcabus_api_tools.filemanager.query_helpers import get_file_manager_request_response_results
+
+    s3_uri_list = list(s3_uri_list)
+
+    file_objects_by_bucket_and_key: Dict[Tuple[str, str], 'FileObject'] = {}
+    for bucket, key_list in group_s3_keys_by_bucket(s3_uri_list).items():
+        # A single key is cheaper to look up on its own
+        file_objects_by_key: Dict[str, 'FileObject'] = {}
+        if len(key_list) > 1:
+            for chunk_index in range(0, len(key_list), FILEMANAGER_KEY_CHUNK_SIZE):
+                key_chunk = key_list[chunk_index:chunk_index + FILEMANAGER_KEY_CHUNK_SIZE]
+                # Only keep exact matches on the full key
+                file_objects_by_key.update(dict(filter(
+                    lambda key_and_file_obj_iter_: key_and_file_obj_iter_[0] in key_chunk,
+                    map(
+                        lambda file_obj_iter_: (file_obj_iter_['key'], file_obj_iter_),
+                        get_file_manager_request_response_results(
+                            FILEMANAGER_S3_ENDPOINT,
+                            {
+                                "bucket": bucket,
+                                "key": key_chunk,
+                                "currentState": str(True).lower(),
+                            }
+                        )
+                    )
+                )))
+
+        for key_iter_ in key_list:
+            file_obj = file_objects_by_key.get(key_iter_)
+            if file_obj is None:
+                file_obj = get_file_object_from_s3_uri(f"s3://{bucket}/{key_iter_}")
+            file_objects_by_bucket_and_key[(bucket, key_iter_)] = file_obj
+
+    return dict(map(
+        lambda s3_uri_iter_: (
+            s3_uri_iter_,
+            file_objects_by_bucket_and_key[(urlparse(s3_uri_iter_).netloc, urlparse(s3_uri_iter_).path.lstrip("/"))]
+        ),
+        s3_uri_list
+    ))
+
+
+def get_external_source_file_metadata_list(s3_uri_list: Iterable[str]) -> List[ExternalSourceFileMetadata]:
+    """
+    Get the size, etag, multipart flag and filemanager object id of each external source uri, in bulk
+    :param s3_uri_list:
+    :return:
+    """
+    s3_uri_list = list(s3_uri_list)
+    file_objects_by_s3_uri = get_file_objects_from_s3_uris(s3_uri_list)
+
+    return list(map(
+        lambda s3_uri_iter_: {
+            "externalSourceUri": s3_uri_iter_,
+            "s3ObjectId": file_objects_by_s3_uri[s3_uri_iter_]['s3ObjectId'],
+            "sourceFileSizeInBytes": file_objects_by_s3_uri[s3_uri_iter_]['size'],
+            "eTag": file_objects_by_s3_uri[s3_uri_iter_]['eTag'],
+            # Multipart uploads have an etag of the form <md5>-<number of parts>
+            "isMultipartFile": "-" in file_objects_by_s3_uri[s3_uri_iter_]['eTag'],
+        },
+        s3_uri_list
+    ))
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+
+"""
+Streaming project data listing
+
+wrapica's list_project_data_non_recursively collects every page of a folder into a list of ProjectData models
+before returning. For very large folders this holds tens of thousands of heavy pydantic models in memory at once.
+
+Instead, we page through the folder ourselves and yield lightweight ProjectDataRecord objects,
+one page at a time, dropping the models as soon as a page has been converted.
+The next page is requested in a background thread while the consumer processes the current one,
+so listing overlaps with processing.
+
+iter_project_data_records_by_id resolves a stream of project data ids (i.e a manifest) to records in bulk,
+listing each project filtered by a chunk of data ids, rather than getting each data id individually.
+"""
+
+# Standard imports
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+import logging
+
+# Wrapica imports
+from libica.openapi.v3 import ApiException
+from libica.openapi.v3.api.project_data_api import ProjectDataApi
+from wrapica.libica_models import ProjectData
+from wrapica.utils.globals import LIBICAV2_DEFAULT_PAGE_SIZE
+
+# Local imports
+from .credentials import get_icav2_api_client
+from .rate_limiting import icav2_call_slot
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+# Keep the query string to a sensible length when filtering by data id
+DATA_ID_CHUNK_SIZE = 100
+
+
+class ProjectDataRecord:
+    """
+    A lightweight, read-only view of a project data object,
+    just the attributes we need to plan, copy and validate data.
+    """
+    __slots__ = (
+        'project_id',
+        'data_id',
+        'name',
+        'path',
+        'data_type',
+        'file_size_in_bytes',
+        'object_e_tag',
+        'status',
+    )
+
+    def __init__(
+            self,
+            project_id: str,
+            data_id: str,
+            name: str,
+            path: str,
+            data_type: str,
+            file_size_in_bytes: Optional[int],
+            object_e_tag: Optional[str],
+            status: Optional[str],
+    ):
+        self.project_id = project_id
+        self.data_id = data_id
+        self.name = name
+        self.path = path
+        self.data_type = data_type
+        self.file_size_in_bytes = file_size_in_bytes
+        self.object_e_tag = object_e_tag
+        self.status = status
+
+    @classmethod
+    def from_project_data(cls, project_data_obj: ProjectData) -> 'ProjectDataRecord':
+        return cls(
+            project_id=str(project_data_obj.project_id),
+            data_id=project_data_obj.data.id,
+            name=project_data_obj.data.details.name,
+            path=project_data_obj.data.details.path,
+            data_type=project_data_obj.data.details.data_type,
+            file_size_in_bytes=project_data_obj.data.details.file_size_in_bytes,
+            object_e_tag=project_data_obj.data.details.object_e_tag,
+            status=project_data_obj.data.details.status,
+        )
+
+    @property
+    def uri(self) -> str:
+        return f"icav2://{self.project_id}{self.path}"
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            "projectId": self.project_id,
+            "dataId": self.data_id,
+        }
+
+    def __repr__(self) -> str:
+        return f"ProjectDataRecord(project_id={self.project_id!r}, data_id={self.data_id!r}, path={self.path!r})"
+
+
+def _get_project_data_page(
+        api_instance: ProjectDataApi,
+        project_id: str,
+        page_token: Optional[str],
+        page_size: int,
+        parent_folder_id: Optional[str] = None,
+        parent_folder_path: Optional[str] = None,
+        data_type: Optional[str] = None,
+        status: Optional[Union[str, List[str]]] = None,
+        file_name: Optional[Union[str, List[str]]] = None,
+        data_id: Optional[List[str]] = None,
+):
+    """
+    Get a single page of project data, returns the list of records on the page and the next page token
+    """
+    if isinstance(status, str):
+        status = [status]
+    if isinstance(file_name, str):
+        file_name = [file_name]
+
+    try:
+        with icav2_call_slot():
+            api_response = api_instance.get_project_data_list(
+                project_id=project_id,
+                parent_folder_id=[parent_folder_id] if parent_folder_id is not None else None,
+                parent_folder_path=parent_folder_path,
+                type=data_type,
+                status=status,
+                filename=file_name,
+                id=data_id,
+                page_size=str(page_size),
+                page_token=page_token,
+            )
+    except ApiException:
+        logger.error(f"Could not list project data in project {project_id}")
+        raise
+
+    # Convert the page of models to records straight away so the models can be garbage collected
+    return (
+        list(map(ProjectDataRecord.from_project_data, api_response.items)),
+        api_response.next_page_token
+    )
+
+
+def iter_project_data_records(
+        project_id: str,
+        parent_folder_id: Optional[str] = None,
+        parent_folder_path: Optional[str] = None,
+        data_type: Optional[str] = None,
+        status: Optional[Union[str, List[str]]] = None,
+        file_name: Optional[Union[str, List[str]]] = None,
+        page_size: int = LIBICAV2_DEFAULT_PAGE_SIZE,
+        prefetch: bool = True,
+) -> Iterator[ProjectDataRecord]:
+    """
+    Stream the data directly under a folder (non-recursively) as ProjectDataRecord objects.
+
+    Only one page (plus one prefetched page) is held in memory at any time.
+    Filters (data type, status, file name) are applied server-side.
+
+    :param project_id: The project id to list
+    :param parent_folder_id: The parent folder id (can use parent_folder_path instead)
+    :param parent_folder_path: The parent folder path, must start and end with a '/' (can use parent_folder_id instead)
+    :param data_type: One of FILE or FOLDER
+    :param status: The status (or list of statuses) to filter on, i.e PARTIAL
+    :param file_name: The file name (or list of file names) to filter on
+    :param page_size: The number of items per page
+    :param prefetch: Request the next page in the background while the current page is being consumed
+    :return:
+    """
+    if (parent_folder_id is None) == (parent_folder_path is None):
+        raise ValueError("Must specify exactly one of parent_folder_id and parent_folder_path")
+
+    page_kwargs = dict(
+        project_id=project_id,
+        page_size=page_size,
+        parent_folder_id=parent_folder_id,
+        parent_folder_path=parent_folder_path,
+        data_type=data_type,
+        status=status,
+        file_name=file_name,
+    )
+
+    api_instance = ProjectDataApi(get_icav2_api_client())
+
+    if not prefetch:
+        page_token = None
+        while True:
+            records, page_token = _get_project_data_page(api_instance, page_token=page_token, **page_kwargs)
+            yield from records
+            if not page_token:
+                break
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        page_future: Future = executor.submit(
+            _get_project_data_page, api_instance, page_token=None, **page_kwargs
+        )
+        while page_future is not None:
+            records, page_token = page_future.result()
+
+            # Request the next page before handing the current page to the consumer
+            page_future = (
+                executor.submit(_get_project_data_page, api_instance, page_token=page_token, **page_kwargs)
+                if page_token
+                else None
+            )
+
+            yield from records
+
+
+def _get_project_data_records_by_id(
+        api_instance: ProjectDataApi,
+        project_id: str,
+        data_id_list: List[str],
+) -> List[ProjectDataRecord]:
+    """
+    Get the records of a chunk of data ids in a single project, in the order of the data ids
+    """
+    records_by_data_id: Dict[str, ProjectDataRecord] = {}
+    page_token = None
+    while True:
+        records, page_token = _get_project_data_page(
+            api_instance,
+            project_id=project_id,
+            page_token=page_token,
+            page_size=LIBICAV2_DEFAULT_PAGE_SIZE,
+            data_id=data_id_list,
+        )
+        records_by_data_id.update(map(lambda record_iter_: (record_iter_.data_id, record_iter_), records))
+        if not page_token:
+            break
+
+    missing_data_id_list = list(filter(lambda data_id_iter_: data_id_iter_ not in records_by_data_id, data_id_list))
+    if len(missing_data_id_list) > 0:
+        raise ValueError(f"Could not find data {missing_data_id_list} in project {project_id}")
+
+    return list(map(lambda data_id_iter_: records_by_data_id[data_id_iter_], data_id_list))
+
+
+def iter_project_data_records_by_id(
+        data_list: Iterable[Dict[str, str]],
+        chunk_size: int = DATA_ID_CHUNK_SIZE,
+) -> Iterator[ProjectDataRecord]:
+    """
+    Resolve a stream of project data ids to ProjectDataRecord objects in bulk.
+
+    Data ids are collected per project, and each project is listed filtered by up to chunk_size data ids at once.
+    Only one chunk of data ids per project is held in memory at any time.
+    Records are yielded a chunk at a time, so are not necessarily in the order of the data list.
+
+    :param data_list: An iterable of {projectId, dataId} objects (i.e from iter_manifest_or_list)
+    :param chunk_size: The number of data ids to request at once
+    :raises ValueError: If a data id could not be found in its project
+    :return:
+    """
+    api_instance = ProjectDataApi(get_icav2_api_client())
+
+    data_ids_by_project: Dict[str, List[str]] = defaultdict(list)
+    for data_iter_ in data_list:
+        data_ids_by_project[data_iter_['projectId']].append(data_iter_['dataId'])
+        if len(data_ids_by_project[data_iter_['projectId']]) >= chunk_size:
+            yield from _get_project_data_records_by_id(
+                api_instance,
+                project_id=data_iter_['projectId'],
+                data_id_list=data_ids_by_project.pop(data_iter_['projectId'])
+            )
+
+    for project_id, data_id_list in data_ids_by_project.items():
+        yield from _get_project_data_records_by_id(
+            api_instance,
+            project_id=project_id,
+            data_id_list=data_id_list
+        )
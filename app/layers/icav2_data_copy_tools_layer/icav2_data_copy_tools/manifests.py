@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+"""
+Manifest helpers
+
+Lists that scale with the size of a copy request (source data lists, recursive copy job lists,
+external source uri lists) are written to s3 as JSONL manifests,
+only a small manifest pointer is passed through the step function.
+
+A manifest pointer looks like the following
+
+{
+    "bucket": "icav2-data-copy-manifests-123456789012-ap-southeast-2",
+    "key": "manifests/<execution-name>/sourceDataList.jsonl",
+    "count": 12345
+}
+
+The step functions consume manifests through a distributed map ItemReader (InputType JSONL),
+the lambdas read them back in streamed pages.
+"""
+
+# Standard imports
+import json
+import typing
+from os import environ
+from tempfile import SpooledTemporaryFile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypedDict, Union
+from uuid import uuid4
+
+import boto3
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+# Globals
+MANIFEST_BUCKET_NAME_ENV_VAR = "MANIFEST_BUCKET_NAME"
+MANIFEST_KEY_PREFIX = "manifests"
+DEFAULT_MANIFEST_PAGE_SIZE = 1000
+# Keep manifests in memory until they get large, then spill to /tmp
+MANIFEST_SPOOL_MAX_SIZE = 64 * 1024 * 1024  # 64 MiB
+
+
+class ManifestPointer(TypedDict):
+    bucket: str
+    key: str
+    count: int
+
+
+def get_s3_client() -> 'S3Client':
+    return boto3.client('s3')
+
+
+def get_manifest_bucket_name() -> str:
+    return environ[MANIFEST_BUCKET_NAME_ENV_VAR]
+
+
+def is_manifest_pointer(obj: Any) -> bool:
+    """
+    Determine if an object is a manifest pointer rather than an inline list
+    :param obj:
+    :return:
+    """
+    return (
+        isinstance(obj, dict) and
+        'bucket' in obj.keys() and
+        'key' in obj.keys()
+    )
+
+
+def write_manifest(
+        item_iter: Iterable[Any],
+        manifest_name: str,
+        manifest_prefix: Optional[str] = None
+) -> ManifestPointer:
+    """
+    Write an iterable of json serialisable items to s3 as a JSONL manifest.
+    Items are streamed into a spooled temporary file so we never hold the full serialised manifest in memory.
+    An empty iterable still writes an (empty) manifest so that readers do not need to special-case it.
+    :param item_iter:
+    :param manifest_name: The name of the manifest, i.e sourceDataList
+    :param manifest_prefix: Usually the step function execution name, so all manifests of a request sit together
+    :return:
+    """
+    if manifest_prefix is None:
+        manifest_prefix = str(uuid4())
+
+    manifest_key = f"{MANIFEST_KEY_PREFIX}/{manifest_prefix}/{manifest_name}.jsonl"
+
+    count = 0
+    with SpooledTemporaryFile(max_size=MANIFEST_SPOOL_MAX_SIZE, mode='w+b') as manifest_fh:
+        for item_iter_ in item_iter:
+            manifest_fh.write(json.dumps(item_iter_, separators=(',', ':')).encode() + b"\n")
+            count += 1
+
+        manifest_fh.seek(0)
+        get_s3_client().upload_fileobj(
+            manifest_fh,
+            get_manifest_bucket_name(),
+            manifest_key,
+            ExtraArgs={
+                "ContentType": "application/jsonl"
+            }
+        )
+
+    return {
+        "bucket": get_manifest_bucket_name(),
+        "key": manifest_key,
+        "count": count,
+    }
+
+
+def read_manifest(manifest_pointer: ManifestPointer) -> Iterator[Any]:
+    """
+    Stream the items of a manifest, one line at a time
+    :param manifest_pointer:
+    :return:
+    """
+    get_object_response = get_s3_client().get_object(
+        Bucket=manifest_pointer['bucket'],
+        Key=manifest_pointer['key'],
+    )
+
+    for line_iter_ in get_object_response['Body'].iter_lines():
+        if not line_iter_.strip():
+            continue
+        yield json.loads(line_iter_)
+
+
+def read_manifest_pages(
+        manifest_pointer: ManifestPointer,
+        page_size: int = DEFAULT_MANIFEST_PAGE_SIZE
+) -> Iterator[List[Any]]:
+    """
+    Stream the items of a manifest in pages of page_size items
+    :param manifest_pointer:
+    :param page_size:
+    :return:
+    """
+    page = []
+    for item_iter_ in read_manifest(manifest_pointer):
+        page.append(item_iter_)
+        if len(page) >= page_size:
+            yield page
+            page = []
+
+    if len(page) > 0:
+        yield page
+
+
+def iter_manifest_or_list(
+        manifest_or_list: Optional[Union[ManifestPointer, List[Any]]]
+) -> Iterator[Any]:
+    """
+    Handlers accept either an inline list or a manifest pointer,
+    iterate over the items of whichever we were given
+    :param manifest_or_list:
+    :return:
+    """
+    if manifest_or_list is None:
+        return iter([])
+
+    if is_manifest_pointer(manifest_or_list):
+        return read_manifest(typing.cast(ManifestPointer, manifest_or_list))
+
+    return iter(typing.cast(List[Any], manifest_or_list))
+
+
+def get_manifest_or_list_count(
+        manifest_or_list: Optional[Union[ManifestPointer, List[Any]]]
+) -> int:
+    """
+    Get the number of items in an inline list or manifest pointer without reading the manifest
+    :param manifest_or_list:
+    :return:
+    """
+    if manifest_or_list is None:
+        return 0
+
+    if is_manifest_pointer(manifest_or_list):
+        return typing.cast(Dict, manifest_or_list).get('count', 0)
+
+    return len(manifest_or_list)
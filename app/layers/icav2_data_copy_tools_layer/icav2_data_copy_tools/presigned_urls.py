@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+"""
+Bulk presigned url helpers
+
+wrapica's create_download_url and create_file_with_upload_url make one api call per file,
+so a small file transfer spends about as long setting up its urls as it does moving its bytes.
+
+Instead
+* download urls for many files in a project are requested in a single call (create_download_urls_for_data),
+  and are cached per container until shortly before they expire, so retries and repeated sources reuse them, and
+* destination files (with their upload urls) are created concurrently, each call holding an ICAv2 rate limiter slot.
+
+Upload urls are not cached, each one belongs to a newly created (and so still empty) file.
+
+The ECS tasks (upload_single_part_file, upload_from_filemanager and rename_file) keep their per-file calls.
+Each task moves a single file given on its command line, so there is no batch to request urls for,
+and the images do not include this layer.
+upload_from_filemanager also gets its source url from the filemanager (not ICAv2) and refreshes it itself.
+"""
+
+# Standard imports
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+import logging
+
+# Local imports
+from .credentials import get_icav2_api_client
+from .rate_limiting import icav2_call_slot
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+# The number of data ids to request download urls for in a single call
+DOWNLOAD_URL_BATCH_SIZE = 100
+# The number of files to create (with upload urls) at once
+UPLOAD_URL_MAX_WORKERS = 8
+# Drop cached urls this long before they expire, so a transfer never starts on a url about to expire
+URL_EXPIRY_MARGIN = timedelta(minutes=5)
+# Used when we cannot read the expiry from the url itself
+DEFAULT_URL_LIFETIME = timedelta(minutes=15)
+
+# Runtime globals, kept between warm invocations
+DOWNLOAD_URL_CACHE: Dict[Tuple[str, str], Tuple[str, datetime]] = {}
+DOWNLOAD_URL_CACHE_LOCK = Lock()
+
+
+def get_presigned_url_expiry(url: str) -> datetime:
+    """
+    Get the expiry of an s3 presigned url from its X-Amz-Date and X-Amz-Expires query parameters
+    :param url:
+    :return:
+    """
+    query = parse_qs(urlparse(url).query)
+    try:
+        signed_at = datetime.strptime(query['X-Amz-Date'][0], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        return signed_at + timedelta(seconds=int(query['X-Amz-Expires'][0]))
+    except (KeyError, IndexError, ValueError):
+        return datetime.now(timezone.utc) + DEFAULT_URL_LIFETIME
+
+
+def _get_cached_download_url(project_id: str, data_id: str) -> Optional[str]:
+    with DOWNLOAD_URL_CACHE_LOCK:
+        cached_url = DOWNLOAD_URL_CACHE.get((project_id, data_id))
+        if cached_url is None:
+            return None
+        url, expires_at = cached_url
+        if datetime.now(timezone.utc) + URL_EXPIRY_MARGIN >= expires_at:
+            del DOWNLOAD_URL_CACHE[(project_id, data_id)]
+            return None
+        return url
+
+
+def _set_cached_download_url(project_id: str, data_id: str, url: str):
+    with DOWNLOAD_URL_CACHE_LOCK:
+        DOWNLOAD_URL_CACHE[(project_id, data_id)] = (url, get_presigned_url_expiry(url))
+
+
+def get_download_urls(project_id: str, data_id_list: Iterable[str]) -> Dict[str, str]:
+    """
+    Get download urls for many files in a project, keyed by data id.
+    Only the data ids without a fresh cached url are requested, DOWNLOAD_URL_BATCH_SIZE at a time.
+    :param project_id:
+    :param data_id_list:
+    :return:
+    """
+    from libica.openapi.v3 import ApiException
+    from libica.openapi.v3.api.project_data_api import ProjectDataApi
+    from libica.openapi.v3.models import DataIdOrPathList
+
+    project_id = str(project_id)
+
+    download_urls_by_data_id: Dict[str, str] = {}
+    missing_data_id_list: List[str] = []
+    for data_id_iter_ in dict.fromkeys(map(str, data_id_list)):
+        cached_url = _get_cached_download_url(project_id, data_id_iter_)
+        if cached_url is None:
+            missing_data_id_list.append(data_id_iter_)
+            continue
+        download_urls_by_data_id[data_id_iter_] = cached_url
+
+    api_instance = ProjectDataApi(get_icav2_api_client())
+    for batch_start in range(0, len(missing_data_id_list), DOWNLOAD_URL_BATCH_SIZE):
+        batch_data_id_list = missing_data_id_list[batch_start:batch_start + DOWNLOAD_URL_BATCH_SIZE]
+        try:
+            with icav2_call_slot():
+                api_response = api_instance.create_download_urls_for_data(
+                    project_id=project_id,
+                    data_id_or_path_list=DataIdOrPathList(dataIds=batch_data_id_list)
+                )
+        except ApiException:
+            logger.error(f"Could not create download urls for {len(batch_data_id_list)} files in project {project_id}")
+            raise
+
+        for data_url_iter_ in api_response.items:
+            _set_cached_download_url(project_id, data_url_iter_.data_id, data_url_iter_.url)
+            download_urls_by_data_id[data_url_iter_.data_id] = data_url_iter_.url
+
+    # Anything the api did not return a url for is an error, rather than a silent skip
+    missing_url_data_id_list = list(filter(
+        lambda data_id_iter_: data_id_iter_ not in download_urls_by_data_id,
+        missing_data_id_list
+    ))
+    if len(missing_url_data_id_list) > 0:
+        raise ValueError(f"No download urls returned for {', '.join(missing_url_data_id_list)} in project {project_id}")
+
+    return download_urls_by_data_id
+
+
+def get_download_url(project_id: str, data_id: str) -> str:
+    """
+    Drop-in replacement for wrapica's create_download_url that goes through the download url cache
+    :param project_id:
+    :param data_id:
+    :return:
+    """
+    return get_download_urls(project_id, [data_id])[str(data_id)]
+
+
+def _create_file_with_upload_url(project_id: str, folder_id: str, file_name: str) -> str:
+    from libica.openapi.v3 import ApiException
+    from libica.openapi.v3.api.project_data_api import ProjectDataApi
+    from libica.openapi.v3.models import CreateFileAndUploadUrl
+
+    try:
+        with icav2_call_slot():
+            api_response = ProjectDataApi(get_icav2_api_client()).create_file_with_upload_url(
+                project_id=project_id,
+                create_file_and_upload_url=CreateFileAndUploadUrl(
+                    name=file_name,
+                    folderId=folder_id,
+                )
+            )
+    except ApiException:
+        logger.error(f"Could not create file {file_name} in folder {folder_id} in project {project_id}")
+        raise
+
+    return api_response.upload_url
+
+
+def create_files_with_upload_urls(
+        project_id: str,
+        folder_id: str,
+        file_name_list: Iterable[str],
+        max_workers: int = UPLOAD_URL_MAX_WORKERS,
+) -> Tuple[Dict[str, str], Dict[str, Exception]]:
+    """
+    Create many files in a destination folder concurrently.
+    A failure to create one file does not affect the others,
+    returns the upload urls keyed by file name, and the errors keyed by file name
+    :param project_id:
+    :param folder_id:
+    :param file_name_list:
+    :param max_workers:
+    :return:
+    """
+    project_id = str(project_id)
+    folder_id = str(folder_id)
+    file_name_list = list(dict.fromkeys(file_name_list))
+
+    upload_urls_by_file_name: Dict[str, str] = {}
+    errors_by_file_name: Dict[str, Exception] = {}
+
+    if len(file_name_list) == 0:
+        return upload_urls_by_file_name, errors_by_file_name
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_name_list))) as executor:
+        future_by_file_name = {
+            file_name_iter_: executor.submit(_create_file_with_upload_url, project_id, folder_id, file_name_iter_)
+            for file_name_iter_ in file_name_list
+        }
+
+    for file_name_iter_, future_iter_ in future_by_file_name.items():
+        if future_iter_.exception() is not None:
+            errors_by_file_name[file_name_iter_] = future_iter_.exception()
+            continue
+        upload_urls_by_file_name[file_name_iter_] = future_iter_.result()
+
+    return upload_urls_by_file_name, errors_by_file_name
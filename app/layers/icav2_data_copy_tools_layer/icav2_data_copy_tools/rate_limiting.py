@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+"""
+Client-side rate limiting for the ICAv2 api
+
+Without any client-side limiting, a throttled (429) or failed (5xx) ICAv2 call surfaces as a lambda failure,
+and the step function retries the whole lambda after seconds of backoff.
+Instead, we
+
+* retry individual idempotent calls (GET, HEAD, PUT, DELETE, OPTIONS) on 429 and 5xx responses,
+  with exponential, jittered backoff, honouring the Retry-After header when the api sends one, and
+* limit the number of in-flight calls per process with an AIMD (additive increase, multiplicative decrease)
+  concurrency limiter. Every successful call raises the limit by 1 / limit (so roughly +1 per round of calls),
+  every throttle halves it, and a Retry-After pauses new calls from all threads until it has passed.
+
+The retry policy is installed on the shared wrapica configuration (see credentials.set_icav2_env_vars),
+so it applies to every ICAv2 call made through wrapica or libica in this process.
+The concurrency limit applies to calls wrapped in icav2_call_slot, i.e the calls we fan out over threads.
+
+One limiter is shared by all threads of a process, its counters are available through get_stats.
+"""
+
+# Standard imports
+import typing
+from collections import Counter
+from contextlib import contextmanager
+from threading import Condition, Lock
+from time import monotonic
+from typing import Any, Dict, Iterator, Optional, Union
+import logging
+
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
+
+if typing.TYPE_CHECKING:
+    from libica.openapi.v3 import Configuration
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+THROTTLE_STATUS_CODES = frozenset({429, 503})
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 5
+RETRY_BACKOFF_FACTOR = 0.5  # seconds, doubled on each retry
+RETRY_BACKOFF_JITTER = 1.0  # seconds, up to this much is added to each backoff
+RETRY_BACKOFF_MAX = 30  # seconds
+
+DEFAULT_INITIAL_CONCURRENCY_LIMIT = 8
+DEFAULT_MIN_CONCURRENCY_LIMIT = 1
+DEFAULT_MAX_CONCURRENCY_LIMIT = 32
+DEFAULT_DECREASE_FACTOR = 0.5
+# A burst of concurrent calls will often all be throttled at once, only decrease the limit once per interval
+DECREASE_INTERVAL_SECONDS = 1.0
+
+# Runtime globals
+ICAV2_RATE_LIMITER: Optional['AdaptiveConcurrencyLimiter'] = None
+ICAV2_RATE_LIMITER_LOCK = Lock()
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limiter, shared across the threads of a process
+    """
+    def __init__(
+            self,
+            initial_limit: int = DEFAULT_INITIAL_CONCURRENCY_LIMIT,
+            min_limit: int = DEFAULT_MIN_CONCURRENCY_LIMIT,
+            max_limit: int = DEFAULT_MAX_CONCURRENCY_LIMIT,
+            decrease_factor: float = DEFAULT_DECREASE_FACTOR,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+
+        self._condition = Condition()
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._cooldown_until = 0.0
+        self._last_decrease = 0.0
+        self._counters: typing.Counter[str] = Counter()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    def acquire(self):
+        """
+        Wait until we are below the concurrency limit and outside any Retry-After cooldown
+        :return:
+        """
+        with self._condition:
+            while True:
+                cooldown_remaining = self._cooldown_until - monotonic()
+                if cooldown_remaining > 0:
+                    self._condition.wait(cooldown_remaining)
+                    continue
+                if self._in_flight < self.limit:
+                    break
+                self._condition.wait()
+
+            self._in_flight += 1
+            self._counters['calls'] += 1
+
+    def release(self, succeeded: bool):
+        """
+        Release a slot, a successful call additively increases the limit
+        :param succeeded:
+        :return:
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if succeeded:
+                self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+            else:
+                self._counters['failed_calls'] += 1
+            self._condition.notify_all()
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """
+        Multiplicatively decrease the limit, and pause new calls for the Retry-After period (if any)
+        :param retry_after: Seconds
+        :return:
+        """
+        with self._condition:
+            now = monotonic()
+            self._counters['throttles'] += 1
+
+            if now - self._last_decrease >= DECREASE_INTERVAL_SECONDS:
+                self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                self._last_decrease = now
+                logger.warning(f"ICAv2 api throttled, reducing concurrency limit to {self.limit}")
+
+            if retry_after is not None and retry_after > 0:
+                self._cooldown_until = max(self._cooldown_until, now + retry_after)
+
+            self._condition.notify_all()
+
+    def on_retry(self, status: Optional[int]):
+        with self._condition:
+            self._counters['retries'] += 1
+            if status is not None and status >= 500:
+                self._counters['server_errors'] += 1
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            self.release(succeeded)
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "inFlight": self._in_flight,
+                "calls": self._counters['calls'],
+                "failedCalls": self._counters['failed_calls'],
+                "throttles": self._counters['throttles'],
+                "retries": self._counters['retries'],
+                "serverErrors": self._counters['server_errors'],
+            }
+
+
+class AdaptiveRetry(Retry):
+    """
+    urllib3 retry policy that reports throttles and retries to the concurrency limiter
+    """
+    def __init__(self, *args, limiter: Optional[AdaptiveConcurrencyLimiter] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+
+    def new(self, **kw: Any) -> 'AdaptiveRetry':
+        # urllib3 creates a new retry object on every attempt, carry the limiter across
+        new_retry = super().new(**kw)
+        new_retry.limiter = self.limiter
+        return new_retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        status = response.status if response is not None else None
+
+        if self.limiter is not None and status in THROTTLE_STATUS_CODES:
+            try:
+                retry_after = self.get_retry_after(response)
+            except InvalidHeader:
+                retry_after = None
+            self.limiter.on_throttle(retry_after)
+
+        # Raises MaxRetryError once we are out of retries
+        new_retry = super().increment(
+            method=method, url=url, response=response, error=error, _pool=_pool, _stacktrace=_stacktrace
+        )
+
+        if self.limiter is not None:
+            self.limiter.on_retry(status)
+
+        return new_retry
+
+
+def get_icav2_rate_limiter() -> AdaptiveConcurrencyLimiter:
+    """
+    Get the concurrency limiter shared by all threads in this process
+    :return:
+    """
+    global ICAV2_RATE_LIMITER
+
+    with ICAV2_RATE_LIMITER_LOCK:
+        if ICAV2_RATE_LIMITER is None:
+            ICAV2_RATE_LIMITER = AdaptiveConcurrencyLimiter()
+
+    return ICAV2_RATE_LIMITER
+
+
+def get_icav2_retry_policy() -> AdaptiveRetry:
+    return AdaptiveRetry(
+        total=MAX_RETRIES,
+        # Only retry idempotent calls
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        status_forcelist=RETRY_STATUS_CODES,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        backoff_jitter=RETRY_BACKOFF_JITTER,
+        backoff_max=RETRY_BACKOFF_MAX,
+        respect_retry_after_header=True,
+        # Hand the final response back to libica so it raises its usual ApiException
+        raise_on_status=False,
+        limiter=get_icav2_rate_limiter(),
+    )
+
+
+def install_icav2_retry_policy(configuration: 'Configuration'):
+    """
+    Set the retry policy on an ICAv2 configuration, it is picked up by every api client built from the configuration
+    :param configuration:
+    :return:
+    """
+    if isinstance(configuration.retries, AdaptiveRetry):
+        return
+    configuration.retries = get_icav2_retry_policy()
+
+
+@contextmanager
+def icav2_call_slot() -> Iterator[None]:
+    """
+    Hold a slot of the shared concurrency limiter for the duration of an ICAv2 call, i.e
+
+    with icav2_call_slot():
+        project_data_obj = get_project_data_obj_by_id(project_id, data_id)
+
+    :return:
+    """
+    with get_icav2_rate_limiter().slot():
+        yield
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+"""
+Time-budgeted multipart uploads, resumable from another process
+
+Files over 8 MB have always gone to an ECS task, so every one of them pays the Fargate start cost,
+even though many would finish well within a lambda.
+
+Instead, a lambda streams the file into an s3 multipart upload part by part
+(ranged GETs on the source presigned url, UploadPart with the destination folder credentials),
+checking its time budget before starting each part.
+If the budget runs out, the lambda stops starting new parts, waits for the in-flight parts and returns a resume token
+
+{
+    "bucket": "destination-bucket",
+    "key": "path/to/destination/file.txt",
+    "uploadId": "abcdefg...",
+    "partSize": 16777216,
+    "fileSizeInBytes": 1234567890
+}
+
+The ECS task takes the resume token, lists the parts already uploaded (ListParts),
+uploads the remaining parts and completes the upload.
+The completed parts are recorded by s3 itself, so nothing else needs to be checkpointed.
+
+Multipart uploads change the eTag of the destination object, so this is only used for sources that are
+already multipart files.
+"""
+
+# Standard imports
+import typing
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Set
+import logging
+
+# Local imports
+from .continuation import TimeBudget
+from .s3_parts import ResumeToken, get_number_of_parts, get_part_byte_range, get_part_size, get_uploaded_parts
+
+if typing.TYPE_CHECKING:
+    from urllib3 import PoolManager
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+MAX_PART_UPLOAD_WORKERS = 8
+# A part must be uploaded within this time, once less remains we hand off to ECS
+RESUMABLE_UPLOAD_TIME_RESERVE_MS = 2 * 60 * 1000
+
+# Runtime globals, kept between warm invocations
+HTTP_POOL_MANAGER: Optional['PoolManager'] = None
+
+
+def get_http_pool_manager() -> 'PoolManager':
+    global HTTP_POOL_MANAGER
+
+    if HTTP_POOL_MANAGER is None:
+        from urllib3 import PoolManager
+        HTTP_POOL_MANAGER = PoolManager(maxsize=MAX_PART_UPLOAD_WORKERS)
+
+    return HTTP_POOL_MANAGER
+
+
+def download_part(download_url: str, resume_token: ResumeToken, part_number: int) -> bytes:
+    """
+    Download the byte range of a part from the source presigned url
+    :param download_url:
+    :param resume_token:
+    :param part_number:
+    :return:
+    """
+    byte_range_start, byte_range_end = get_part_byte_range(resume_token, part_number)
+
+    response = get_http_pool_manager().request(
+        "GET",
+        download_url,
+        headers={"Range": f"bytes={byte_range_start}-{byte_range_end}"},
+    )
+    if response.status not in [200, 206]:
+        raise RuntimeError(f"Could not download part {part_number}, got status {response.status}")
+
+    return response.data
+
+
+def upload_part(s3_client, download_url: str, resume_token: ResumeToken, part_number: int) -> Dict:
+    response = s3_client.upload_part(
+        Bucket=resume_token['bucket'],
+        Key=resume_token['key'],
+        UploadId=resume_token['uploadId'],
+        PartNumber=part_number,
+        Body=download_part(download_url, resume_token, part_number),
+    )
+    return {
+        "PartNumber": part_number,
+        "ETag": response['ETag'],
+    }
+
+
+def upload_remaining_parts(
+        s3_client,
+        download_url: str,
+        resume_token: ResumeToken,
+        time_budget: Optional[TimeBudget] = None,
+        max_workers: int = MAX_PART_UPLOAD_WORKERS,
+) -> bool:
+    """
+    Upload the parts not yet recorded for the multipart upload, completing the upload once all parts are uploaded.
+    With a time budget, no new parts are started once the budget is exhausted.
+    :param s3_client:
+    :param download_url:
+    :param resume_token:
+    :param time_budget:
+    :param max_workers:
+    :return: True if the upload was completed, False if parts remain
+    """
+    uploaded_part_list = get_uploaded_parts(s3_client, resume_token)
+    uploaded_part_numbers: Set[int] = set(map(lambda part_iter_: part_iter_['PartNumber'], uploaded_part_list))
+
+    remaining_part_numbers = list(filter(
+        lambda part_number_iter_: part_number_iter_ not in uploaded_part_numbers,
+        range(1, get_number_of_parts(resume_token) + 1)
+    ))
+
+    future_list: List[Future] = []
+    in_flight_future_set: Set[Future] = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for part_number_iter_ in remaining_part_numbers:
+            # Keep at most max_workers parts (and their buffers) in flight
+            if len(in_flight_future_set) >= max_workers:
+                _, in_flight_future_set = wait(in_flight_future_set, return_when=FIRST_COMPLETED)
+            if time_budget is not None and time_budget.is_exhausted():
+                break
+            future = executor.submit(upload_part, s3_client, download_url, resume_token, part_number_iter_)
+            future_list.append(future)
+            in_flight_future_set.add(future)
+
+    # Raise the first part failure, if any
+    uploaded_part_list.extend(map(lambda future_iter_: future_iter_.result(), future_list))
+
+    if len(uploaded_part_list) < get_number_of_parts(resume_token):
+        logger.info(
+            f"Uploaded {len(uploaded_part_list)} of {get_number_of_parts(resume_token)} parts "
+            f"of s3://{resume_token['bucket']}/{resume_token['key']} before running out of time"
+        )
+        return False
+
+    s3_client.complete_multipart_upload(
+        Bucket=resume_token['bucket'],
+        Key=resume_token['key'],
+        UploadId=resume_token['uploadId'],
+        MultipartUpload={"Parts": sorted(uploaded_part_list, key=lambda part_iter_: part_iter_['PartNumber'])},
+    )
+
+    return True
+
+
+def start_resumable_upload(
+        s3_client,
+        download_url: str,
+        bucket: str,
+        key: str,
+        file_size_in_bytes: int,
+        time_budget: Optional[TimeBudget] = None,
+) -> Optional[ResumeToken]:
+    """
+    Start a multipart upload of the source presigned url to the destination bucket and key,
+    uploading as many parts as the time budget allows
+    :param s3_client: s3 client with the destination folder credentials
+    :param download_url: The source presigned url
+    :param bucket:
+    :param key:
+    :param file_size_in_bytes:
+    :param time_budget:
+    :return: None if the upload completed, otherwise a resume token for the upload
+    """
+    if time_budget is not None:
+        time_budget = TimeBudget(time_budget.context, reserve_ms=RESUMABLE_UPLOAD_TIME_RESERVE_MS)
+
+    resume_token: ResumeToken = {
+        "bucket": bucket,
+        "key": key,
+        "uploadId": s3_client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId'],
+        "partSize": get_part_size(file_size_in_bytes),
+        "fileSizeInBytes": file_size_in_bytes,
+    }
+
+    try:
+        if upload_remaining_parts(s3_client, download_url, resume_token, time_budget=time_budget):
+            return None
+    except Exception as e:
+        # The parts uploaded so far are kept, the ECS task retries the rest
+        logger.warning(f"Part upload failed, handing the remaining parts of the upload off, {e}")
+
+    return resume_token
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+"""
+s3 multipart helpers, shared by the lambdas and the ECS tasks
+
+* get_part_size / get_number_of_parts / get_part_byte_range split a file into parts,
+* get_uploaded_parts lists the parts s3 has already recorded for a multipart upload, and
+* copy_s3_object copies an object server-side, with CopyObject for smaller objects
+  or UploadPartCopy (parts copied in parallel) for larger objects.
+
+A multipart upload started by the upload from filemanager lambda is resumed by an ECS task from its resume token
+
+{
+    "bucket": "destination-bucket",
+    "key": "path/to/destination/file.txt",
+    "uploadId": "abcdefg...",
+    "partSize": 16777216,
+    "fileSizeInBytes": 1234567890
+}
+
+so both must split the file the same way.
+
+This module only uses the standard library (and the s3 client it is given), and nothing else from this package,
+the ECS images vendor it as a top level module when they are built.
+"""
+
+# Standard imports
+from concurrent.futures import ThreadPoolExecutor
+from math import ceil
+from typing import Dict, List, Tuple, TypedDict
+import logging
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+# CopyObject can copy objects up to 5 GiB
+MAX_COPY_OBJECT_SIZE_IN_BYTES = 5 * 1024 ** 3
+# Uploaded parts are held in memory, copied parts are not
+MIN_UPLOAD_PART_SIZE_IN_BYTES = 16 * 1024 ** 2
+MIN_COPY_PART_SIZE_IN_BYTES = 64 * 1024 ** 2
+MAX_PART_SIZE_IN_BYTES = 5 * 1024 ** 3
+MAX_NUMBER_OF_PARTS = 10000
+MAX_PART_COPY_WORKERS = 16
+
+
+class ResumeToken(TypedDict):
+    bucket: str
+    key: str
+    uploadId: str
+    partSize: int
+    fileSizeInBytes: int
+
+
+def get_part_size(file_size_in_bytes: int, min_part_size_in_bytes: int = MIN_UPLOAD_PART_SIZE_IN_BYTES) -> int:
+    """
+    Get the smallest part size (at least min_part_size_in_bytes) that keeps us within the maximum number of parts
+    :param file_size_in_bytes:
+    :param min_part_size_in_bytes:
+    :return:
+    """
+    return min(
+        MAX_PART_SIZE_IN_BYTES,
+        max(min_part_size_in_bytes, ceil(file_size_in_bytes / MAX_NUMBER_OF_PARTS))
+    )
+
+
+def get_number_of_parts(resume_token: ResumeToken) -> int:
+    return max(1, ceil(resume_token['fileSizeInBytes'] / resume_token['partSize']))
+
+
+def get_part_byte_range(resume_token: ResumeToken, part_number: int) -> Tuple[int, int]:
+    """
+    Get the (inclusive) byte range of a part
+    :param resume_token:
+    :param part_number: Starts at 1
+    :return:
+    """
+    byte_range_start = (part_number - 1) * resume_token['partSize']
+    byte_range_end = min(resume_token['fileSizeInBytes'], byte_range_start + resume_token['partSize']) - 1
+    return byte_range_start, byte_range_end
+
+
+def get_uploaded_parts(s3_client, resume_token: ResumeToken) -> List[Dict]:
+    """
+    Get the parts s3 has already recorded for the multipart upload
+    :param s3_client:
+    :param resume_token:
+    :return:
+    """
+    part_list = []
+    for page_iter_ in s3_client.get_paginator('list_parts').paginate(
+        Bucket=resume_token['bucket'],
+        Key=resume_token['key'],
+        UploadId=resume_token['uploadId'],
+    ):
+        part_list.extend(map(
+            lambda part_iter_: {
+                "PartNumber": part_iter_['PartNumber'],
+                "ETag": part_iter_['ETag'],
+            },
+            page_iter_.get('Parts', [])
+        ))
+
+    return part_list
+
+
+def copy_s3_object(
+        s3_client,
+        source_bucket: str, source_key: str,
+        destination_bucket: str, destination_key: str,
+        file_size_in_bytes: int,
+        max_workers: int = MAX_PART_COPY_WORKERS,
+):
+    """
+    Copy an s3 object server-side, with UploadPartCopy (parts copied in parallel) for objects over 5 GiB.
+    A failed multipart copy is aborted so that no orphaned parts are left behind
+    :return:
+    """
+    copy_source = {"Bucket": source_bucket, "Key": source_key}
+
+    if file_size_in_bytes <= MAX_COPY_OBJECT_SIZE_IN_BYTES:
+        s3_client.copy_object(
+            CopySource=copy_source,
+            Bucket=destination_bucket,
+            Key=destination_key,
+        )
+        return
+
+    resume_token: ResumeToken = {
+        "bucket": destination_bucket,
+        "key": destination_key,
+        "uploadId": s3_client.create_multipart_upload(
+            Bucket=destination_bucket,
+            Key=destination_key,
+        )['UploadId'],
+        "partSize": get_part_size(file_size_in_bytes, min_part_size_in_bytes=MIN_COPY_PART_SIZE_IN_BYTES),
+        "fileSizeInBytes": file_size_in_bytes,
+    }
+
+    def _upload_part_copy(part_number: int) -> Dict:
+        byte_range_start, byte_range_end = get_part_byte_range(resume_token, part_number)
+        response = s3_client.upload_part_copy(
+            Bucket=destination_bucket,
+            Key=destination_key,
+            UploadId=resume_token['uploadId'],
+            PartNumber=part_number,
+            CopySource=copy_source,
+            CopySourceRange=f"bytes={byte_range_start}-{byte_range_end}",
+        )
+        return {
+            "PartNumber": part_number,
+            "ETag": response['CopyPartResult']['ETag'],
+        }
+
+    number_of_parts = get_number_of_parts(resume_token)
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_workers, number_of_parts)) as executor:
+            part_list = list(executor.map(_upload_part_copy, range(1, number_of_parts + 1)))
+
+        s3_client.complete_multipart_upload(
+            Bucket=destination_bucket,
+            Key=destination_key,
+            UploadId=resume_token['uploadId'],
+            MultipartUpload={"Parts": part_list},
+        )
+    except Exception:
+        s3_client.abort_multipart_upload(
+            Bucket=destination_bucket,
+            Key=destination_key,
+            UploadId=resume_token['uploadId'],
+        )
+        raise
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+"""
+Lightweight serialisation helpers
+
+A handler's return value must be json serialisable before it is handed back to the step function.
+fastapi's jsonable_encoder does this, but importing fastapi (and starlette with it) for a handful of dicts
+adds a noticeable chunk of cold start time to every lambda that uses it.
+
+to_json_serialisable covers the types our handlers actually return,
+pydantic models (from wrapica / libica), uuids, paths, enums, dates and the usual containers.
+"""
+
+# Standard imports
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from pathlib import PurePath
+from typing import Any
+from uuid import UUID
+
+
+def to_json_serialisable(obj: Any) -> Any:
+    """
+    Convert an object into something json.dumps can serialise.
+    A stand-in for fastapi.encoders.jsonable_encoder
+    :param obj:
+    :return:
+    """
+    if obj is None or isinstance(obj, (str, bool, int, float)):
+        return obj
+
+    if isinstance(obj, dict):
+        return {
+            str(to_json_serialisable(key_iter_)): to_json_serialisable(value_iter_)
+            for key_iter_, value_iter_ in obj.items()
+        }
+
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return list(map(to_json_serialisable, obj))
+
+    if isinstance(obj, Enum):
+        return to_json_serialisable(obj.value)
+
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+
+    if isinstance(obj, (UUID, PurePath)):
+        return str(obj)
+
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+
+    # Pydantic models, checked by attribute so we don't need to import pydantic here
+    if hasattr(obj, 'model_dump'):
+        return to_json_serialisable(obj.model_dump(mode='json', by_alias=True))
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not json serialisable")
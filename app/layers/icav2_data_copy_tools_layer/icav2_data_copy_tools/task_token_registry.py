@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+"""
+External task token registry
+
+Each handle copy jobs execution started with a task token (i.e by the external heartbeat caller)
+registers its task token when it starts, and deregisters it when it ends.
+
+A registered task token is a row in the job table
+
+{
+    "id": "<handle copy jobs execution name>",
+    "id_type": "EXTERNAL_TASK_TOKEN",
+    "task_token": "...",
+    "execution_arn": "arn:aws:states:...:execution:...",
+    "expire_at": 1234567890
+}
+
+The external heartbeat then needs only one (paginated) query on the id_type index to find every active task token,
+rather than listing every running handle copy jobs execution and describing each one to find its task token.
+
+An execution that is aborted or times out never reaches its deregister step,
+so before each heartbeat we check the execution is still running.
+If it is not, we send a task failure to its task token (so the caller is not left waiting on heartbeats alone)
+and deregister it.
+Task tokens that are rejected as timed out or invalid are also deregistered.
+"""
+
+# Standard imports
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from os import environ
+from typing import List, Optional, TypedDict
+import logging
+
+import boto3
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBClient
+    from mypy_boto3_stepfunctions import SFNClient
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+TABLE_NAME_ENV_VAR = "TABLE_NAME"
+# Should match TABLE_ID_TYPE_INDEX_NAME in the infrastructure constants
+ID_TYPE_INDEX_NAME = "id_type-index"
+EXTERNAL_TASK_TOKEN_ID_TYPE = "EXTERNAL_TASK_TOKEN"
+# A handle copy jobs execution waits at most seven days on a copy job, and the registry row is removed when it ends,
+# the expiry only catches rows the heartbeat has not yet cleaned up
+TASK_TOKEN_REGISTRY_EXPIRY = timedelta(days=8)
+MAX_HEARTBEAT_WORKERS = 16
+# Task tokens of finished executions
+EXPIRED_TASK_TOKEN_ERROR_CODES = frozenset({"TaskTimedOut", "InvalidToken", "TaskDoesNotExist"})
+RUNNING_EXECUTION_STATUS = "RUNNING"
+
+
+class RegisteredTaskToken(TypedDict):
+    executionName: str
+    taskToken: str
+    executionArn: Optional[str]
+
+
+class HeartbeatSummary(TypedDict):
+    activeTaskTokenCount: int
+    expiredTaskTokenCount: int
+
+
+def get_dynamodb_client() -> 'DynamoDBClient':
+    return boto3.client('dynamodb')
+
+
+def get_sfn_client() -> 'SFNClient':
+    return boto3.client('stepfunctions')
+
+
+class DynamoDbTaskTokenRegistry:
+    """
+    Task token registry in the job table, one task token per handle copy jobs execution
+    """
+    def __init__(self, table_name: Optional[str] = None):
+        self.table_name = table_name if table_name is not None else environ[TABLE_NAME_ENV_VAR]
+
+    def register(self, execution_name: str, task_token: str, execution_arn: Optional[str] = None):
+        item = {
+            "id": {"S": execution_name},
+            "id_type": {"S": EXTERNAL_TASK_TOKEN_ID_TYPE},
+            "task_token": {"S": task_token},
+            "expire_at": {"N": str(int((datetime.now(timezone.utc) + TASK_TOKEN_REGISTRY_EXPIRY).timestamp()))},
+        }
+        if execution_arn is not None:
+            item["execution_arn"] = {"S": execution_arn}
+
+        get_dynamodb_client().put_item(
+            TableName=self.table_name,
+            Item=item
+        )
+
+    def deregister(self, execution_name: str):
+        get_dynamodb_client().delete_item(
+            TableName=self.table_name,
+            Key={
+                "id": {"S": execution_name},
+                "id_type": {"S": EXTERNAL_TASK_TOKEN_ID_TYPE},
+            }
+        )
+
+    def list_task_tokens(self) -> List[RegisteredTaskToken]:
+        task_token_list: List[RegisteredTaskToken] = []
+        for page_iter_ in get_dynamodb_client().get_paginator('query').paginate(
+            TableName=self.table_name,
+            IndexName=ID_TYPE_INDEX_NAME,
+            KeyConditionExpression="id_type = :id_type",
+            ExpressionAttributeValues={":id_type": {"S": EXTERNAL_TASK_TOKEN_ID_TYPE}},
+        ):
+            task_token_list.extend(map(
+                lambda item_iter_: {
+                    "executionName": item_iter_['id']['S'],
+                    "taskToken": item_iter_['task_token']['S'],
+                    "executionArn": item_iter_.get('execution_arn', {}).get('S'),
+                },
+                page_iter_.get('Items', [])
+            ))
+
+        return task_token_list
+
+
+def is_execution_running(execution_arn: str) -> bool:
+    """
+    Check a handle copy jobs execution is still running
+    :param execution_arn:
+    :return:
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        execution_status = get_sfn_client().describe_execution(executionArn=execution_arn)['status']
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ExecutionDoesNotExist':
+            return False
+        raise
+
+    return execution_status == RUNNING_EXECUTION_STATUS
+
+
+def send_task_failure(registered_task_token: RegisteredTaskToken):
+    """
+    Fail the task token of an execution that ended without releasing it
+    :param registered_task_token:
+    :return:
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        get_sfn_client().send_task_failure(
+            taskToken=registered_task_token['taskToken'],
+            error="CopyRequestEnded",
+            cause=f"Execution {registered_task_token['executionArn']} ended without completing the copy request",
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in EXPIRED_TASK_TOKEN_ERROR_CODES:
+            return
+        raise
+
+
+def send_task_heartbeat(registered_task_token: RegisteredTaskToken) -> bool:
+    """
+    Send a heartbeat to a registered task token
+    :param registered_task_token:
+    :return: False if the task token has expired (its execution has ended), otherwise True
+    """
+    from botocore.exceptions import ClientError
+
+    # Rows registered without an execution arn can only be checked through the heartbeat itself
+    if (
+        registered_task_token.get('executionArn') is not None and
+        not is_execution_running(registered_task_token['executionArn'])
+    ):
+        logger.info(f"Execution {registered_task_token['executionName']} is no longer running, failing its task token")
+        send_task_failure(registered_task_token)
+        return False
+
+    try:
+        get_sfn_client().send_task_heartbeat(taskToken=registered_task_token['taskToken'])
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in EXPIRED_TASK_TOKEN_ERROR_CODES:
+            logger.info(f"Task token of {registered_task_token['executionName']} has expired, {e}")
+            return False
+        raise
+
+    return True
+
+
+def send_task_heartbeats(
+        registry: DynamoDbTaskTokenRegistry,
+        max_workers: int = MAX_HEARTBEAT_WORKERS,
+) -> HeartbeatSummary:
+    """
+    Send a heartbeat to every registered task token, deregistering those that have expired
+    :param registry:
+    :param max_workers:
+    :return:
+    """
+    registered_task_token_list = registry.list_task_tokens()
+
+    if len(registered_task_token_list) == 0:
+        return {
+            "activeTaskTokenCount": 0,
+            "expiredTaskTokenCount": 0,
+        }
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(registered_task_token_list))) as executor:
+        is_active_list = list(executor.map(send_task_heartbeat, registered_task_token_list))
+
+    expired_task_token_list = list(map(
+        lambda zip_iter_: zip_iter_[0],
+        filter(
+            lambda zip_iter_: not zip_iter_[1],
+            zip(registered_task_token_list, is_active_list)
+        )
+    ))
+
+    for expired_task_token_iter_ in expired_task_token_list:
+        registry.deregister(expired_task_token_iter_['executionName'])
+
+    return {
+        "activeTaskTokenCount": len(registered_task_token_list) - len(expired_task_token_list),
+        "expiredTaskTokenCount": len(expired_task_token_list),
+    }
+
+
+def get_task_token_registry() -> DynamoDbTaskTokenRegistry:
+    return DynamoDbTaskTokenRegistry()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+
+"""
+Work queue helpers
+
+The planner emits work items to a queue as soon as each file is classified,
+so transfer workers can start moving data while the rest of the tree is still being listed.
+
+A work item looks like the following
+
+{
+    "requestId": "<handle copy jobs execution name>/work-queue/<segment start index>",
+    "itemIndex": 12,
+    "sourceData": {"projectId": "...", "dataId": "fil.abc"},
+    "destinationData": {"projectId": "...", "dataId": "fol.abc"}
+}
+
+where itemIndex is the index of the source data in the planner's data list.
+
+Once the planner has finished, the step function sends a barrier message holding its task token
+to the same queue
+
+{
+    "requestId": "<handle copy jobs execution name>/work-queue/<segment start index>",
+    "taskToken": "..."
+}
+
+Progress is tracked per request in a DynamoDbWorkQueueTracker (a row in the job table, id_type WORK_QUEUE),
+whichever worker (or barrier) sees the final result sends the task token back to the step function.
+Results are recorded as sets of item indexes rather than counters,
+so a work item that is delivered (or queued by a retried planner) more than once is only counted once.
+"""
+
+# Standard imports
+import json
+import typing
+from datetime import datetime, timedelta, timezone
+from os import environ
+from typing import Any, Dict, Iterable, List, Optional, Set
+import logging
+
+import boto3
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_sqs import SQSClient
+    from mypy_boto3_dynamodb import DynamoDBClient
+    from mypy_boto3_stepfunctions import SFNClient
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+WORK_QUEUE_URL_ENV_VAR = "WORK_QUEUE_URL"
+TABLE_NAME_ENV_VAR = "TABLE_NAME"
+WORK_QUEUE_ID_TYPE = "WORK_QUEUE"
+SQS_MAX_BATCH_SIZE = 10
+# Tracker rows are only needed for the lifetime of the request
+WORK_QUEUE_TRACKER_EXPIRY = timedelta(days=7)
+# Task tokens of finished executions
+EXPIRED_TASK_TOKEN_ERROR_CODES = frozenset({"TaskTimedOut", "InvalidToken", "TaskDoesNotExist"})
+
+
+def get_sqs_client() -> 'SQSClient':
+    return boto3.client('sqs')
+
+
+def get_dynamodb_client() -> 'DynamoDBClient':
+    return boto3.client('dynamodb')
+
+
+def get_sfn_client() -> 'SFNClient':
+    return boto3.client('stepfunctions')
+
+
+class SqsWorkQueue:
+    """
+    Work queue backed by an SQS queue, send_items returns the number of items sent
+    """
+    def __init__(self, queue_url: str):
+        self.queue_url = queue_url
+
+    def _send_batch(self, batch: List[Dict[str, Any]]):
+        entries = [
+            {
+                "Id": str(index),
+                "MessageBody": json.dumps(item, separators=(',', ':'))
+            }
+            for index, item in enumerate(batch)
+        ]
+
+        # Retry any partial failures once before giving up
+        for attempt_iter_ in range(2):
+            response = get_sqs_client().send_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=entries
+            )
+            failed_ids = set(map(lambda failed_iter_: failed_iter_['Id'], response.get('Failed', [])))
+            if len(failed_ids) == 0:
+                return
+            entries = list(filter(lambda entry_iter_: entry_iter_['Id'] in failed_ids, entries))
+
+        raise RuntimeError(f"Failed to send {len(entries)} work items to {self.queue_url}")
+
+    def send_items(self, items: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        batch = []
+        for item_iter_ in items:
+            batch.append(item_iter_)
+            if len(batch) == SQS_MAX_BATCH_SIZE:
+                self._send_batch(batch)
+                count += len(batch)
+                batch = []
+
+        if len(batch) > 0:
+            self._send_batch(batch)
+            count += len(batch)
+
+        return count
+
+
+class WorkQueueWriter:
+    """
+    Buffer work items and flush them to the work queue a batch at a time,
+    so items are visible to the workers as soon as a batch fills rather than when planning completes
+    """
+    def __init__(self, work_queue: SqsWorkQueue, request_id: str):
+        self.work_queue = work_queue
+        self.request_id = request_id
+        self.count = 0
+        self._buffer: List[Dict[str, Any]] = []
+
+    def put(self, item: Dict[str, Any]):
+        self._buffer.append({"requestId": self.request_id, **item})
+        if len(self._buffer) >= SQS_MAX_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if len(self._buffer) == 0:
+            return
+        self.count += self.work_queue.send_items(self._buffer)
+        self._buffer = []
+
+    def __enter__(self) -> 'WorkQueueWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+
+
+class DynamoDbWorkQueueTracker:
+    """
+    Track the progress of the work items of a single request, in a row of the job table.
+
+    The tracker holds
+      * expected_count - set by the planner once all items have been queued,
+        along with the range of item indexes (start_index / end_index) the planner covered
+      * task_token - set by the barrier message from the step function
+      * succeeded_count / failed_count - the number of distinct item indexes in range recorded by the workers
+    Each update returns the full state, complete_if_done sends the task token exactly once.
+    Should the send fail, the completion claim is released, so the redelivered message sends it again.
+    """
+    def __init__(self, request_id: str, table_name: Optional[str] = None):
+        self.request_id = request_id
+        self.table_name = table_name if table_name is not None else environ[TABLE_NAME_ENV_VAR]
+
+    def _update(self, update_expression: str, expression_attribute_values: Dict[str, Any]) -> Dict[str, Any]:
+        response = get_dynamodb_client().update_item(
+            TableName=self.table_name,
+            Key={
+                "id": {"S": self.request_id},
+                "id_type": {"S": WORK_QUEUE_ID_TYPE},
+            },
+            UpdateExpression=update_expression,
+            ExpressionAttributeValues={
+                ":expire_at": {"N": str(int((datetime.now(timezone.utc) + WORK_QUEUE_TRACKER_EXPIRY).timestamp()))},
+                **expression_attribute_values
+            },
+            ReturnValues="ALL_NEW"
+        )
+        attributes = response['Attributes']
+
+        # Items queued by a failed planner attempt beyond the end of the segment belong to the next segment
+        start_index = int(attributes.get('start_index', {}).get('N', 0))
+        end_index = int(attributes['end_index']['N']) if 'end_index' in attributes else None
+
+        def get_item_index_set(attribute_name: str) -> Set[int]:
+            return set(filter(
+                lambda item_index_iter_: (
+                    item_index_iter_ >= start_index and
+                    (end_index is None or item_index_iter_ < end_index)
+                ),
+                map(int, attributes.get(attribute_name, {}).get('NS', []))
+            ))
+
+        succeeded_item_index_set = get_item_index_set('succeeded_item_indexes')
+        # A redelivered item may succeed after it was recorded as failed
+        failed_item_index_set = get_item_index_set('failed_item_indexes') - succeeded_item_index_set
+
+        return {
+            "expected_count": int(attributes['expected_count']['N']) if 'expected_count' in attributes else None,
+            "task_token": attributes['task_token']['S'] if 'task_token' in attributes else None,
+            "succeeded_count": len(succeeded_item_index_set),
+            "failed_count": len(failed_item_index_set),
+        }
+
+    def set_expected_count(self, expected_count: int, start_index: int, end_index: Optional[int]) -> Dict[str, Any]:
+        if end_index is None:
+            return self._update(
+                "SET expected_count = :expected_count, start_index = :start_index, expire_at = :expire_at",
+                {
+                    ":expected_count": {"N": str(expected_count)},
+                    ":start_index": {"N": str(start_index)},
+                }
+            )
+        return self._update(
+            "SET expected_count = :expected_count, start_index = :start_index, end_index = :end_index, "
+            "expire_at = :expire_at",
+            {
+                ":expected_count": {"N": str(expected_count)},
+                ":start_index": {"N": str(start_index)},
+                ":end_index": {"N": str(end_index)},
+            }
+        )
+
+    def set_task_token(self, task_token: str) -> Dict[str, Any]:
+        return self._update(
+            "SET task_token = :task_token, expire_at = :expire_at",
+            {":task_token": {"S": task_token}}
+        )
+
+    def record_result(self, item_index: int, succeeded: bool) -> Dict[str, Any]:
+        # Adding to a set is idempotent, so a retried record is not counted twice
+        return self._update(
+            f"ADD {'succeeded_item_indexes' if succeeded else 'failed_item_indexes'} :item_index "
+            f"SET expire_at = :expire_at",
+            {":item_index": {"NS": [str(item_index)]}}
+        )
+
+    def claim_completion(self) -> bool:
+        dynamodb_client = get_dynamodb_client()
+        try:
+            dynamodb_client.update_item(
+                TableName=self.table_name,
+                Key={
+                    "id": {"S": self.request_id},
+                    "id_type": {"S": WORK_QUEUE_ID_TYPE},
+                },
+                UpdateExpression="SET completion_sent = :true",
+                ConditionExpression="attribute_not_exists(completion_sent)",
+                ExpressionAttributeValues={":true": {"BOOL": True}},
+            )
+        except dynamodb_client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def release_completion(self):
+        dynamodb_client = get_dynamodb_client()
+        try:
+            dynamodb_client.update_item(
+                TableName=self.table_name,
+                Key={
+                    "id": {"S": self.request_id},
+                    "id_type": {"S": WORK_QUEUE_ID_TYPE},
+                },
+                UpdateExpression="REMOVE completion_sent",
+                ConditionExpression="attribute_exists(completion_sent)",
+            )
+        except dynamodb_client.exceptions.ConditionalCheckFailedException:
+            logger.info(f"Completion of work queue {self.request_id} was not claimed")
+
+    @staticmethod
+    def is_done(state: Dict[str, Any]) -> bool:
+        return (
+            state.get('expected_count') is not None and
+            state.get('task_token') is not None and
+            state.get('succeeded_count', 0) + state.get('failed_count', 0) >= state['expected_count']
+        )
+
+    def complete_if_done(self, state: Dict[str, Any]) -> bool:
+        """
+        Send the task token back to the step function if all work items are accounted for.
+        Only the caller that claims the completion sends the token.
+        :param state:
+        :return:
+        """
+        from botocore.exceptions import ClientError
+
+        if not self.is_done(state) or not self.claim_completion():
+            return False
+
+        try:
+            if state.get('failed_count', 0) > 0:
+                get_sfn_client().send_task_failure(
+                    taskToken=state['task_token'],
+                    error="WorkItemsFailed",
+                    cause=f"{state['failed_count']} of {state['expected_count']} work items failed for {self.request_id}"
+                )
+            else:
+                get_sfn_client().send_task_success(
+                    taskToken=state['task_token'],
+                    output=json.dumps({
+                        "requestId": self.request_id,
+                        "succeededCount": state.get('succeeded_count', 0),
+                    })
+                )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in EXPIRED_TASK_TOKEN_ERROR_CODES:
+                logger.info(f"Task token of work queue {self.request_id} has expired, {e}")
+                return True
+            self.release_completion()
+            raise
+        return True
+
+
+def get_work_queue() -> Optional[SqsWorkQueue]:
+    """
+    Get the work queue for this lambda, None if the lambda has not been configured with a work queue
+    :return:
+    """
+    queue_url = environ.get(WORK_QUEUE_URL_ENV_VAR)
+    if queue_url is None:
+        return None
+    return SqsWorkQueue(queue_url)
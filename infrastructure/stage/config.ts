@@ -6,6 +6,9 @@ import {
   EVENT_SOURCE,
   ICAV2_ACCESS_TOKEN_SECRET_ID,
   INTERNAL_EVENT_BUS_DESCRIPTION,
+  MANIFEST_BUCKET_NAME,
+  MANIFEST_BUCKET_REMOVAL_POLICY,
+  SERVER_SIDE_COPY_ROLE_ARN,
   TABLE_NAME,
   TABLE_REMOVAL_POLICY,
 } from './constants';
@@ -23,6 +26,10 @@ export const getStatefulStackProps = (stage: StageName): StatefulApplicationStac
     tableName: TABLE_NAME,
     tableRemovalPolicy: TABLE_REMOVAL_POLICY,
 
+    /* Manifest bucket stuff */
+    manifestBucketName: MANIFEST_BUCKET_NAME,
+    manifestBucketRemovalPolicy: MANIFEST_BUCKET_REMOVAL_POLICY,
+
     /* Event Bus stuff */
     internalEventBusName: EVENT_BUS_NAME_INTERNAL,
     internalEventBusDescription: INTERNAL_EVENT_BUS_DESCRIPTION,
@@ -39,11 +46,17 @@ export const getStatelessStackProps = (stage: StageName): StatelessApplicationSt
     /* Table name */
     tableName: TABLE_NAME,
 
+    /* Manifest bucket name */
+    manifestBucketName: MANIFEST_BUCKET_NAME,
+
     /* Secrets */
     icav2AccessTokenSecretId: ICAV2_ACCESS_TOKEN_SECRET_ID[stage],
     orcabusTokenSecretId: DEFAULT_ORCABUS_TOKEN_SECRET_ID,
     hostnameSsmParameterName: DEFAULT_HOSTNAME_SSM_PARAMETER,
 
+    /* Server-side copy */
+    serverSideCopyRoleArn: SERVER_SIDE_COPY_ROLE_ARN[stage],
+
     /* Event stuff */
     internalEventBusName: EVENT_BUS_NAME_INTERNAL,
     externalEventBusName: EVENT_BUS_NAME_EXTERNAL,
@@ -1,5 +1,5 @@
 /* Imports */
-import { Duration, RemovalPolicy } from 'aws-cdk-lib';
+import { Aws, Duration, RemovalPolicy } from 'aws-cdk-lib';
 import * as path from 'node:path';
 import { StageName } from '@orcabus/platform-cdk-constructs/shared-config/accounts';
 import { EVENT_SCHEMA_REGISTRY_NAME } from '@orcabus/platform-cdk-constructs/shared-config/event-bridge';
@@ -10,6 +10,7 @@ export const LAMBDA_DIR = path.join(APP_ROOT, 'lambdas');
 export const STEP_FUNCTIONS_DIR = path.join(APP_ROOT, 'step-function-templates');
 export const ECS_DIR = path.join(APP_ROOT, 'ecs');
 export const EVENT_SCHEMAS_DIR = path.join(APP_ROOT, 'event-schemas');
+export const LAYERS_DIR = path.join(APP_ROOT, 'layers');
 
 /* Internal event bus constants */
 export const INTERNAL_EVENT_BUS_DESCRIPTION =
@@ -22,6 +23,8 @@ export const INTERNAL_EVENT_BUS_DESCRIPTION =
 // We also need to hardcode the event bridge rule name to prevent
 // circular dependencies in the CDK
 export const DEFAULT_HEART_BEAT_INTERVAL = Duration.minutes(3);
+// The internal heartbeat runs every minute, check_job_status decides which jobs are due a status check or heartbeat
+export const DEFAULT_HEART_BEAT_INTERNAL_INTERVAL = Duration.minutes(1);
 export const DEFAULT_HEART_BEAT_INTERNAL_EVENT_BRIDGE_RULE_NAME = 'internalHeartBeatScheduleRule';
 export const DEFAULT_HEART_BEAT_EXTERNAL_EVENT_BRIDGE_RULE_NAME = 'externalHeartBeatScheduleRule';
 
@@ -30,6 +33,8 @@ export const DEFAULT_HEART_BEAT_EXTERNAL_EVENT_BRIDGE_RULE_NAME = 'externalHeart
 // This is generated in the stateful infrastructure stack and used in the
 // stateless infrastructure stack
 export const DEFAULT_EVENT_PIPE_NAME = 'Icav2CopyJobEventPipe';
+// Must stay within the 100 keys of a BatchGetItem, and the 256 KiB express execution input
+export const DEFAULT_ICA_EVENT_PIPE_BATCH_SIZE = 50;
 // The SQS name should be noted since the ARN is required when
 // setting up the notifications of the project
 export const DEFAULT_ICA_SQS_NAME = 'Icav2CopyJobSqsQueue';
@@ -47,6 +52,29 @@ export const STACK_PREFIX = 'icav2-data-copy';
 /* DynamoDB table constants */
 export const TABLE_NAME = 'icav2DataCopyManagerDynamoDBTable';
 export const TABLE_REMOVAL_POLICY = RemovalPolicy.DESTROY; // Our table is very transient
+// Query every row of a given id_type (i.e registered external task tokens) without a scan
+export const TABLE_ID_TYPE_INDEX_NAME = 'id_type-index';
+
+/* Manifest bucket constants */
+// Large source lists are written to s3 as JSONL manifests and
+// read by the step functions through a distributed map ItemReader
+// We suffix the account and region to keep the bucket name globally unique
+export const MANIFEST_BUCKET_NAME = `${STACK_PREFIX}-manifests-${Aws.ACCOUNT_ID}-${Aws.REGION}`;
+// Manifests expire through the lifecycle rule, we don't want a delete to fail on a non-empty bucket
+export const MANIFEST_BUCKET_REMOVAL_POLICY = RemovalPolicy.RETAIN_ON_UPDATE_OR_DELETE;
+export const MANIFEST_BUCKET_EXPIRY = Duration.days(7);
+
+/* Work queue constants */
+// Small files are sent to the work queue by the planner as soon as they are classified
+// and uploaded by the uploadSinglePartFile lambda while planning continues
+export const WORK_QUEUE_NAME = 'Icav2DataCopySmallFileWorkQueue';
+// Must be at least the lambda timeout
+export const WORK_QUEUE_VIZ_TIMEOUT = Duration.seconds(960);
+// Must be greater than MAX_WORK_ITEM_ATTEMPTS in the uploadSinglePartFile lambda,
+// so that failed items are recorded against the request rather than dropped into the dlq
+export const WORK_QUEUE_MAX_RECEIVE_COUNT = 5;
+// Matches the max concurrency of the single file upload map
+export const WORK_QUEUE_MAX_CONCURRENCY = 40;
 
 /* SSM Parameter Paths */
 export const SSM_PARAMETER_PATH_PREFIX = path.join(`/orcabus/services/${STACK_PREFIX}/`);
@@ -71,3 +99,10 @@ export const ICAV2_ACCESS_TOKEN_SECRET_ID: Record<StageName, string> = {
   ['GAMMA']: 'ICAv2JWTKey-umccr-prod-service-staging', // pragma: allowlist secret
   ['PROD']: 'ICAv2JWTKey-umccr-prod-service-production', // pragma: allowlist secret
 };
+
+/* Server-side copy constants */
+// An optional cross-account role, per stage, that can read external (filemanager) source buckets
+// and write to the BYOB destination buckets. When set, the uploadFromFilemanager task assumes this role
+// to copy objects server-side (CopyObject / UploadPartCopy) rather than streaming them through the container.
+// Without a role, the task still tries a server-side copy with the ICAv2 project folder credentials
+export const SERVER_SIDE_COPY_ROLE_ARN: Partial<Record<StageName, string>> = {};
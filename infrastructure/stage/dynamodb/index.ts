@@ -2,6 +2,7 @@ import * as dynamodb from 'aws-cdk-lib/aws-dynamodb';
 import { Construct } from 'constructs';
 import { RemovalPolicy } from 'aws-cdk-lib';
 import { BuildTableProps } from './interfaces';
+import { TABLE_ID_TYPE_INDEX_NAME } from '../constants';
 
 export function buildTable(scope: Construct, props: BuildTableProps) {
   /* Dynamodb table */
@@ -11,7 +12,7 @@ export function buildTable(scope: Construct, props: BuildTableProps) {
       name: 'id',
       type: dynamodb.AttributeType.STRING,
     },
-    /* One of 'job_type', 'task_token' */
+    /* One of 'JOB_ID', 'WORK_QUEUE', 'EXTERNAL_TASK_TOKEN' */
     sortKey: {
       name: 'id_type',
       type: dynamodb.AttributeType.STRING,
@@ -22,5 +23,20 @@ export function buildTable(scope: Construct, props: BuildTableProps) {
       pointInTimeRecoveryEnabled: true,
     },
     timeToLiveAttribute: 'expire_at',
+    /* Query all rows of an id_type, i.e all active copy jobs or all registered external task tokens */
+    /* Rows are deleted once finished, abandoned rows are expired through expire_at */
+    globalSecondaryIndexes: [
+      {
+        indexName: TABLE_ID_TYPE_INDEX_NAME,
+        partitionKey: {
+          name: 'id_type',
+          type: dynamodb.AttributeType.STRING,
+        },
+        sortKey: {
+          name: 'id',
+          type: dynamodb.AttributeType.STRING,
+        },
+      },
+    ],
   });
 }
@@ -7,17 +7,34 @@ import {
   CPU_ARCHITECTURE_MAP,
   EcsFargateTaskConstruct,
 } from '@orcabus/platform-cdk-constructs/ecs';
+import * as fs from 'fs';
 import * as path from 'path';
-import { ECS_DIR } from '../constants';
+import { APP_ROOT, ECS_DIR } from '../constants';
 import {
   BuildAllFargateEcsTasksProps,
   BuildFargateEcsTaskProps,
   ecsTaskNameList,
+  EcsTaskName,
   EcsTaskObject,
+  ecsTaskToVendoredModulesMap,
 } from './interfaces';
 import { NagSuppressions } from 'cdk-nag';
 import { ICAV2_BASE_URL } from '@orcabus/platform-cdk-constructs/shared-config/icav2';
 import { camelCaseToSnakeCase } from '../utils';
+import * as iam from 'aws-cdk-lib/aws-iam';
+
+function vendorSharedModules(taskName: EcsTaskName) {
+  /*
+  Copy the shared python modules of the task into its scripts directory,
+  the copies are git ignored, the modules themselves live in app/ecs/shared or the lambda layer
+  */
+  for (const modulePath of ecsTaskToVendoredModulesMap[taskName]) {
+    fs.copyFileSync(
+      path.join(APP_ROOT, modulePath),
+      path.join(ECS_DIR, camelCaseToSnakeCase(taskName), 'scripts', path.basename(modulePath))
+    );
+  }
+}
 
 function buildEcsFargateTask(scope: Construct, props: BuildFargateEcsTaskProps) {
   /*
@@ -32,6 +49,7 @@ function buildEcsFargateTask(scope: Construct, props: BuildFargateEcsTaskProps)
   /*
   Generate an ECS Fargate task construct with the provided properties.
   */
+  vendorSharedModules(props.taskName);
 
   const ecsTask = new EcsFargateTaskConstruct(scope, `${props.taskName}-ecs`, {
     containerName: props.taskName,
@@ -62,6 +80,20 @@ function buildEcsFargateTask(scope: Construct, props: BuildFargateEcsTaskProps)
     props.hostnameSsmParameter.parameterName
   );
 
+  // The upload from filemanager task may copy external sources server-side through a cross-account role
+  if (props.taskName === 'uploadFromFilemanager' && props.serverSideCopyRoleArn) {
+    ecsTask.taskDefinition.taskRole.addToPrincipalPolicy(
+      new iam.PolicyStatement({
+        actions: ['sts:AssumeRole'],
+        resources: [props.serverSideCopyRoleArn],
+      })
+    );
+    ecsTask.containerDefinition.addEnvironment(
+      'SERVER_SIDE_COPY_ROLE_ARN',
+      props.serverSideCopyRoleArn
+    );
+  }
+
   // Add suppressions for the task role
   // Since the task role needs to access the S3 bucket prefix
   NagSuppressions.addResourceSuppressions(
@@ -14,10 +14,31 @@ export const ecsTaskNameList: EcsTaskName[] = [
   'uploadSinglePartFile',
 ];
 
+/*
+Python modules (relative to the app directory) copied into the scripts directory of a task
+before its image is built, so the task and the lambdas share a single implementation
+*/
+export type EcsTaskToVendoredModulesMapType = { [key in EcsTaskName]: string[] };
+
+export const ecsTaskToVendoredModulesMap: EcsTaskToVendoredModulesMapType = {
+  renameFile: [
+    'ecs/shared/task_env.py',
+    'ecs/shared/multipart_upload.py',
+    'layers/icav2_data_copy_tools_layer/icav2_data_copy_tools/s3_parts.py',
+  ],
+  uploadFromFilemanager: [
+    'ecs/shared/task_env.py',
+    'ecs/shared/multipart_upload.py',
+    'layers/icav2_data_copy_tools_layer/icav2_data_copy_tools/s3_parts.py',
+  ],
+  uploadSinglePartFile: ['ecs/shared/task_env.py'],
+};
+
 export interface BuildAllFargateEcsTasksProps {
   icav2AccessTokenSecretObj: ISecret;
   orcabusTokenSecretObj: ISecret;
   hostnameSsmParameter: IParameter;
+  serverSideCopyRoleArn?: string;
 }
 
 export interface BuildFargateEcsTaskProps extends BuildAllFargateEcsTasksProps {
@@ -8,7 +8,7 @@ import {
 } from './interfaces';
 import { Rule } from 'aws-cdk-lib/aws-events';
 import * as events from 'aws-cdk-lib/aws-events';
-import { DEFAULT_HEART_BEAT_INTERVAL } from '../constants';
+import { DEFAULT_HEART_BEAT_INTERNAL_INTERVAL, DEFAULT_HEART_BEAT_INTERVAL } from '../constants';
 import { Construct } from 'constructs';
 
 /* Event bridge rules */
@@ -145,6 +145,7 @@ export function buildEventBridgeRules(
           ruleName: eventBridgeName,
           ruleObject: buildHeartBeatEventBridgeRule(scope, {
             ruleName: eventBridgeName,
+            scheduleDuration: DEFAULT_HEART_BEAT_INTERNAL_INTERVAL,
           }),
         });
         break;
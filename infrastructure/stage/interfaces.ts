@@ -10,6 +10,10 @@ export interface StatefulApplicationStackConfig extends cdk.StackProps {
   tableName: string;
   tableRemovalPolicy: RemovalPolicy;
 
+  /* Manifest bucket */
+  manifestBucketName: string;
+  manifestBucketRemovalPolicy: RemovalPolicy;
+
   /* Event stuff */
   internalEventBusName: string;
   internalEventBusDescription: string;
@@ -25,11 +29,17 @@ export interface StatelessApplicationStackConfig extends cdk.StackProps {
   /* Dynamodb table name */
   tableName: string;
 
+  /* Manifest bucket name */
+  manifestBucketName: string;
+
   /* ICAv2 access token secret name */
   icav2AccessTokenSecretId: string;
   orcabusTokenSecretId: string;
   hostnameSsmParameterName: string;
 
+  /* Optional cross-account role for server-side copies of external sources */
+  serverSideCopyRoleArn?: string;
+
   /* Event stuff */
   externalEventBusName: string;
   internalEventBusName: string;
@@ -2,18 +2,23 @@
 
 import { Construct } from 'constructs';
 import {
+  BuildAllLambdasProps,
   BuildLambdaProps,
   lambdaNameList,
   LambdaObject,
   lambdaToRequirementsMap,
 } from './interfaces';
+import * as cdk from 'aws-cdk-lib';
 import { Duration } from 'aws-cdk-lib';
+import * as iam from 'aws-cdk-lib/aws-iam';
+import { SqsEventSource } from 'aws-cdk-lib/aws-lambda-event-sources';
 
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import { PythonUvFunction } from '@orcabus/platform-cdk-constructs/lambda';
 import * as path from 'path';
-import { LAMBDA_DIR } from '../constants';
+import { LAMBDA_DIR, WORK_QUEUE_MAX_CONCURRENCY } from '../constants';
 import { camelCaseToSnakeCase } from '../utils';
+import { NagSuppressions } from 'cdk-nag';
 
 function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject {
   const lambdaNameToSnakeCase = camelCaseToSnakeCase(props.lambdaName);
@@ -32,6 +37,128 @@ function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject {
     includeIcav2Layer: lambdaRequirements.needsIcav2Tools,
   });
 
+  /* Add the icav2 data copy tools layer */
+  if (lambdaRequirements.needsIcav2DataCopyToolsLayer) {
+    lambdaFunction.addLayers(props.icav2DataCopyToolsLayerObj.layerVersion);
+  }
+
+  /* Add the manifest bucket */
+  if (lambdaRequirements.needsManifestBucketAccess) {
+    lambdaFunction.addEnvironment('MANIFEST_BUCKET_NAME', props.manifestBucket.bucketName);
+    props.manifestBucket.grantReadWrite(lambdaFunction);
+
+    /* Will need cdk nag suppressions for this */
+    NagSuppressions.addResourceSuppressions(
+      lambdaFunction,
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason: 'Need ability to read and write any manifest in the manifest bucket',
+        },
+      ],
+      true
+    );
+  }
+
+  /* Add the table */
+  if (lambdaRequirements.needsTableAccess) {
+    lambdaFunction.addEnvironment('TABLE_NAME', props.tableObj.tableName);
+    props.tableObj.grantReadWriteData(lambdaFunction);
+
+    /* Will need cdk nag suppressions for this */
+    NagSuppressions.addResourceSuppressions(
+      lambdaFunction,
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason: 'Need ability to query any index of the table',
+        },
+      ],
+      true
+    );
+  }
+
+  /* Allow the lambda to send items to the work queue */
+  if (lambdaRequirements.needsWorkQueueSendPermissions) {
+    lambdaFunction.addEnvironment('WORK_QUEUE_URL', props.workQueue.queueUrl);
+    props.workQueue.grantSendMessages(lambdaFunction);
+  }
+
+  /* Consume the work queue */
+  if (lambdaRequirements.isWorkQueueConsumer) {
+    lambdaFunction.addEventSource(
+      new SqsEventSource(props.workQueue, {
+        batchSize: 10,
+        reportBatchItemFailures: true,
+        maxConcurrency: WORK_QUEUE_MAX_CONCURRENCY,
+      })
+    );
+
+    // The consumer releases the step function once all queued items are complete
+    lambdaFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        resources: [`arn:aws:states:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:stateMachine:*`],
+        actions: ['states:SendTaskSuccess', 'states:SendTaskFailure'],
+      })
+    );
+
+    /* Will need cdk nag suppressions for this */
+    NagSuppressions.addResourceSuppressions(
+      lambdaFunction,
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason: 'Need ability to send task success/failure to any state machine',
+        },
+      ],
+      true
+    );
+  }
+
+  /* Send heartbeats to, or release, step functions waiting on a task token */
+  if (lambdaRequirements.needsTaskTokenUpdatePermissions) {
+    lambdaFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        resources: [`arn:aws:states:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:stateMachine:*`],
+        actions: ['states:SendTaskSuccess', 'states:SendTaskFailure', 'states:SendTaskHeartbeat'],
+      })
+    );
+
+    /* Will need cdk nag suppressions for this */
+    NagSuppressions.addResourceSuppressions(
+      lambdaFunction,
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason: 'Need ability to send task success/failure/heartbeat to any state machine',
+        },
+      ],
+      true
+    );
+  }
+
+  /* Check whether the executions holding registered task tokens are still running */
+  if (lambdaRequirements.needsDescribeExecutionPermissions) {
+    lambdaFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        resources: [`arn:aws:states:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:execution:*`],
+        actions: ['states:DescribeExecution'],
+      })
+    );
+
+    /* Will need cdk nag suppressions for this */
+    NagSuppressions.addResourceSuppressions(
+      lambdaFunction,
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason: 'Need ability to describe any execution holding a registered task token',
+        },
+      ],
+      true
+    );
+  }
+
   /* Return the function */
   return {
     lambdaName: props.lambdaName,
@@ -39,13 +166,14 @@ function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject {
   };
 }
 
-export function buildAllLambdas(scope: Construct): LambdaObject[] {
+export function buildAllLambdas(scope: Construct, props: BuildAllLambdasProps): LambdaObject[] {
   // Iterate over lambdaLayerToMapping and create the lambda functions
   const lambdaObjects: LambdaObject[] = [];
   for (const lambdaName of lambdaNameList) {
     lambdaObjects.push(
       buildLambda(scope, {
         lambdaName: lambdaName,
+        ...props,
       })
     );
   }
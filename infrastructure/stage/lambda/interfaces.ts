@@ -1,41 +1,66 @@
 /* Lambda interfaces */
 import { PythonFunction } from '@aws-cdk/aws-lambda-python-alpha';
+import { IBucket } from 'aws-cdk-lib/aws-s3';
+import { IQueue } from 'aws-cdk-lib/aws-sqs';
+import { ITableV2 } from 'aws-cdk-lib/aws-dynamodb';
+import { LayerObject } from '../layers/interfaces';
 
 export type LambdaName =
   | 'checkJobStatus'
+  | 'closeCopyJobBatch'
+  | 'completeCopyJobBatch'
   | 'convertSourceUriFolderToUriList'
   | 'findSinglePartFiles'
   | 'generateCopyJobList'
   | 'getExternalSourceFileMetadata'
   | 'getRenamingMapParams'
   | 'getSourceFileSize'
+  | 'joinCopyJobBatch'
   | 'launchIcav2Copy'
+  | 'releaseCopyJobLease'
   | 'renameFile'
+  | 'requestCopyJobLease'
+  | 'sendExternalHeartbeats'
   | 'uploadFromFilemanager'
   | 'uploadSinglePartFile'
-  | 'validateFileTransfer';
+  | 'validateFileTransfer'
+  | 'validateFileTransferList';
 
 /* Lambda names array */
 /* Bit of double handling, BUT types are not parsed to JS */
 export const lambdaNameList: LambdaName[] = [
   'checkJobStatus',
+  'closeCopyJobBatch',
+  'completeCopyJobBatch',
   'convertSourceUriFolderToUriList',
   'findSinglePartFiles',
   'generateCopyJobList',
   'getExternalSourceFileMetadata',
   'getRenamingMapParams',
   'getSourceFileSize',
+  'joinCopyJobBatch',
   'launchIcav2Copy',
+  'releaseCopyJobLease',
   'renameFile',
+  'requestCopyJobLease',
+  'sendExternalHeartbeats',
   'uploadFromFilemanager',
   'uploadSinglePartFile',
   'validateFileTransfer',
+  'validateFileTransferList',
 ];
 
 /* We also throw in our custom application interfaces here too */
 export interface LambdaRequirementProps {
   needsIcav2Tools?: boolean;
   needsOrcabusApiTools?: boolean;
+  needsIcav2DataCopyToolsLayer?: boolean;
+  needsManifestBucketAccess?: boolean;
+  needsTableAccess?: boolean;
+  needsWorkQueueSendPermissions?: boolean;
+  isWorkQueueConsumer?: boolean;
+  needsTaskTokenUpdatePermissions?: boolean;
+  needsDescribeExecutionPermissions?: boolean;
 }
 
 export type LambdaToRequirementsMapType = { [key in LambdaName]: LambdaRequirementProps };
@@ -43,49 +68,116 @@ export type LambdaToRequirementsMapType = { [key in LambdaName]: LambdaRequireme
 export const lambdaToRequirementsMap: LambdaToRequirementsMapType = {
   checkJobStatus: {
     needsIcav2Tools: true,
+    needsIcav2DataCopyToolsLayer: true,
+    needsTableAccess: true,
+  },
+  closeCopyJobBatch: {
+    needsIcav2DataCopyToolsLayer: true,
+    needsManifestBucketAccess: true,
+    needsTableAccess: true,
+  },
+  completeCopyJobBatch: {
+    needsIcav2DataCopyToolsLayer: true,
+    needsTableAccess: true,
+    needsTaskTokenUpdatePermissions: true,
   },
   convertSourceUriFolderToUriList: {
     needsIcav2Tools: true,
+    needsIcav2DataCopyToolsLayer: true,
   },
   findSinglePartFiles: {
     needsIcav2Tools: true,
+    needsIcav2DataCopyToolsLayer: true,
+    needsManifestBucketAccess: true,
+    needsTableAccess: true,
+    needsWorkQueueSendPermissions: true,
   },
   generateCopyJobList: {
     needsIcav2Tools: true,
+    needsIcav2DataCopyToolsLayer: true,
+    needsManifestBucketAccess: true,
   },
   getExternalSourceFileMetadata: {
     needsIcav2Tools: true,
     needsOrcabusApiTools: true,
+    needsIcav2DataCopyToolsLayer: true,
+    needsManifestBucketAccess: true,
   },
   getRenamingMapParams: {
     needsIcav2Tools: true,
+    needsIcav2DataCopyToolsLayer: true,
+    needsManifestBucketAccess: true,
   },
   getSourceFileSize: {
     needsIcav2Tools: true,
+    needsIcav2DataCopyToolsLayer: true,
+  },
+  joinCopyJobBatch: {
+    needsIcav2DataCopyToolsLayer: true,
+    needsTableAccess: true,
+    needsTaskTokenUpdatePermissions: true,
   },
   launchIcav2Copy: {
     needsIcav2Tools: true,
+    needsIcav2DataCopyToolsLayer: true,
+    needsManifestBucketAccess: true,
+  },
+  releaseCopyJobLease: {
+    needsIcav2DataCopyToolsLayer: true,
+    needsTableAccess: true,
+    needsTaskTokenUpdatePermissions: true,
   },
   renameFile: {
     needsIcav2Tools: true,
+    needsIcav2DataCopyToolsLayer: true,
+  },
+  requestCopyJobLease: {
+    needsIcav2DataCopyToolsLayer: true,
+    needsTableAccess: true,
+    needsTaskTokenUpdatePermissions: true,
+  },
+  sendExternalHeartbeats: {
+    needsIcav2DataCopyToolsLayer: true,
+    needsTableAccess: true,
+    needsTaskTokenUpdatePermissions: true,
+    needsDescribeExecutionPermissions: true,
   },
   uploadFromFilemanager: {
     needsIcav2Tools: true,
+    needsIcav2DataCopyToolsLayer: true,
     needsOrcabusApiTools: true,
   },
   uploadSinglePartFile: {
     needsIcav2Tools: true,
+    needsIcav2DataCopyToolsLayer: true,
+    needsTableAccess: true,
+    isWorkQueueConsumer: true,
   },
   validateFileTransfer: {
     needsIcav2Tools: true,
+    needsIcav2DataCopyToolsLayer: true,
     needsOrcabusApiTools: true,
   },
+  validateFileTransferList: {
+    needsIcav2Tools: true,
+    needsOrcabusApiTools: true,
+    needsIcav2DataCopyToolsLayer: true,
+    needsManifestBucketAccess: true,
+  },
 };
 
-export interface BuildLambdaProps {
+export interface BuildAllLambdasProps {
+  icav2DataCopyToolsLayerObj: LayerObject;
+  manifestBucket: IBucket;
+  tableObj: ITableV2;
+  workQueue: IQueue;
+}
+
+export interface BuildLambdaProps extends BuildAllLambdasProps {
   lambdaName: LambdaName;
 }
 
-export interface LambdaObject extends BuildLambdaProps {
+export interface LambdaObject {
+  lambdaName: LambdaName;
   lambdaFunction: PythonFunction;
 }
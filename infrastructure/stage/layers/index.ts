@@ -0,0 +1,33 @@
+/* Layer stuff */
+
+import { Construct } from 'constructs';
+import { BuildLayerProps, LayerObject } from './interfaces';
+import { PythonLayerVersion } from '@aws-cdk/aws-lambda-python-alpha';
+import * as lambda from 'aws-cdk-lib/aws-lambda';
+import * as path from 'path';
+import { LAYERS_DIR } from '../constants';
+import { camelCaseToSnakeCase } from '../utils';
+
+function buildLayer(scope: Construct, props: BuildLayerProps): LayerObject {
+  const layerNameToSnakeCase = camelCaseToSnakeCase(props.layerName);
+
+  // Create the layer
+  const layerVersion = new PythonLayerVersion(scope, `${props.layerName}-layer`, {
+    entry: path.join(LAYERS_DIR, layerNameToSnakeCase + '_layer'),
+    compatibleRuntimes: [lambda.Runtime.PYTHON_3_14],
+    compatibleArchitectures: [lambda.Architecture.ARM_64],
+    description: `Shared python helpers for the icav2 data copy manager (${layerNameToSnakeCase})`,
+  });
+
+  /* Return the layer */
+  return {
+    layerName: props.layerName,
+    layerVersion: layerVersion,
+  };
+}
+
+export function buildIcav2DataCopyToolsLayer(scope: Construct): LayerObject {
+  return buildLayer(scope, {
+    layerName: 'icav2DataCopyTools',
+  });
+}
@@ -0,0 +1,12 @@
+/* Layer interfaces */
+import { PythonLayerVersion } from '@aws-cdk/aws-lambda-python-alpha';
+
+export type LayerName = 'icav2DataCopyTools';
+
+export interface BuildLayerProps {
+  layerName: LayerName;
+}
+
+export interface LayerObject extends BuildLayerProps {
+  layerVersion: PythonLayerVersion;
+}
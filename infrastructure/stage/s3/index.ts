@@ -0,0 +1,36 @@
+import * as s3 from 'aws-cdk-lib/aws-s3';
+import { Construct } from 'constructs';
+import { RemovalPolicy } from 'aws-cdk-lib';
+import { NagSuppressions } from 'cdk-nag';
+import { BuildManifestBucketProps } from './interfaces';
+import { MANIFEST_BUCKET_EXPIRY } from '../constants';
+
+export function buildManifestBucket(scope: Construct, props: BuildManifestBucketProps) {
+  /*
+  Manifest bucket
+  Holds the JSONL manifests generated while planning a copy request,
+  manifests are only needed for the lifetime of the request so we expire them quickly
+  */
+  const manifestBucket = new s3.Bucket(scope, 'manifestBucket', {
+    bucketName: props.bucketName,
+    removalPolicy: props.bucketRemovalPolicy || RemovalPolicy.RETAIN_ON_UPDATE_OR_DELETE,
+    blockPublicAccess: s3.BlockPublicAccess.BLOCK_ALL,
+    encryption: s3.BucketEncryption.S3_MANAGED,
+    enforceSSL: true,
+    lifecycleRules: [
+      {
+        expiration: MANIFEST_BUCKET_EXPIRY,
+      },
+    ],
+  });
+
+  /* AwsSolutions-S1 - We don't need server access logs for transient manifests */
+  NagSuppressions.addResourceSuppressions(manifestBucket, [
+    {
+      id: 'AwsSolutions-S1',
+      reason: 'Manifests are transient, we do not need server access logs',
+    },
+  ]);
+
+  return manifestBucket;
+}
@@ -0,0 +1,6 @@
+import { RemovalPolicy } from 'aws-cdk-lib';
+
+export interface BuildManifestBucketProps {
+  bucketName: string;
+  bucketRemovalPolicy?: RemovalPolicy;
+}
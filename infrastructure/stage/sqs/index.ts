@@ -3,6 +3,7 @@ import {
   IcaEventPipeConstructProps,
   IcaSqsEventPipeProps,
   IcaSqsQueueConstructProps,
+  WorkQueueProps,
 } from './interfaces';
 import { Queue } from 'aws-cdk-lib/aws-sqs';
 import { Topic } from 'aws-cdk-lib/aws-sns';
@@ -13,9 +14,10 @@ import * as pipes from '@aws-cdk/aws-pipes-alpha';
 import { SqsSource } from '@aws-cdk/aws-pipes-sources-alpha';
 import * as sfn from 'aws-cdk-lib/aws-stepfunctions';
 import { IStateMachine } from 'aws-cdk-lib/aws-stepfunctions';
-import { STACK_PREFIX } from '../constants';
+import { DEFAULT_ICA_EVENT_PIPE_BATCH_SIZE, STACK_PREFIX } from '../constants';
 import { LogGroup } from 'aws-cdk-lib/aws-logs';
 import { Duration } from 'aws-cdk-lib';
+import { NagSuppressions } from 'cdk-nag';
 
 // Get the topic ARN from the topic name
 export function getTopicArnFromTopicName(topicName: string): string {
@@ -64,8 +66,10 @@ function createIcaSqsPipe(scope: Construct, props: IcaEventPipeConstructProps) {
   const logGroup = new LogGroup(scope, 'IcaEventPipeLogGroup');
 
   return new pipes.Pipe(scope, props.icaEventPipeName, {
+    // Notifications are deduplicated per job and the job rows read in a single BatchGetItem (up to 100 keys),
+    // so larger batches mean fewer executions and fewer dynamodb requests under load
     source: new SqsSource(props.icaSqsQueue, {
-      batchSize: 5,
+      batchSize: DEFAULT_ICA_EVENT_PIPE_BATCH_SIZE,
       maximumBatchingWindow: Duration.seconds(10),
     }),
     target: new SfnTarget(stepFunctionObject, {
@@ -93,6 +97,33 @@ export function createEventBridgePipe(scope: Construct, props: IcaSqsEventPipePr
   });
 }
 
+// Create the internal work queue that the planner sends small file uploads to
+export function buildWorkQueue(scope: Construct, props: WorkQueueProps): Queue {
+  const deadLetterQueue = new Queue(scope, `${props.workQueueName}-dlq`, {
+    queueName: props.workQueueName + '-dlq',
+    enforceSSL: true,
+    visibilityTimeout: props.workQueueVizTimeout,
+  });
+
+  // The dlq is the dead letter queue
+  NagSuppressions.addResourceSuppressions(deadLetterQueue, [
+    {
+      id: 'AwsSolutions-SQS3',
+      reason: 'This is the dead letter queue for the work queue',
+    },
+  ]);
+
+  return new Queue(scope, props.workQueueName, {
+    queueName: props.workQueueName,
+    enforceSSL: true,
+    visibilityTimeout: props.workQueueVizTimeout,
+    deadLetterQueue: {
+      queue: deadLetterQueue,
+      maxReceiveCount: props.maxReceiveCount,
+    },
+  });
+}
+
 // Creates a pipe TARGET wrapping into a Step Functions
 class SfnTarget implements pipes.ITarget {
   targetArn: string;
@@ -24,5 +24,14 @@ export interface IcaEventPipeConstructProps {
   stepFunctionName: SfnName;
 }
 
+export interface WorkQueueProps {
+  /* The name for the work queue (the DLQ with use this name with a "-dlq" postfix) */
+  workQueueName: string;
+  /* The visibility timeout for the queue, must be at least the consumer lambda timeout */
+  workQueueVizTimeout: Duration;
+  /* The number of times a message is received before it is sent to the DLQ */
+  maxReceiveCount: number;
+}
+
 export type IcaSqsEventPipeProps = Omit<IcaEventPipeConstructProps, 'icaSqsQueue'> &
   IcaSqsQueueConstructProps;
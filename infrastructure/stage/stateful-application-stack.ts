@@ -16,6 +16,7 @@ import { createEventBridgePipe, getTopicArnFromTopicName } from './sqs';
 import { buildTable } from './dynamodb';
 import { buildEventBus } from './event-bus';
 import { buildSchemas } from './event-schemas';
+import { buildManifestBucket } from './s3';
 
 export type StatefulApplicationStackProps = StatefulApplicationStackConfig & cdk.StackProps;
 
@@ -30,6 +31,12 @@ export class StatefulApplicationStack extends cdk.Stack {
       tableRemovalPolicy: props.tableRemovalPolicy,
     });
 
+    /* Manifest bucket */
+    buildManifestBucket(this, {
+      bucketName: props.manifestBucketName,
+      bucketRemovalPolicy: props.manifestBucketRemovalPolicy,
+    });
+
     /* Event bus */
     buildEventBus(this, {
       eventBusName: props.internalEventBusName,
@@ -6,12 +6,16 @@ import * as events from 'aws-cdk-lib/aws-events';
 // Application imports
 import * as dynamodb from 'aws-cdk-lib/aws-dynamodb';
 import * as secretsManager from 'aws-cdk-lib/aws-secretsmanager';
+import * as s3 from 'aws-cdk-lib/aws-s3';
 
 // Local imports
 import { StatelessApplicationStackConfig } from './interfaces';
 import {
   DEFAULT_HEART_BEAT_EXTERNAL_EVENT_BRIDGE_RULE_NAME,
   DEFAULT_HEART_BEAT_INTERNAL_EVENT_BRIDGE_RULE_NAME,
+  WORK_QUEUE_MAX_RECEIVE_COUNT,
+  WORK_QUEUE_NAME,
+  WORK_QUEUE_VIZ_TIMEOUT,
 } from './constants';
 import { NagSuppressions } from 'cdk-nag';
 import { buildAllLambdas } from './lambda';
@@ -20,6 +24,8 @@ import { buildAllStepFunctions } from './step-functions';
 import { buildAllEventBridgeTargets } from './event-targets';
 import { StageName } from '@orcabus/platform-cdk-constructs/shared-config/accounts';
 import { buildAllEcsFargateTasks } from './ecs';
+import { buildIcav2DataCopyToolsLayer } from './layers';
+import { buildWorkQueue } from './sqs';
 
 export type StatelessApplicationStackProps = StatelessApplicationStackConfig & cdk.StackProps;
 
@@ -31,7 +37,18 @@ export class StatelessApplicationStack extends cdk.Stack {
     this.stageName = props.stageName;
 
     // Get dynamodb table (built in the stateful stack)
-    const dynamodbTable = dynamodb.TableV2.fromTableName(this, props.tableName, props.tableName);
+    // Grants on the table also need to cover its indexes (i.e the id_type index)
+    const dynamodbTable = dynamodb.TableV2.fromTableAttributes(this, props.tableName, {
+      tableName: props.tableName,
+      grantIndexPermissions: true,
+    });
+
+    // Get the manifest bucket (built in the stateful stack)
+    const manifestBucket = s3.Bucket.fromBucketName(
+      this,
+      'manifestBucket',
+      props.manifestBucketName
+    );
 
     // Get the event bus objects
     const externalEventBusObject = events.EventBus.fromEventBusName(
@@ -64,8 +81,23 @@ export class StatelessApplicationStack extends cdk.Stack {
       props.hostnameSsmParameterName
     );
 
+    // Build the shared python layer
+    const icav2DataCopyToolsLayerObj = buildIcav2DataCopyToolsLayer(this);
+
+    // Build the small file work queue
+    const workQueue = buildWorkQueue(this, {
+      workQueueName: WORK_QUEUE_NAME,
+      workQueueVizTimeout: WORK_QUEUE_VIZ_TIMEOUT,
+      maxReceiveCount: WORK_QUEUE_MAX_RECEIVE_COUNT,
+    });
+
     // Build the lambdas
-    const lambdaObjects = buildAllLambdas(this);
+    const lambdaObjects = buildAllLambdas(this, {
+      icav2DataCopyToolsLayerObj: icav2DataCopyToolsLayerObj,
+      manifestBucket: manifestBucket,
+      tableObj: dynamodbTable,
+      workQueue: workQueue,
+    });
 
     // Build event bridge rules
     // We need to do this before the step functions are created
@@ -83,6 +115,7 @@ export class StatelessApplicationStack extends cdk.Stack {
       icav2AccessTokenSecretObj: icav2AccessTokenSecretObj,
       orcabusTokenSecretObj: orcabusTokenSecretObj,
       hostnameSsmParameter: hostnameSsmParameter,
+      serverSideCopyRoleArn: props.serverSideCopyRoleArn,
     });
 
     // Build the step functions
@@ -92,6 +125,8 @@ export class StatelessApplicationStack extends cdk.Stack {
       icav2CopyServiceEventSource: props.eventSource,
       icav2CopyServiceDetailType: props.eventDetailType,
       tableObj: dynamodbTable,
+      manifestBucket: manifestBucket,
+      workQueue: workQueue,
       ecsFargateTaskObjects: ecsFargateTasks,
       internalHeartBeatRuleName: DEFAULT_HEART_BEAT_INTERNAL_EVENT_BRIDGE_RULE_NAME,
       externalHeartBeatRuleName: DEFAULT_HEART_BEAT_EXTERNAL_EVENT_BRIDGE_RULE_NAME,
@@ -11,7 +11,7 @@ import * as cdk from 'aws-cdk-lib';
 import { NagSuppressions } from 'cdk-nag';
 import * as sfn from 'aws-cdk-lib/aws-stepfunctions';
 import path from 'path';
-import { STACK_PREFIX, STEP_FUNCTIONS_DIR } from '../constants';
+import { STACK_PREFIX, STEP_FUNCTIONS_DIR, TABLE_ID_TYPE_INDEX_NAME } from '../constants';
 import { camelCaseToSnakeCase } from '../utils';
 import { Construct } from 'constructs';
 import * as awsLogs from 'aws-cdk-lib/aws-logs';
@@ -62,6 +62,12 @@ function createStateMachineDefinitionSubstitutions(props: BuildSfnProps): {
   /* Substitute the dynamodb table in the state machine definition */
   if (props.tableObj) {
     definitionSubstitutions['__table_name__'] = props.tableObj.tableName;
+    definitionSubstitutions['__table_id_type_index_name__'] = TABLE_ID_TYPE_INDEX_NAME;
+  }
+
+  /* Substitute the work queue in the state machine definition */
+  if (props.workQueue) {
+    definitionSubstitutions['__work_queue_url__'] = props.workQueue.queueUrl;
   }
 
   /* Substitute the event bridge rule name in the state machine definition */
@@ -84,12 +90,6 @@ function createStateMachineDefinitionSubstitutions(props: BuildSfnProps): {
     definitionSubstitutions['__event_source__'] = props.icav2CopyServiceEventSource;
   }
 
-  /* Substitute the sfn object arn names in the state machine definition */
-  if (props.handleCopyJobsSfnObject) {
-    definitionSubstitutions['__handle_copy_jobs_state_machine_arn__'] =
-      props.handleCopyJobsSfnObject.stateMachineObj.stateMachineArn;
-  }
-
   return definitionSubstitutions;
 }
 
@@ -157,6 +157,18 @@ function wireUpStateMachinePermissions(scope: Construct, props: WirePermissionsP
       );
     }
     props.tableObj.grantReadWriteData(props.stateMachineObj);
+
+    // Will need cdk nag suppressions for this
+    NagSuppressions.addResourceSuppressions(
+      props.stateMachineObj,
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason: 'Need ability to query any index of the table',
+        },
+      ],
+      true
+    );
   }
 
   /* Wire up event bridge rule permissions */
@@ -261,25 +273,49 @@ function wireUpStateMachinePermissions(scope: Construct, props: WirePermissionsP
     );
   }
 
-  /* Add permissions to list the handle copy jobs step function executions and to describe them */
-  if (sfnRequirements.needsHandleCopyJobsListExecutions) {
-    // Ensure that the handle copy jobs step function object is defined
-    if (!props.handleCopyJobsSfnObject) {
+  /* Allow the state machine to describe its own executions */
+  if (sfnRequirements.needsDescribeExecutionPermissions) {
+    // As with the distributed map policy, we use an inline policy
+    // to avoid a circular dependency between the state machine and its role
+    const describeExecutionPolicy = new iam.Policy(
+      scope,
+      `${props.stateMachineName}-describe-execution-role`,
+      {
+        document: new iam.PolicyDocument({
+          statements: [
+            new iam.PolicyStatement({
+              resources: [
+                `arn:aws:states:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:execution:${props.stateMachineObj.stateMachineName}:*`,
+              ],
+              actions: ['states:DescribeExecution'],
+            }),
+          ],
+        }),
+      }
+    );
+
+    props.stateMachineObj.role.attachInlinePolicy(describeExecutionPolicy);
+
+    NagSuppressions.addResourceSuppressions(
+      [describeExecutionPolicy],
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason: 'Need ability to describe any execution of this state machine',
+        },
+      ],
+      true
+    );
+  }
+
+  /* Wire up manifest bucket permissions */
+  if (sfnRequirements.needsManifestBucketAccess) {
+    if (!props.manifestBucket) {
       throw new Error(
-        `Handle copy jobs step function object is not defined for state machine that requires it: ${props.stateMachineName}`
+        `Manifest bucket is not defined for state machine that requires it: ${props.stateMachineName}`
       );
     }
-
-    // List and describe executions for the handle copy jobs step function
-    props.stateMachineObj.addToRolePolicy(
-      new iam.PolicyStatement({
-        actions: ['states:ListExecutions', 'states:DescribeExecution'],
-        resources: [
-          props.handleCopyJobsSfnObject.stateMachineObj.stateMachineArn,
-          `arn:aws:states:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:execution:${props.handleCopyJobsSfnObject.stateMachineObj.stateMachineName}:*`,
-        ],
-      })
-    );
+    props.manifestBucket.grantRead(props.stateMachineObj);
 
     // Will need a cdk nag suppression for this
     NagSuppressions.addResourceSuppressions(
@@ -287,12 +323,22 @@ function wireUpStateMachinePermissions(scope: Construct, props: WirePermissionsP
       [
         {
           id: 'AwsSolutions-IAM5',
-          reason: 'Distributed Map IAM Policy requires asterisk in the resource ARN',
+          reason: 'Distributed Map ItemReader needs to read any manifest in the manifest bucket',
         },
       ],
       true
     );
   }
+
+  /* Wire up work queue permissions */
+  if (sfnRequirements.needsWorkQueue) {
+    if (!props.workQueue) {
+      throw new Error(
+        `Work queue is not defined for state machine that requires it: ${props.stateMachineName}`
+      );
+    }
+    props.workQueue.grantSendMessages(props.stateMachineObj);
+  }
 }
 
 function buildStepFunction(scope: Construct, props: BuildSfnProps): SfnObject {
@@ -359,32 +405,12 @@ export function buildAllStepFunctions(scope: Construct, props: BuildSfnsProps):
 
   // Iterate over lambdaLayerToMapping and create the lambda functions
   for (const sfnName of sfnNameList) {
-    switch (sfnName) {
-      case 'sendHeartbeatExternal': {
-        /*
-        Find the sfn object for the handle copy jobs step function
-        */
-        const handleCopyJobsObject = sfnObjects.find(
-          (sfnObj) => sfnObj.stateMachineName === 'handleCopyJobs'
-        );
-        sfnObjects.push(
-          buildStepFunction(scope, {
-            stateMachineName: sfnName,
-            ...props,
-            handleCopyJobsSfnObject: handleCopyJobsObject,
-          })
-        );
-        break;
-      }
-      default: {
-        sfnObjects.push(
-          buildStepFunction(scope, {
-            stateMachineName: sfnName,
-            ...props,
-          })
-        );
-      }
-    }
+    sfnObjects.push(
+      buildStepFunction(scope, {
+        stateMachineName: sfnName,
+        ...props,
+      })
+    );
   }
 
   return sfnObjects;
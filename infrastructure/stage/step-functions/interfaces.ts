@@ -5,6 +5,8 @@ import { EventBridgeNameList } from '../event-rules/interfaces';
 import { IEventBus } from 'aws-cdk-lib/aws-events';
 import { ITableV2 } from 'aws-cdk-lib/aws-dynamodb';
 import { EcsTaskObject } from '../ecs/interfaces';
+import { IBucket } from 'aws-cdk-lib/aws-s3';
+import { IQueue } from 'aws-cdk-lib/aws-sqs';
 
 export type SfnName =
   | 'handleCopyJobs'
@@ -32,21 +34,29 @@ export interface SfnObject extends SfnProps {
 }
 
 export const HandleCopyJobsLambdaList: LambdaName[] = [
+  'closeCopyJobBatch',
+  'completeCopyJobBatch',
   'convertSourceUriFolderToUriList',
   'findSinglePartFiles',
   'generateCopyJobList',
   'getExternalSourceFileMetadata',
   'getRenamingMapParams',
   'getSourceFileSize',
+  'joinCopyJobBatch',
   'launchIcav2Copy',
+  'releaseCopyJobLease',
   'renameFile',
+  'requestCopyJobLease',
   'uploadFromFilemanager',
   'uploadSinglePartFile',
   'validateFileTransfer',
+  'validateFileTransferList',
 ];
 
 export const SendHeartbeatInternalJobsLambdaList: LambdaName[] = ['checkJobStatus'];
 
+export const SendHeartbeatExternalLambdaList: LambdaName[] = ['sendExternalHeartbeats'];
+
 export interface SfnRequirementsProps {
   /* Lambdas */
   requiredLambdaNameList?: LambdaName[];
@@ -72,8 +82,14 @@ export interface SfnRequirementsProps {
   /* Check if step function needs distributed map policies */
   needsDistributedMapPolicies?: boolean;
 
-  /* Check if step function needs handle copy jobs list executions */
-  needsHandleCopyJobsListExecutions?: boolean;
+  /* Check if the step function describes its own executions */
+  needsDescribeExecutionPermissions?: boolean;
+
+  /* Check if the step function reads manifests from the manifest bucket */
+  needsManifestBucketAccess?: boolean;
+
+  /* Check if the step function sends barrier messages to the work queue */
+  needsWorkQueue?: boolean;
 
   /* Check if the step function needs to be an express step function */
   isExpress?: boolean;
@@ -91,11 +107,24 @@ export const SfnRequirementsMapType: { [key in SfnName]: SfnRequirementsProps }
     needsIcav2CopyServiceDetailType: true,
     needsExternalHeartBeatRuleObj: true,
 
+    /* Registers its external task token in the table */
+    needsTableObj: true,
+
     /* ECS Stuff */
     needsEcsPermissions: true,
 
     /* Task Token permissions */
     needsTaskTokenUpdatePermissions: true,
+
+    /* Checks whether the execution running an identical request is still running */
+    needsDescribeExecutionPermissions: true,
+
+    /* Distributed maps read their items from the manifest bucket */
+    needsDistributedMapPolicies: true,
+    needsManifestBucketAccess: true,
+
+    /* Waits on the small file uploads sent to the work queue */
+    needsWorkQueue: true,
   },
   // Save job and internal task token
   saveJobAndInternalTaskToken: {
@@ -104,6 +133,9 @@ export const SfnRequirementsMapType: { [key in SfnName]: SfnRequirementsProps }
 
     /* Event rule stuff */
     needsInternalHeartBeatRuleObj: true,
+
+    /* Completes the job itself if it finished before the task token was saved */
+    needsTaskTokenUpdatePermissions: true,
   },
   // Send internal task token
   sendInternalTaskToken: {
@@ -135,17 +167,12 @@ export const SfnRequirementsMapType: { [key in SfnName]: SfnRequirementsProps }
   },
   // Send heartbeat external
   sendHeartbeatExternal: {
+    /* Lambda name list */
+    /* The lambda reads the registered task tokens and sends the heartbeats */
+    requiredLambdaNameList: SendHeartbeatExternalLambdaList,
+
     /* Event Stuff */
     needsExternalHeartBeatRuleObj: true,
-
-    /* Needs task token update permissions */
-    needsTaskTokenUpdatePermissions: true,
-
-    /* Needs distributed map policies */
-    needsDistributedMapPolicies: true,
-
-    /* Needs handle copy jobs list executions */
-    needsHandleCopyJobsListExecutions: true,
   },
 };
 
@@ -173,12 +200,15 @@ export interface BuildSfnProps extends SfnProps {
   /* Table stuff */
   tableObj?: ITableV2;
 
+  /* Manifest bucket */
+  manifestBucket?: IBucket;
+
+  /* Work queue */
+  workQueue?: IQueue;
+
   /* Event Bridge Stuff */
   internalHeartBeatRuleName?: internalHeartBeatRuleNameList;
   externalHeartBeatRuleName?: externalHeartBeatRuleNameList;
-
-  /* Other sfns */
-  handleCopyJobsSfnObject?: SfnObject;
 }
 
 export type BuildSfnsProps = Omit<BuildSfnProps, 'stateMachineName'>;
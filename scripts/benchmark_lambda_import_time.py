@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+"""
+Measure the import time of each lambda handler module against its import time budget.
+
+The per-file lambdas in the upload and validate maps cold start hundreds of times per request,
+so any import we add to a handler (or to the icav2 data copy tools layer) is paid for over and over.
+
+Each handler module is imported in a fresh interpreter with python -X importtime,
+the cumulative import time of the handler module is compared against its budget below.
+The best of --repeat runs is used so that the first run (which also writes the bytecode cache) is not counted.
+
+Run from an environment with the lambda dependencies installed (wrapica, icav2_tools, orcabus_api_tools), i.e
+
+python3 scripts/benchmark_lambda_import_time.py
+python3 scripts/benchmark_lambda_import_time.py --lambda-name generate_copy_job_list --repeat 5
+
+Exits non-zero if any handler is over budget.
+If a new dependency legitimately raises a handler's import time, raise its budget here in the same change.
+"""
+
+# Standard imports
+import argparse
+import re
+import subprocess
+import sys
+from os import environ, pathsep
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Globals
+REPO_ROOT = Path(__file__).absolute().parent.parent
+LAMBDAS_DIR = REPO_ROOT / "app" / "lambdas"
+LAYERS_DIR = REPO_ROOT / "app" / "layers"
+
+# Import time budgets in milliseconds, keyed by lambda name
+# Almost all of a handler's import time is libica (pulled in by wrapica), the budgets leave headroom above that
+DEFAULT_IMPORT_TIME_BUDGET_MS = 4000
+IMPORT_TIME_BUDGET_MS_BY_LAMBDA: Dict[str, int] = {
+    # Only uses the orcabus api tools, no wrapica
+    "get_external_source_file_metadata": 1000,
+}
+
+IMPORT_TIME_LINE_REGEX = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def get_lambda_name_list() -> List[str]:
+    return sorted(
+        map(
+            lambda lambda_dir_iter_: lambda_dir_iter_.name.removesuffix("_py"),
+            filter(
+                lambda lambda_dir_iter_: lambda_dir_iter_.is_dir() and lambda_dir_iter_.name.endswith("_py"),
+                LAMBDAS_DIR.iterdir()
+            )
+        )
+    )
+
+
+def get_import_time_ms(lambda_name: str) -> float:
+    """
+    Import the handler module in a fresh interpreter and return its cumulative import time in milliseconds
+    :param lambda_name:
+    :return:
+    """
+    python_path_list = [
+        str(LAMBDAS_DIR / f"{lambda_name}_py"),
+        *map(str, filter(lambda layer_dir_iter_: layer_dir_iter_.is_dir(), LAYERS_DIR.iterdir())),
+    ]
+    if environ.get("PYTHONPATH"):
+        python_path_list.append(environ["PYTHONPATH"])
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {lambda_name}"],
+        env={
+            **environ,
+            "PYTHONPATH": pathsep.join(python_path_list),
+        },
+        capture_output=True,
+        text=True,
+    )
+
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"Could not import {lambda_name}, is the lambda environment installed?\n" +
+            proc.stderr.splitlines()[-1]
+        )
+
+    # The handler module is the top level (least indented) import of its own name
+    for line_iter_ in proc.stderr.splitlines():
+        line_match = IMPORT_TIME_LINE_REGEX.match(line_iter_)
+        if line_match is None:
+            continue
+        if line_match.group(4) == lambda_name and line_match.group(3) == " ":
+            return int(line_match.group(2)) / 1000
+
+    raise RuntimeError(f"Could not find the import time of {lambda_name} in the importtime output")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Check lambda handler import times against their budgets")
+    parser.add_argument(
+        "--lambda-name", action="append", dest="lambda_name_list",
+        help="The lambda to benchmark (without the _py suffix), can be given multiple times, defaults to all lambdas"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="The number of fresh interpreters to import each handler in, the best time is used"
+    )
+    return parser.parse_args()
+
+
+def main() -> Optional[int]:
+    args = get_args()
+
+    lambda_name_list = (
+        args.lambda_name_list
+        if args.lambda_name_list is not None
+        else get_lambda_name_list()
+    )
+
+    over_budget_list = []
+    for lambda_name_iter_ in lambda_name_list:
+        import_time_ms = min(
+            map(
+                lambda _: get_import_time_ms(lambda_name_iter_),
+                range(args.repeat)
+            )
+        )
+        budget_ms = IMPORT_TIME_BUDGET_MS_BY_LAMBDA.get(lambda_name_iter_, DEFAULT_IMPORT_TIME_BUDGET_MS)
+        is_over_budget = import_time_ms > budget_ms
+
+        print(
+            f"{lambda_name_iter_:<45} {import_time_ms:>9.1f} ms / {budget_ms:>6d} ms"
+            f"{'  OVER BUDGET' if is_over_budget else ''}"
+        )
+
+        if is_over_budget:
+            over_budget_list.append(lambda_name_iter_)
+
+    if len(over_budget_list) > 0:
+        print(f"{len(over_budget_list)} lambda(s) over their import time budget: {', '.join(over_budget_list)}")
+        return 1
+
+    return None
+
+
+if __name__ == "__main__":
+    sys.exit(main())